@@ -0,0 +1,320 @@
+"""
+ClaimGuard AI - Claim Analytics Rollups
+Per (day, status, merchant, claim_type) totals and per-item decision rows
+kept up to date as claims are saved, so dashboard and item-level queries
+never scan (or decode) the claims table.
+
+Usage:
+    python analytics.py rebuild    # backfill rollups and line items from existing claims
+"""
+
+import logging
+import sys
+from datetime import datetime
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+import models
+from policy_engine import normalize_key
+
+logger = logging.getLogger("claimguard.analytics")
+
+ROLLUP_DIMENSIONS = ("day", "status", "merchant_name", "claim_type")
+ROLLUP_MEASURES = ("claim_count", "total_claimed", "total_approved", "total_deducted")
+LINE_ITEM_DIMENSIONS = ("item_key", "status", "medical_severity")
+
+
+def rollup_key(claim, claim_type):
+    """Rollup dimensions for a saved (or about to be saved) Claim row"""
+    return {
+        "day": (claim.created_at or datetime.utcnow()).date(),
+        "status": claim.status or "UNKNOWN",
+        "merchant_name": claim.merchant_name or "UNKNOWN",
+        "claim_type": claim_type or "UNKNOWN",
+    }
+
+
+def claim_type_of(full_data):
+    """claim_type recorded by the policy engine in a stored result"""
+    return ((full_data or {}).get('policy_adjudication') or {}).get('claim_type')
+
+
+def rollup_row(claim, claim_type):
+    """Rollup increment contributed by one claim"""
+    return {
+        **rollup_key(claim, claim_type),
+        "claim_count": 1,
+        "total_claimed": claim.total_claimed or 0.0,
+        "total_approved": claim.total_approved or 0.0,
+        "total_deducted": claim.total_deducted or 0.0,
+    }
+
+
+def rollup_upsert(dialect_name, row):
+    """
+    Atomic INSERT ... ON CONFLICT DO UPDATE for SQLite and PostgreSQL, so
+    concurrent saves never lose increments; None for other databases
+    """
+    if dialect_name not in ("sqlite", "postgresql"):
+        return None
+    rollups = models.ClaimRollup.__table__
+    insert = (sqlite.insert if dialect_name == "sqlite" else postgresql.insert)(rollups).values(**row)
+    return insert.on_conflict_do_update(
+        index_elements=list(ROLLUP_DIMENSIONS),
+        set_={measure: rollups.c[measure] + insert.excluded[measure] for measure in ROLLUP_MEASURES}
+    )
+
+
+def apply_increment(existing, row):
+    """Portable fallback: fold row into a locked rollup entity (or create one)"""
+    if existing is None:
+        return models.ClaimRollup(**row)
+    for measure in ROLLUP_MEASURES:
+        setattr(existing, measure, getattr(existing, measure) + row[measure])
+    return existing
+
+
+async def record_claims(db, claims):
+    """
+    Add a batch of (claim, claim_type) pairs to the rollups inside the
+    caller's (async) transaction, with one upsert per distinct rollup row
+    """
+    rows = {}
+    for claim, claim_type in claims:
+        row = rollup_row(claim, claim_type)
+        key = tuple(row[dimension] for dimension in ROLLUP_DIMENSIONS)
+        if key in rows:
+            for measure in ROLLUP_MEASURES:
+                rows[key][measure] += row[measure]
+        else:
+            rows[key] = row
+
+    dialect_name = db.get_bind().dialect.name
+    for key, row in rows.items():
+        statement = rollup_upsert(dialect_name, row)
+        if statement is not None:
+            await db.execute(statement)
+        else:
+            db.add(apply_increment(await db.get(models.ClaimRollup, key, with_for_update=True), row))
+
+
+def line_item_rows(claim_db_id, full_data, created_at):
+    """claim_line_items rows for the line_item_decisions stored in a claim result"""
+    decisions = ((full_data or {}).get('policy_adjudication') or {}).get('line_item_decisions') or []
+    return [
+        {
+            "claim_db_id": claim_db_id,
+            "position": position,
+            "item_name": decision.get('item_name'),
+            "item_key": normalize_key(decision.get('item_name') or ''),
+            "status": decision.get('status'),
+            "claimed_amount": decision.get('claimed_amount') or 0.0,
+            "approved_amount": decision.get('approved_amount') or 0.0,
+            "reason": decision.get('reason'),
+            "medical_necessity": decision.get('medical_necessity'),
+            "medical_severity": decision.get('medical_severity'),
+            "medical_reason": decision.get('medical_reason'),
+            "created_at": created_at,
+        }
+        for position, decision in enumerate(decisions, start=1)
+    ]
+
+
+async def record_line_items(db, claims):
+    """
+    Insert the line item decisions of flushed claims (IDs assigned) inside
+    the caller's (async) transaction, as one executemany INSERT
+    """
+    rows = [
+        row
+        for claim in claims
+        for row in line_item_rows(claim.id, claim.full_data, claim.created_at or datetime.utcnow())
+    ]
+    if rows:
+        await db.execute(insert(models.ClaimLineItem), rows)
+
+
+def lock_claim_writes(db):
+    """
+    Block claim saves until the caller's transaction ends, so a rebuild sees
+    every claim exactly once
+
+    PostgreSQL: SHARE ROW EXCLUSIVE on claims waits for in-flight saves to
+    commit and holds off new ones (and other rebuilds); reads continue.
+    SQLite: the first write of the transaction takes the database's single
+    writer lock, so the caller must write before it reads claims.
+
+    Returns:
+        bool: False for other databases, where rebuild must run with writes stopped
+    """
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        db.execute(text("LOCK TABLE claims IN SHARE ROW EXCLUSIVE MODE"))
+        return True
+    return dialect_name == "sqlite"
+
+
+def rebuild_rollups(session_factory, batch_size=1000):
+    """
+    Recompute every rollup and line item row from the claims table (backfill / repair)
+
+    Runs in one transaction with claim saves blocked (see lock_claim_writes),
+    so it is safe while the API is serving; saves resume when it commits.
+
+    Returns:
+        int: Number of claims folded into the rollups
+    """
+    db = session_factory()
+    try:
+        if not lock_claim_writes(db):
+            logger.warning("Cannot block claim writes on this database; stop the API while rebuilding")
+        # First write of the transaction: on SQLite this takes the writer lock before claims are read
+        db.query(models.ClaimLineItem).delete(synchronize_session=False)
+        db.query(models.ClaimRollup).delete(synchronize_session=False)
+
+        totals = {}
+        claims = (
+            db.query(
+                models.Claim.created_at, models.Claim.status, models.Claim.merchant_name,
+                models.Claim.id, models.Claim.total_claimed, models.Claim.total_approved,
+                models.Claim.total_deducted, models.Claim.full_data
+            )
+            .execution_options(yield_per=batch_size)
+        )
+        line_items = []
+        count = 0
+        for claim in claims:
+            line_items.extend(line_item_rows(claim.id, claim.full_data, claim.created_at))
+            if len(line_items) >= batch_size:
+                db.execute(insert(models.ClaimLineItem), line_items)
+                line_items = []
+            key = tuple(rollup_key(claim, claim_type_of(claim.full_data)).values())
+            entry = totals.setdefault(key, [0, 0.0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += claim.total_claimed or 0.0
+            entry[2] += claim.total_approved or 0.0
+            entry[3] += claim.total_deducted or 0.0
+            count += 1
+
+        db.add_all(
+            models.ClaimRollup(**dict(zip(ROLLUP_DIMENSIONS, key)), **dict(zip(ROLLUP_MEASURES, values)))
+            for key, values in totals.items()
+        )
+        if line_items:
+            db.execute(insert(models.ClaimLineItem), line_items)
+        db.commit()
+        return count
+    finally:
+        db.close()
+
+
+def rollup_query(group_by=("day",), start=None, end=None, status=None, merchant_name=None, claim_type=None):
+    """
+    SELECT aggregating rollup rows by the requested dimensions
+
+    Args:
+        group_by: Subset of ROLLUP_DIMENSIONS to group on (empty for grand totals)
+        start, end: Inclusive date range on day
+    """
+    rollups = models.ClaimRollup
+    columns = [getattr(rollups, dimension) for dimension in group_by]
+    query = select(
+        *columns,
+        func.sum(rollups.claim_count).label("claim_count"),
+        func.sum(rollups.total_claimed).label("total_claimed"),
+        func.sum(rollups.total_approved).label("total_approved"),
+        func.sum(rollups.total_deducted).label("total_deducted"),
+    )
+    if start:
+        query = query.where(rollups.day >= start)
+    if end:
+        query = query.where(rollups.day <= end)
+    if status:
+        query = query.where(rollups.status == status)
+    if merchant_name:
+        query = query.where(rollups.merchant_name == merchant_name)
+    if claim_type:
+        query = query.where(rollups.claim_type == claim_type)
+    if columns:
+        query = query.group_by(*columns).order_by(*columns)
+    return query
+
+
+def format_rollups(rows):
+    """JSON-ready dicts of grouped dimensions plus claim_count and totals"""
+    results = []
+    for row in rows:
+        values = dict(row._mapping)
+        if not values["claim_count"]:
+            continue
+        if "day" in values:
+            values["day"] = values["day"].isoformat()
+        for measure in ("total_claimed", "total_approved", "total_deducted"):
+            values[measure] = round(values[measure] or 0.0, 2)
+        results.append(values)
+    return results
+
+
+def line_item_query(group_by=("item_key",), item=None, status=None, medical_severity=None,
+                    start=None, end=None, limit=100):
+    """
+    SELECT aggregating claim_line_items by the requested dimensions, largest
+    claimed amount first
+
+    Args:
+        group_by: Subset of LINE_ITEM_DIMENSIONS to group on (empty for grand totals)
+        item: Item name, matched on its normalized form
+        start, end: Inclusive date range on the claim's created_at
+    """
+    items = models.ClaimLineItem
+    columns = [getattr(items, dimension) for dimension in group_by]
+    claimed = func.sum(items.claimed_amount)
+    query = select(
+        *columns,
+        func.count(items.id).label("item_count"),
+        func.count(func.distinct(items.claim_db_id)).label("claim_count"),
+        claimed.label("total_claimed"),
+        func.sum(items.approved_amount).label("total_approved"),
+    )
+    if item:
+        query = query.where(items.item_key == normalize_key(item))
+    if status:
+        query = query.where(items.status == status)
+    if medical_severity:
+        query = query.where(items.medical_severity == medical_severity)
+    if start:
+        query = query.where(items.created_at >= datetime.combine(start, datetime.min.time()))
+    if end:
+        query = query.where(items.created_at <= datetime.combine(end, datetime.max.time()))
+    if columns:
+        query = query.group_by(*columns)
+    return query.order_by(claimed.desc()).limit(limit)
+
+
+def format_line_items(rows):
+    """JSON-ready dicts of grouped dimensions plus item/claim counts and totals"""
+    results = []
+    for row in rows:
+        values = dict(row._mapping)
+        if not values["item_count"]:
+            continue
+        for measure in ("total_claimed", "total_approved"):
+            values[measure] = round(values[measure] or 0.0, 2)
+        results.append(values)
+    return results
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print("Usage: python analytics.py rebuild")
+        sys.exit(1)
+
+    from database import SessionLocal, engine
+    models.Base.metadata.create_all(bind=engine)
+    count = rebuild_rollups(SessionLocal)
+    print(f"[OK] Rebuilt claim rollups and line items from {count} claims")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+ClaimGuard AI - Policy Engine Benchmark Suite
+Times the Policy Adjudicator on synthetic claims and compares the results
+against saved baselines so engine regressions fail loudly.
+
+Usage:
+    python benchmark_engine.py                    # run and compare to baseline
+    python benchmark_engine.py --save-baseline    # run and record a new baseline
+    python benchmark_engine.py --sizes 1 100 10000 --tolerance 0.2
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from policy_engine import PolicyAdjudicator
+
+
+POLICY_PATH = Path(__file__).parent.parent / "data" / "policy_rules.json"
+BASELINE_PATH = Path(__file__).parent / "benchmarks" / "policy_engine_baseline.json"
+
+DEFAULT_SIZES = (1, 10, 100, 1000, 10000)
+
+# Covered items used to pad synthetic claims
+MEDICINE_NAMES = [
+    "Paracetamol 500mg", "Amoxicillin 500mg (Antibiotic)", "Azithromycin 250mg",
+    "Omeprazole 20mg (Antacid)", "Cetirizine 10mg (Antihistamine)", "Metformin 500mg",
+    "Amlodipine 5mg", "Atorvastatin 10mg", "Pantoprazole 40mg", "Ondansetron 4mg",
+    "IV Fluids (Normal Saline)", "Surgical Gloves", "Blood Test - CBC", "X-Ray Chest PA View",
+    "Consultation Fee - Physician", "Insulin Glargine Injection", "Dressing Kit",
+]
+
+
+class ClaimGenerator:
+    """Synthetic claims in the data/claims schema with a controlled item mix"""
+
+    def __init__(self, policy_rules, excluded_ratio=0.1, room_rent_ratio=0.5,
+                 over_limit_ratio=0.5, sum_insured_choices=None, seed=42):
+        """
+        Args:
+            policy_rules: Parsed policy rules (source of excluded item names)
+            excluded_ratio: Share of line items drawn from excluded categories
+            room_rent_ratio: Share of claims that include a room rent line
+            over_limit_ratio: Share of room rent lines above 1% of sum insured
+            sum_insured_choices: Sum insured values to sample (default: policy limits)
+            seed: RNG seed so runs are reproducible
+        """
+        self.excluded_names = [
+            item
+            for category in policy_rules['excluded_items']['categories']
+            for item in category['items']
+        ]
+        self.excluded_ratio = excluded_ratio
+        self.room_rent_ratio = room_rent_ratio
+        self.over_limit_ratio = over_limit_ratio
+        self.sum_insured_choices = sum_insured_choices or sorted(
+            set(policy_rules.get('sum_insured_limits', {}).values()) or {500000}
+        )
+        self.rng = random.Random(seed)
+        self.counter = 0
+
+    def line_item(self, item_number, name, quantity, unit_price, category):
+        return {
+            "item_number": item_number,
+            "name": name,
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "total_price": round(quantity * unit_price, 2),
+            "category": category
+        }
+
+    def generate(self, item_count):
+        """Generate one claim with item_count line items"""
+        rng = self.rng
+        self.counter += 1
+        sum_insured = rng.choice(self.sum_insured_choices)
+
+        line_items = []
+        if item_count and rng.random() < self.room_rent_ratio:
+            allowed = sum_insured / 100
+            factor = rng.uniform(1.1, 2.0) if rng.random() < self.over_limit_ratio else rng.uniform(0.4, 1.0)
+            line_items.append(self.line_item(
+                1, "Room Rent (Private Room)", rng.randint(1, 10), round(allowed * factor, 2), "Accommodation"
+            ))
+
+        while len(line_items) < item_count:
+            number = len(line_items) + 1
+            if rng.random() < self.excluded_ratio:
+                line_items.append(self.line_item(
+                    number, rng.choice(self.excluded_names), rng.randint(1, 3),
+                    round(rng.uniform(50, 3000), 2), "Miscellaneous"
+                ))
+            else:
+                line_items.append(self.line_item(
+                    number, rng.choice(MEDICINE_NAMES), rng.randint(1, 30),
+                    round(rng.uniform(1, 2500), 2), "Medical"
+                ))
+
+        return {
+            "claim_id": f"BENCH-{item_count}-{self.counter:06d}",
+            "claim_type": "hospitalization" if line_items and "Room Rent" in line_items[0]['name'] else "pharmacy_reimbursement",
+            "merchant_name": "Benchmark Hospital",
+            "patient_name": "Synthetic Patient",
+            "patient_id": f"INS{self.counter:06d}",
+            "sum_insured": sum_insured,
+            "date": "2025-01-15",
+            "line_items": line_items,
+            "total_amount": round(sum(item['total_price'] for item in line_items), 2)
+        }
+
+
+def best_of(func, repeats):
+    """Fastest wall-clock time of several runs (least affected by noise)"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, target_items=20000, repeats=3, **generator_options):
+    """
+    Time the engine entry points for each claim size
+
+    Returns:
+        dict: benchmark name -> {claims, items, seconds, claims_per_sec, items_per_sec}
+    """
+    adjudicator = PolicyAdjudicator(policy_path=str(POLICY_PATH))
+    generator = ClaimGenerator(adjudicator.policy_rules, **generator_options)
+    results = {}
+
+    def record(name, claim_count, item_count, seconds):
+        results[name] = {
+            "claims": claim_count,
+            "items": item_count,
+            "seconds": round(seconds, 6),
+            "claims_per_sec": round(claim_count / seconds, 2),
+            "items_per_sec": round(item_count / seconds, 2)
+        }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            claim_count = max(3, target_items // size)
+            claims = [generator.generate(size) for _ in range(claim_count)]
+            item_names = [item['name'] for claim in claims for item in claim['line_items']]
+            item_count = len(item_names)
+
+            paths = []
+            for claim in claims:
+                path = Path(tmp_dir) / f"{claim['claim_id']}.json"
+                path.write_text(json.dumps(claim), encoding='utf-8')
+                paths.append(str(path))
+
+            record(f"is_excluded_item[{size}]", claim_count, item_count, best_of(
+                lambda: [adjudicator.is_excluded_item(name) for name in item_names], repeats
+            ))
+            record(f"calculate_proportionate_deduction[{size}]", claim_count, item_count, best_of(
+                lambda: [adjudicator.calculate_proportionate_deduction(claim) for claim in claims], repeats
+            ))
+            record(f"adjudicate[{size}]", claim_count, item_count, best_of(
+                lambda: [adjudicator.adjudicate(claim) for claim in claims], repeats
+            ))
+            record(f"adjudicate_claim[{size}]", claim_count, item_count, best_of(
+                lambda: [adjudicator.adjudicate_claim(path) for path in paths], repeats
+            ))
+
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    List benchmarks whose items/sec fell more than tolerance below the baseline
+
+    Returns:
+        list: (name, baseline items/sec, current items/sec) for each regression
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected and result['items_per_sec'] < expected['items_per_sec'] * (1 - tolerance):
+            regressions.append((name, expected['items_per_sec'], result['items_per_sec']))
+    return regressions
+
+
+def print_report(results, baseline):
+    print("=" * 96)
+    print(f"{'Benchmark':<42} {'Claims':>7} {'Items':>8} {'Claims/sec':>12} {'Items/sec':>12} {'vs base':>9}")
+    print("-" * 96)
+    for name, result in results.items():
+        change = ""
+        if name in baseline:
+            change = f"{result['items_per_sec'] / baseline[name]['items_per_sec'] - 1:+.1%}"
+        print(f"{name:<42} {result['claims']:>7} {result['items']:>8} "
+              f"{result['claims_per_sec']:>12,.1f} {result['items_per_sec']:>12,.1f} {change:>9}")
+    print("=" * 96)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ClaimGuard policy engine")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="Line items per claim (1 to 10000)")
+    parser.add_argument("--target-items", type=int, default=20000, help="Approximate items per size")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per benchmark (best is kept)")
+    parser.add_argument("--excluded-ratio", type=float, default=0.1)
+    parser.add_argument("--room-rent-ratio", type=float, default=0.5)
+    parser.add_argument("--over-limit-ratio", type=float, default=0.5)
+    parser.add_argument("--sum-insured", type=float, nargs="+", help="Sum insured values to sample")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Record this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed items/sec drop before failing (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    if any(size < 1 or size > 10000 for size in args.sizes):
+        parser.error("--sizes must be between 1 and 10000")
+
+    results = run_benchmarks(
+        sizes=args.sizes,
+        target_items=args.target_items,
+        repeats=args.repeats,
+        excluded_ratio=args.excluded_ratio,
+        room_rent_ratio=args.room_rent_ratio,
+        over_limit_ratio=args.over_limit_ratio,
+        sum_insured_choices=args.sum_insured,
+        seed=args.seed
+    )
+
+    baseline_path = Path(args.baseline)
+    baseline = {}
+    if baseline_path.exists() and not args.save_baseline:
+        baseline = json.loads(baseline_path.read_text(encoding='utf-8'))['results']
+
+    print_report(results, baseline)
+
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps({
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results
+        }, indent=2) + "\n", encoding='utf-8')
+        print(f"[SAVED] Baseline written to {baseline_path}")
+        return
+
+    if not baseline:
+        print(f"[NOTE] No baseline at {baseline_path}; run with --save-baseline to record one")
+        return
+
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n[FAILED] {len(regressions)} benchmark(s) regressed more than {args.tolerance:.0%}:")
+        for name, expected, actual in regressions:
+            print(f"  {name}: {actual:,.1f} items/sec (baseline {expected:,.1f})")
+        sys.exit(1)
+    print(f"\n[OK] No regressions beyond {args.tolerance:.0%} of baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""
+ClaimGuard AI - Benefit Ledger
+Applies the deduction_rules of the policy (copayment, per-claim and annual
+sub-limits) using a per-insured ledger of year-to-date consumption, one row
+per (insured, policy year, category). Every lookup and update is a primary
+key access, so the cost does not grow with claim history.
+
+Annual limits are enforced with reservations: a claim first holds part of the
+remaining limit (optimistic compare-and-swap on the row version), then
+settles the hold into consumed in the transaction that saves the claim, or
+releases it. Two parallel claims for the same insured can never both spend
+the same rupees. Every hold is also recorded in benefit_holds with an expiry,
+so a hold whose claim never finished (process crash) is released by the
+reaper instead of shrinking the insured's limit forever.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+import models
+from policy_engine import parse_claim_date
+
+logger = logging.getLogger("claimguard.ledger")
+
+SENIOR_CITIZEN_PRODUCT = "senior_citizen"
+SENIOR_CITIZEN_AGE = 60
+
+
+class LedgerContentionError(Exception):
+    """A reservation kept losing the compare-and-swap race and gave up"""
+
+
+@dataclass(frozen=True)
+class LedgerHold:
+    """Amount reserved against one ledger row, to settle or release later"""
+    insured_id: str
+    policy_year: int
+    category: str
+    amount: float
+    # benefit_holds row (None for empty holds, which reserve nothing)
+    hold_id: str = None
+    claim_key: str = None
+
+
+def insured_id_of(claim_data):
+    """
+    Policy holder ID written on the claim itself, or None. Patient names are
+    never used: they are neither unique nor stable across receipts. An ID
+    read off a receipt is only trusted once it matches an enrollment.
+    """
+    for field in ('insured_id', 'patient_id'):
+        if claim_data.get(field):
+            return str(claim_data[field]).strip()
+    return None
+
+
+def policy_year_of(claim_data, inception_date=None):
+    """
+    Policy year of a claim: the year in which the current policy year began
+    when the inception date is known, else the calendar year of the claim
+    date (today if missing)
+    """
+    claim_date = parse_claim_date(claim_data) or datetime.utcnow().date()
+    if inception_date is None:
+        return claim_date.year
+    years = claim_date.year - inception_date.year
+    if (claim_date.month, claim_date.day) < (inception_date.month, inception_date.day):
+        years -= 1
+    return inception_date.year + max(0, years)
+
+
+def benefit_category(claim_type):
+    """Sub-limit category of a claim type (pharmacy_reimbursement -> pharmacy)"""
+    claim_type = (claim_type or '').lower()
+    if 'pharmacy' in claim_type:
+        return 'pharmacy'
+    if 'diagnostic' in claim_type:
+        return 'diagnostics'
+    return claim_type.split('_')[0] or None
+
+
+def is_senior_citizen(claim_data, policy_product=None):
+    if policy_product == SENIOR_CITIZEN_PRODUCT:
+        return True
+    age = claim_data.get('patient_age', claim_data.get('age'))
+    try:
+        return age is not None and float(age) >= SENIOR_CITIZEN_AGE
+    except (TypeError, ValueError):
+        return False
+
+
+def benefit_terms(policy_rules, claim_data, policy_product=None):
+    """Copayment percentage and sub-limits that apply to one claim"""
+    deduction_rules = policy_rules.get('deduction_rules', {})
+    copayment = deduction_rules.get('copayment', {})
+    senior = is_senior_citizen(claim_data, policy_product)
+    category = benefit_category(claim_data.get('claim_type'))
+    sub_limit = deduction_rules.get('sub_limits', {}).get(category) or {}
+    return {
+        "category": category,
+        "senior_citizen": senior,
+        "copayment_percentage": copayment.get('senior_citizen' if senior else 'standard', 0) or 0,
+        "per_claim_limit": sub_limit.get('per_claim_limit'),
+        "annual_limit": sub_limit.get('annual_limit')
+    }
+
+
+async def settle_hold(db, hold, used):
+    """
+    Turn a hold into consumption (used <= hold.amount) inside the caller's
+    (async) transaction; the rest of the hold is released
+
+    Deleting the benefit_holds row fences the hold: a hold the reaper already
+    released is not given back twice, but its used amount is still consumed.
+    """
+    if hold is None or hold.amount <= 0:
+        return
+    used = round(min(max(0.0, used), hold.amount), 2)
+    held = hold.amount
+    if hold.hold_id is not None:
+        open_holds = (await db.execute(
+            delete(models.BenefitHold).where(models.BenefitHold.id == hold.hold_id)
+        )).rowcount
+        if not open_holds:
+            if used <= 0:
+                return
+            held = 0.0
+            logger.warning("Settling a hold the reaper already released", extra={
+                "hold_id": hold.hold_id, "claim_key": hold.claim_key, "used": used
+            })
+    entries = models.BenefitLedgerEntry
+    await db.execute(
+        update(entries)
+        .where(
+            entries.insured_id == hold.insured_id,
+            entries.policy_year == hold.policy_year,
+            entries.category == hold.category
+        )
+        .values(
+            reserved=entries.reserved - held,
+            consumed=entries.consumed + used,
+            claim_count=entries.claim_count + (1 if used > 0 else 0),
+            version=entries.version + 1,
+            updated_at=datetime.utcnow()
+        )
+    )
+
+
+class BenefitLedger:
+    """Year-to-date consumption per (insured, policy year, category) with reservations"""
+
+    def __init__(self, session_factory, max_retries=None, hold_ttl_seconds=None, reap_interval=None):
+        """
+        Args:
+            session_factory: Callable returning an AsyncSession
+            max_retries: Compare-and-swap attempts per reservation (env LEDGER_MAX_RETRIES, default 20)
+            hold_ttl_seconds: Age at which an unsettled hold is released by the
+                reaper (env LEDGER_HOLD_TTL_SECONDS, default 900)
+            reap_interval: Seconds between reaper sweeps (env LEDGER_REAP_INTERVAL,
+                default 60; 0 disables the background sweep)
+        """
+        self.session_factory = session_factory
+        if max_retries is None:
+            max_retries = int(os.getenv("LEDGER_MAX_RETRIES", "20"))
+        if hold_ttl_seconds is None:
+            hold_ttl_seconds = float(os.getenv("LEDGER_HOLD_TTL_SECONDS", "900"))
+        if reap_interval is None:
+            reap_interval = float(os.getenv("LEDGER_REAP_INTERVAL", "60"))
+        self.max_retries = max(1, max_retries)
+        self.hold_ttl = timedelta(seconds=hold_ttl_seconds)
+        self.reap_interval = reap_interval
+        self._task = None
+
+    async def _ensure_row(self, db, insured_id, policy_year, category):
+        """Create the ledger row if missing (a concurrent creator wins harmlessly)"""
+        row = {"insured_id": insured_id, "policy_year": policy_year, "category": category,
+               "consumed": 0.0, "reserved": 0.0, "claim_count": 0, "version": 0,
+               "updated_at": datetime.utcnow()}
+        dialect_name = db.get_bind().dialect.name
+        if dialect_name in ("sqlite", "postgresql"):
+            insert = (sqlite.insert if dialect_name == "sqlite" else postgresql.insert)(models.BenefitLedgerEntry)
+            await db.execute(insert.values(**row).on_conflict_do_nothing())
+            return
+        try:
+            async with db.begin_nested():
+                db.add(models.BenefitLedgerEntry(**row))
+        except IntegrityError:
+            pass
+
+    async def reserve(self, insured_id, policy_year, category, amount, annual_limit, claim_key=None):
+        """
+        Hold up to amount of the insured's remaining annual limit
+
+        Args:
+            claim_key: Identifies the analysis that owns the hold
+
+        Returns:
+            LedgerHold: The amount actually held (0 when the limit is used up)
+
+        Raises:
+            LedgerContentionError: If the row kept changing under us
+        """
+        amount = round(max(0.0, amount), 2)
+        for attempt in range(self.max_retries):
+            async with self.session_factory() as db, db.begin():
+                entries = models.BenefitLedgerEntry
+                read = select(entries.consumed, entries.reserved, entries.version).where(
+                    entries.insured_id == insured_id,
+                    entries.policy_year == policy_year,
+                    entries.category == category
+                )
+                entry = (await db.execute(read)).one_or_none()
+                if entry is None:
+                    await self._ensure_row(db, insured_id, policy_year, category)
+                    entry = (await db.execute(read)).one()
+                available = max(0.0, annual_limit - entry.consumed - entry.reserved)
+                held = round(min(amount, available), 2)
+                if held <= 0:
+                    return LedgerHold(insured_id, policy_year, category, 0.0, claim_key=claim_key)
+
+                # Compare-and-swap: only succeeds if nobody reserved or settled since our read
+                swapped = (await db.execute(
+                    update(entries)
+                    .where(
+                        entries.insured_id == insured_id,
+                        entries.policy_year == policy_year,
+                        entries.category == category,
+                        entries.version == entry.version
+                    )
+                    .values(reserved=entries.reserved + held, version=entries.version + 1,
+                            updated_at=datetime.utcnow())
+                )).rowcount
+                if swapped:
+                    now = datetime.utcnow()
+                    hold = LedgerHold(insured_id, policy_year, category, held, uuid.uuid4().hex, claim_key)
+                    await db.execute(insert(models.BenefitHold).values(
+                        id=hold.hold_id, claim_key=claim_key, insured_id=insured_id,
+                        policy_year=policy_year, category=category, amount=held,
+                        created_at=now, expires_at=now + self.hold_ttl
+                    ))
+            if swapped:
+                return hold
+        raise LedgerContentionError(
+            f"Could not reserve benefit for {insured_id} ({category}, {policy_year}) "
+            f"after {self.max_retries} attempts"
+        )
+
+    async def settle(self, hold, used, attempts=3):
+        """
+        Turn a hold into consumption in its own transaction (see settle_hold)
+
+        Raises:
+            Exception: The last database error if all attempts failed (the
+                hold then stays reserved until the reaper releases it)
+        """
+        if hold is None or hold.amount <= 0:
+            return
+        for attempt in range(1, attempts + 1):
+            try:
+                async with self.session_factory() as db, db.begin():
+                    await settle_hold(db, hold, used)
+                return
+            except Exception as e:
+                if attempt == attempts:
+                    raise
+                logger.warning("Ledger settle failed, retrying", extra={"attempt": attempt, "error": str(e)})
+                await asyncio.sleep(0.05 * attempt)
+
+    async def release(self, hold):
+        """Give a hold back without consuming anything (claim not saved)"""
+        await self.settle(hold, 0.0)
+
+    async def release_expired(self, now=None, limit=100):
+        """
+        Release holds that outlived their TTL (their claim never settled them)
+
+        Returns:
+            int: Number of holds released
+        """
+        holds = models.BenefitHold
+        async with self.session_factory() as db:
+            expired = (await db.execute(
+                select(holds).where(holds.expires_at <= (now or datetime.utcnow()))
+                .order_by(holds.expires_at).limit(limit)
+            )).scalars().all()
+        for row in expired:
+            logger.warning("Releasing expired benefit hold", extra={
+                "hold_id": row.id, "claim_key": row.claim_key, "insured_id": row.insured_id,
+                "category": row.category, "held": row.amount
+            })
+            await self.release(LedgerHold(
+                row.insured_id, row.policy_year, row.category, row.amount, row.id, row.claim_key
+            ))
+        return len(expired)
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            try:
+                await self.release_expired()
+            except Exception as e:
+                logger.error("Releasing expired benefit holds failed", extra={"error": str(e)})
+
+    def start(self):
+        """Start the expired-hold reaper on the running event loop"""
+        if self.reap_interval > 0:
+            self._task = asyncio.create_task(self._reap())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def balances(self, insured_id, policy_year=None):
+        """Ledger rows of an insured, optionally for one policy year"""
+        entries = models.BenefitLedgerEntry
+        query = select(entries).where(entries.insured_id == insured_id)
+        if policy_year is not None:
+            query = query.where(entries.policy_year == policy_year)
+        async with self.session_factory() as db:
+            rows = (await db.execute(query.order_by(entries.policy_year, entries.category))).scalars().all()
+        return [
+            {
+                "policy_year": row.policy_year,
+                "category": row.category,
+                "consumed": round(row.consumed, 2),
+                "reserved": round(row.reserved, 2),
+                "claim_count": row.claim_count,
+                "updated_at": row.updated_at.isoformat() if row.updated_at else None
+            }
+            for row in rows
+        ]
+
+    async def apply(self, policy_rules, claim_data, approved, policy_product=None, inception_date=None,
+                    insured_id=None, claim_key=None):
+        """
+        Apply copayment, then the per-claim and annual sub-limits, to an approved amount
+
+        Args:
+            insured_id: Verified policy holder ID; without one the annual limit
+                cannot be checked (breakdown annual_limit_checked is False)
+            claim_key: Identifies the analysis that owns the hold
+
+        Returns:
+            tuple: (payable amount, breakdown dict for the result, LedgerHold or None)
+        """
+        terms = benefit_terms(policy_rules, claim_data, policy_product)
+        approved = round(max(0.0, approved), 2)
+        copayment = round(approved * terms['copayment_percentage'] / 100, 2)
+        payable = round(approved - copayment, 2)
+
+        per_claim_excess = 0.0
+        if terms['per_claim_limit'] is not None and payable > terms['per_claim_limit']:
+            per_claim_excess = round(payable - terms['per_claim_limit'], 2)
+            payable = float(terms['per_claim_limit'])
+
+        hold = None
+        annual_excess = 0.0
+        policy_year = policy_year_of(claim_data, inception_date)
+        annual_limit_checked = terms['annual_limit'] is None or payable <= 0 or bool(insured_id)
+        if terms['annual_limit'] is not None and insured_id and payable > 0:
+            hold = await self.reserve(
+                insured_id, policy_year, terms['category'], payable, terms['annual_limit'], claim_key
+            )
+            annual_excess = round(payable - hold.amount, 2)
+            payable = hold.amount
+
+        breakdown = {
+            **terms,
+            "insured_id": insured_id,
+            "policy_year": policy_year,
+            "approved_before_deductions": approved,
+            "copayment_amount": copayment,
+            "per_claim_limit_deduction": per_claim_excess,
+            "annual_limit_deduction": annual_excess,
+            "annual_limit_checked": annual_limit_checked,
+            "claim_key": claim_key,
+            "payable": payable
+        }
+        return payable, breakdown, hold
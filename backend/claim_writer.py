@@ -0,0 +1,144 @@
+"""
+ClaimGuard AI - Group-Commit Claim Writer
+Write-behind buffer for new claims: concurrent saves are collected into
+micro-batches and committed in one transaction, so batch ingestion pays one
+commit (one fsync on SQLite) per batch instead of one per claim. Callers
+still await the database ID of their own claim. A claim's benefit hold is
+settled in the same transaction, so a saved claim always consumes its hold.
+"""
+
+import asyncio
+import logging
+import os
+
+from analytics import record_claims, record_line_items
+from benefit_ledger import settle_hold
+from metrics import CLAIM_WRITE_BATCH_SIZE, CLAIM_WRITE_FALLBACKS_TOTAL
+
+logger = logging.getLogger("claimguard.claim_writer")
+
+
+class ClaimWriter:
+    """Buffers Claim inserts and commits them in micro-batches bounded by count and time"""
+
+    def __init__(self, session_factory, max_batch=None, max_delay_ms=None):
+        """
+        Args:
+            session_factory: Callable returning an AsyncSession
+            max_batch: Claims per transaction (env CLAIM_WRITE_BATCH_SIZE, default 64)
+            max_delay_ms: Longest a claim waits for its batch to fill
+                (env CLAIM_WRITE_MAX_DELAY_MS, default 10)
+        """
+        self.session_factory = session_factory
+        if max_batch is None:
+            max_batch = int(os.getenv("CLAIM_WRITE_BATCH_SIZE", "64"))
+        if max_delay_ms is None:
+            max_delay_ms = float(os.getenv("CLAIM_WRITE_MAX_DELAY_MS", "10"))
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay_ms / 1000
+
+        self._queue = None
+        self._task = None
+        self._loop = None
+
+    async def write(self, claim, claim_type=None, benefit_hold=None, payable=0.0):
+        """
+        Queue a new Claim row and wait until its batch is committed
+
+        Args:
+            claim: Transient models.Claim
+            claim_type: Policy claim type, used for the analytics rollups
+            benefit_hold: LedgerHold of the claim, settled for payable in the
+                same transaction (untouched if the write fails)
+
+        Returns:
+            int: Database ID of the saved claim
+        """
+        self._ensure_running()
+        future = self._loop.create_future()
+        await self._queue.put((claim, claim_type, (benefit_hold, payable), future))
+        return await future
+
+    def _ensure_running(self):
+        """(Re)start the flush loop on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task and not self._task.done():
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._task = loop.create_task(self._run())
+
+    def start(self):
+        """Start the flush loop on the running event loop"""
+        self._ensure_running()
+        logger.info("Started claim writer", extra={"max_batch": self.max_batch, "max_delay_ms": self.max_delay * 1000})
+
+    async def stop(self):
+        """Flush everything queued so far, then stop the flush loop"""
+        if self._task is None or self._loop is not asyncio.get_running_loop():
+            return
+        await self._queue.join()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _next_batch(self):
+        """Block for the first claim, then gather more until max_batch or max_delay"""
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit(self, entries):
+        async with self.session_factory() as db, db.begin():
+            db.add_all(claim for claim, _, _, _ in entries)
+            await db.flush()
+            # Rollups, line item rows and benefit settlements are written in the same transaction as the claims
+            await record_claims(db, [(claim, claim_type) for claim, claim_type, _, _ in entries])
+            await record_line_items(db, [claim for claim, _, _, _ in entries])
+            for _, _, (benefit_hold, payable), _ in entries:
+                await settle_hold(db, benefit_hold, payable)
+
+    async def _flush(self, batch):
+        """Commit a batch; if it fails, retry claim by claim so one bad row only fails its caller"""
+        CLAIM_WRITE_BATCH_SIZE.observe(len(batch))
+        try:
+            await self._commit(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                logger.exception("Claim write failed")
+                if not batch[0][3].cancelled():
+                    batch[0][3].set_exception(e)
+                return
+            CLAIM_WRITE_FALLBACKS_TOTAL.inc()
+            logger.warning("Group commit failed, retrying claims individually", extra={"batch_size": len(batch)})
+            for entry in batch:
+                # The rolled-back claims are transient again; drop any id assigned by the failed flush
+                entry[0].id = None
+                await self._flush([entry])
+            return
+
+        for claim, _, _, future in batch:
+            if not future.cancelled():
+                future.set_result(claim.id)
@@ -0,0 +1,10 @@
+"""
+ClaimGuard AI - Test Configuration
+Points the API at a throwaway SQLite database before any test imports main
+"""
+
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='claimguard-test-')}/claims.db"
+os.environ.pop("ASYNC_DATABASE_URL", None)
@@ -0,0 +1,244 @@
+"""
+ClaimGuard AI - Duplicate Receipt Detector
+Perceptual hashing (dHash) of uploaded receipts plus a multi-index Hamming
+index, so near-duplicate resubmissions are caught locally before the final
+decision instead of relying only on the vision LLM's opinion.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import models
+
+# Optional: Pillow is needed to decode images for perceptual hashing
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+
+HASH_BITS = 64
+
+
+def compute_dhash(image_source):
+    """
+    Compute a 64-bit difference hash (dHash) of an image
+
+    Args:
+        image_source: Path or binary file object of the image
+
+    Returns:
+        int: 64-bit perceptual hash, robust to re-encoding and resizing
+    """
+    with Image.open(image_source) as image:
+        image = ImageOps.exif_transpose(image).convert('L').resize((9, 8), Image.LANCZOS)
+        pixels = list(image.getdata())
+
+    dhash = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            dhash = (dhash << 1) | (1 if left > right else 0)
+    return dhash
+
+
+def hash_to_hex(value):
+    """Fixed-width hex form stored in the database"""
+    return f"{value:016x}"
+
+
+class HammingIndex:
+    """
+    Multi-index hashing over 64-bit hashes
+
+    Each hash is split into 4 chunks of 16 bits, each with its own bucket
+    table. By pigeonhole, any hash within distance r of the query has at
+    least one chunk within distance r // 4, so a query probes only the
+    buckets of each query chunk and its few bit-flip neighbours.
+    """
+
+    CHUNKS = 4
+    CHUNK_BITS = HASH_BITS // CHUNKS
+    CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+    def __init__(self):
+        self.tables = [{} for _ in range(self.CHUNKS)]
+        self.size = 0
+
+    def _chunks(self, value):
+        return [(value >> (i * self.CHUNK_BITS)) & self.CHUNK_MASK for i in range(self.CHUNKS)]
+
+    def add(self, value, key):
+        """Index a hash under a caller key (e.g. the claim DB id)"""
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            table.setdefault(chunk, []).append((value, key))
+        self.size += 1
+
+    def _neighbours(self, chunk, radius):
+        """All chunk values within Hamming distance radius of chunk"""
+        found = [chunk]
+        frontier = [(chunk, -1)]
+        for _ in range(radius):
+            next_frontier = []
+            for value, last_bit in frontier:
+                for bit in range(last_bit + 1, self.CHUNK_BITS):
+                    flipped = value ^ (1 << bit)
+                    found.append(flipped)
+                    next_frontier.append((flipped, bit))
+            frontier = next_frontier
+        return found
+
+    def search(self, value, max_distance):
+        """
+        Find indexed hashes within max_distance of value
+
+        Returns:
+            list: (distance, key) pairs sorted by distance
+        """
+        chunk_radius = max_distance // self.CHUNKS
+        matches = {}
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            for probe in self._neighbours(chunk, chunk_radius):
+                for candidate, key in table.get(probe, ()):
+                    if key in matches:
+                        continue
+                    distance = bin(candidate ^ value).count('1')
+                    if distance <= max_distance:
+                        matches[key] = distance
+        return sorted((distance, key) for key, distance in matches.items())
+
+
+class DuplicateReceiptDetector:
+    """Finds previously submitted receipts that look like a new upload"""
+
+    def __init__(self, session_factory, policy_rules, sync_overlap_seconds=None, sync_interval=None, enabled=None):
+        """
+        Args:
+            session_factory: Callable returning a SQLAlchemy Session
+            policy_rules: Parsed policy rules (duplicate_receipt check config)
+            sync_overlap_seconds: How far before the previous sync each sync
+                re-scans created_at, so claims committed late (group commit,
+                other workers) are still picked up (env DUPLICATE_SYNC_OVERLAP_SECONDS,
+                default 60)
+            sync_interval: Minimum seconds between database syncs triggered by
+                lookups; claims saved by this worker are indexed immediately
+                (env DUPLICATE_SYNC_INTERVAL, default 5; 0 syncs on every lookup)
+            enabled: Run the check at all (env DUPLICATE_DETECTION_ENABLED, default true)
+        """
+        self.session_factory = session_factory
+        if sync_overlap_seconds is None:
+            sync_overlap_seconds = float(os.getenv("DUPLICATE_SYNC_OVERLAP_SECONDS", "60"))
+        self.sync_overlap = timedelta(seconds=sync_overlap_seconds)
+        if sync_interval is None:
+            sync_interval = float(os.getenv("DUPLICATE_SYNC_INTERVAL", "5"))
+        self.sync_interval = sync_interval
+        if enabled is None:
+            enabled = os.getenv("DUPLICATE_DETECTION_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.enabled = enabled
+        self.index = HammingIndex()
+        # Claim IDs already in the index: IDs are not committed in order, so no
+        # single high-water mark can tell which claims are still missing
+        self.indexed_ids = set()
+        self.synced_at = None
+        # Monotonic time before which lookups use the index without syncing
+        self._next_sync = None
+        self._lock = threading.Lock()
+
+        check = next(
+            (
+                check for check in policy_rules.get('fraud_detection_rules', {}).get('visual_checks', [])
+                if check.get('check_type') == 'duplicate_receipt'
+            ),
+            {}
+        )
+        self.threshold = check.get('confidence_threshold', 0.9)
+        self.action = check.get('action', 'AUTO_REJECT')
+        self.max_distance = int(round((1 - self.threshold) * HASH_BITS))
+
+    @property
+    def available(self):
+        return PIL_AVAILABLE and self.enabled
+
+    def sync(self):
+        """
+        Index claims saved since the last sync (including by other workers),
+        re-scanning an overlapping created_at window for late commits
+        """
+        started = datetime.utcnow()
+        query_from = self.synced_at - self.sync_overlap if self.synced_at else None
+        db = self.session_factory()
+        try:
+            query = (
+                db.query(models.Claim.id, models.Claim.receipt_phash)
+                .filter(models.Claim.receipt_phash.isnot(None))
+            )
+            if query_from is not None:
+                query = query.filter(models.Claim.created_at >= query_from)
+            rows = query.all()
+        finally:
+            db.close()
+
+        with self._lock:
+            for claim_db_id, receipt_phash in rows:
+                self._add(receipt_phash, claim_db_id)
+            if self.synced_at is None or started > self.synced_at:
+                self.synced_at = started
+
+    def _sync_due(self):
+        """Claim the next lookup-triggered sync, at most once per sync_interval"""
+        now = time.monotonic()
+        with self._lock:
+            if self._next_sync is not None and now < self._next_sync:
+                return False
+            self._next_sync = now + self.sync_interval
+            return True
+
+    def _add(self, receipt_phash, claim_db_id):
+        if claim_db_id not in self.indexed_ids:
+            self.index.add(int(receipt_phash, 16), claim_db_id)
+            self.indexed_ids.add(claim_db_id)
+
+    def add(self, receipt_phash, claim_db_id):
+        """Index a claim saved by this worker"""
+        with self._lock:
+            self._add(receipt_phash, claim_db_id)
+
+    def find_duplicate(self, receipt_phash):
+        """
+        Look up the closest earlier receipt within the policy threshold,
+        first syncing claims from other workers if sync_interval has passed
+
+        Returns:
+            dict: {claim_db_id, similarity} of the best match, or None
+        """
+        if self._sync_due():
+            self.sync()
+        with self._lock:
+            matches = self.index.search(int(receipt_phash, 16), self.max_distance)
+        if not matches:
+            return None
+        distance, claim_db_id = matches[0]
+        return {
+            'claim_db_id': claim_db_id,
+            'similarity': round(1 - distance / HASH_BITS, 4)
+        }
+
+    def apply_to_fraud_detection(self, fraud_detection, duplicate):
+        """Record a duplicate hit in the vision fraud_detection block"""
+        indicator = (
+            f"Near-duplicate of previously submitted receipt "
+            f"(claim #{duplicate['claim_db_id']}, similarity {duplicate['similarity']:.0%})"
+        )
+        fraud_detection['suspicious'] = True
+        fraud_detection.setdefault('fraud_indicators', []).append(indicator)
+        fraud_detection['duplicate_receipt'] = duplicate
+
+        if self.action == 'AUTO_REJECT':
+            fraud_detection['recommendation'] = 'REJECT'
+        elif fraud_detection.get('recommendation', 'APPROVE') == 'APPROVE':
+            fraud_detection['recommendation'] = 'MANUAL_REVIEW'
+        return fraud_detection
@@ -0,0 +1,123 @@
+"""
+ClaimGuard AI - Enrollment Store
+Policy inception dates and declared pre-existing conditions per insured,
+read on every claim for waiting-period checks. Rows live in the enrollments
+table; recently used ones are kept in memory with their conditions already
+compiled, so the check needs no database round trip on a hit.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional, Pattern, Tuple
+
+import models
+from policy_engine import compile_word_pattern
+
+
+@dataclass(frozen=True)
+class EnrollmentRecord:
+    """Immutable enrollment snapshot with its pre-existing conditions precompiled"""
+    insured_id: str
+    policy_product: Optional[str]
+    inception_date: date
+    pre_existing_conditions: Tuple[str, ...]
+    pre_existing_pattern: Optional[Pattern]
+
+    def to_dict(self):
+        return {
+            "insured_id": self.insured_id,
+            "policy_product": self.policy_product,
+            "inception_date": self.inception_date.isoformat(),
+            "pre_existing_conditions": list(self.pre_existing_conditions)
+        }
+
+
+def to_record(entry):
+    conditions = tuple(entry.pre_existing_conditions or ())
+    return EnrollmentRecord(
+        insured_id=entry.insured_id,
+        policy_product=entry.policy_product,
+        inception_date=entry.inception_date,
+        pre_existing_conditions=conditions,
+        pre_existing_pattern=compile_word_pattern(conditions)
+    )
+
+
+class EnrollmentStore:
+    """Enrollment lookups by insured ID with an in-memory TTL / LRU front"""
+
+    def __init__(self, session_factory, ttl_seconds=None, max_entries=None):
+        """
+        Args:
+            session_factory: Callable returning an AsyncSession
+            ttl_seconds: How long a looked-up enrollment (or its absence) is
+                trusted (env ENROLLMENT_CACHE_TTL_SECONDS, default 60)
+            max_entries: Size bound (env ENROLLMENT_CACHE_MAX_ENTRIES, default 100000)
+        """
+        self.session_factory = session_factory
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("ENROLLMENT_CACHE_TTL_SECONDS", "60"))
+        if max_entries is None:
+            max_entries = int(os.getenv("ENROLLMENT_CACHE_MAX_ENTRIES", "100000"))
+        self.ttl = ttl_seconds
+        self.max_entries = max(1, max_entries)
+
+        # insured_id -> (expires_at, EnrollmentRecord or None)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _cached(self, insured_id):
+        with self._lock:
+            cached = self._cache.get(insured_id)
+            if cached is None or cached[0] < time.monotonic():
+                self.misses += 1
+                return False, None
+            self._cache.move_to_end(insured_id)
+            self.hits += 1
+            return True, cached[1]
+
+    def _remember(self, insured_id, record):
+        with self._lock:
+            self._cache[insured_id] = (time.monotonic() + self.ttl, record)
+            self._cache.move_to_end(insured_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    async def get(self, insured_id):
+        """EnrollmentRecord of an insured, or None if not enrolled"""
+        if not insured_id:
+            return None
+        found, record = self._cached(insured_id)
+        if found:
+            return record
+        async with self.session_factory() as db:
+            entry = await db.get(models.Enrollment, insured_id)
+            record = to_record(entry) if entry is not None else None
+        self._remember(insured_id, record)
+        return record
+
+    async def upsert(self, insured_id, inception_date, pre_existing_conditions=(), policy_product=None):
+        """Create or replace an enrollment and return its record"""
+        now = datetime.utcnow()
+        async with self.session_factory() as db, db.begin():
+            entry = await db.get(models.Enrollment, insured_id, with_for_update=True)
+            if entry is None:
+                entry = models.Enrollment(insured_id=insured_id, created_at=now)
+                db.add(entry)
+            entry.inception_date = inception_date
+            entry.pre_existing_conditions = list(pre_existing_conditions or [])
+            entry.policy_product = policy_product
+            entry.updated_at = now
+            record = to_record(entry)
+        self._remember(insured_id, record)
+        return record
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
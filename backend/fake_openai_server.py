@@ -0,0 +1,181 @@
+"""
+ClaimGuard AI - Fake OpenAI Server
+Offline stand-in for the chat-completions API used by the Vision Agent and
+Medical Judge, with configurable latency, error rate and canned responses.
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Usage:
+    python fake_openai_server.py --port 8900 --vision-latency lognormal:1.5:0.3 --error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import uvicorn
+
+
+DEFAULT_VISION_FIXTURE = Path(__file__).parent.parent / "data" / "claims" / "claim_valid.json"
+
+
+class LatencyModel:
+    """
+    Response delay distribution parsed from a spec string
+
+    Specs: 'fixed:0.5', 'uniform:0.2:1.5', 'normal:0.8:0.2',
+    'lognormal:<median>:<sigma>' (all in seconds)
+    """
+
+    def __init__(self, spec="fixed:0", seed=None):
+        kind, *params = spec.split(":")
+        self.kind = kind
+        self.params = [float(param) for param in params]
+        self.rng = random.Random(seed)
+        if kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution '{kind}'")
+
+    def sample(self):
+        if self.kind == "fixed":
+            return self.params[0] if self.params else 0.0
+        if self.kind == "uniform":
+            return self.rng.uniform(*self.params)
+        if self.kind == "normal":
+            return max(0.0, self.rng.gauss(*self.params))
+        median, sigma = self.params
+        return self.rng.lognormvariate(math.log(median), sigma)
+
+
+def load_vision_fixture(path):
+    """Canned vision extraction: a claim JSON plus a clean fraud_detection block"""
+    data = json.loads(Path(path).read_text(encoding='utf-8'))
+    data.setdefault('diagnosis_or_specialty', 'Respiratory Infection')
+    data.setdefault('fraud_detection', {
+        'suspicious': False,
+        'fraud_indicators': [],
+        'confidence_score': 0.95,
+        'recommendation': 'APPROVE'
+    })
+    return data
+
+
+def judge_verdicts(prompt):
+    """PASS verdict for every item listed in the Medical Judge prompt"""
+    match = re.search(r"Claimed Medications: (\[.*?\])", prompt)
+    items = json.loads(match.group(1)) if match else []
+    return {
+        item: {"status": "PASS", "severity": "INFO", "reason": "Consistent with diagnosis (fake server)"}
+        for item in items
+    }
+
+
+def create_app(vision_latency, judge_latency, error_rate=0.0, vision_fixture=DEFAULT_VISION_FIXTURE, seed=None):
+    """
+    Build the fake API app
+
+    Args:
+        vision_latency: LatencyModel for requests carrying an image
+        judge_latency: LatencyModel for text-only (Medical Judge) requests
+        error_rate: Share of requests answered with HTTP 500
+        vision_fixture: Claim JSON returned as the vision extraction
+    """
+    app = FastAPI(title="Fake OpenAI API")
+    vision_result = load_vision_fixture(vision_fixture)
+    rng = random.Random(seed)
+    app.state.stats = {"requests": 0, "errors": 0, "vision": 0, "judge": 0}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats = app.state.stats
+        stats["requests"] += 1
+
+        messages = body.get("messages", [])
+        is_vision = any(
+            isinstance(message.get("content"), list)
+            and any(part.get("type") == "image_url" for part in message["content"])
+            for message in messages
+        )
+        stats["vision" if is_vision else "judge"] += 1
+
+        await asyncio.sleep((vision_latency if is_vision else judge_latency).sample())
+
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse(status_code=500, content={
+                "error": {"message": "Injected failure (fake server)", "type": "server_error"}
+            })
+
+        if is_vision:
+            content = json.dumps(vision_result)
+        else:
+            prompt = " ".join(
+                message["content"] for message in messages if isinstance(message.get("content"), str)
+            )
+            content = json.dumps(judge_verdicts(prompt))
+
+        prompt_tokens = len(json.dumps(messages)) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return app.state.stats
+
+    return app
+
+
+def add_server_arguments(parser):
+    parser.add_argument("--vision-latency", default="lognormal:1.5:0.3",
+                        help="Vision call delay distribution (e.g. fixed:0.5, uniform:1:3, lognormal:1.5:0.3)")
+    parser.add_argument("--judge-latency", default="lognormal:0.8:0.3",
+                        help="Medical Judge call delay distribution")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered with HTTP 500")
+    parser.add_argument("--vision-fixture", default=str(DEFAULT_VISION_FIXTURE),
+                        help="Claim JSON returned as the vision extraction")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def build_app_from_args(args):
+    return create_app(
+        vision_latency=LatencyModel(args.vision_latency, args.seed),
+        judge_latency=LatencyModel(args.judge_latency, args.seed),
+        error_rate=args.error_rate,
+        vision_fixture=args.vision_fixture,
+        seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline fake of the OpenAI chat-completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(build_app_from_args(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+ClaimGuard AI - Receipt Image Preprocessor
+Normalizes receipt images before the vision upload: auto-orients, converts
+to grayscale, downscales and re-encodes to a size-bounded JPEG/WebP.
+"""
+
+import io
+import logging
+import os
+
+# Optional: Pillow is needed to decode and re-encode images
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger("claimguard.preprocessor")
+
+
+# Magic-byte prefixes for formats we may pass through untouched
+MIME_SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+# EXIF Orientation tag; 1 means the pixels are already upright
+EXIF_ORIENTATION = 0x0112
+
+OUTPUT_FORMATS = {
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+}
+
+
+def detect_mime_type(image_bytes, default='image/jpeg'):
+    """Detect the image MIME type from its leading bytes"""
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, mime_type in MIME_SIGNATURES:
+        if image_bytes.startswith(signature):
+            return mime_type
+    return default
+
+
+class PreparedImage:
+    """Image bytes ready for upload plus before/after size bookkeeping"""
+
+    def __init__(self, data, mime_type, original_bytes, width=None, height=None):
+        self.data = data
+        self.mime_type = mime_type
+        self.original_bytes = original_bytes
+        self.prepared_bytes = len(data)
+        self.width = width
+        self.height = height
+
+    def stats(self):
+        """Summary recorded alongside the vision result"""
+        return {
+            'original_bytes': self.original_bytes,
+            'prepared_bytes': self.prepared_bytes,
+            'mime_type': self.mime_type,
+            'width': self.width,
+            'height': self.height,
+        }
+
+
+class ImagePreprocessor:
+    """Configurable receipt normalization stage"""
+
+    def __init__(self, max_dimension=None, max_bytes=None, output_format=None, grayscale=None):
+        """
+        Args:
+            max_dimension: Longest side in pixels (env VISION_MAX_DIMENSION, default 2048)
+            max_bytes: Target encoded size (env VISION_MAX_IMAGE_BYTES, default 1 MB)
+            output_format: JPEG or WEBP (env VISION_IMAGE_FORMAT, default JPEG)
+            grayscale: Convert to grayscale (env VISION_GRAYSCALE, default true)
+        """
+        if max_dimension is None:
+            max_dimension = int(os.getenv('VISION_MAX_DIMENSION', '2048'))
+        if max_bytes is None:
+            max_bytes = int(os.getenv('VISION_MAX_IMAGE_BYTES', str(1024 * 1024)))
+        if output_format is None:
+            output_format = os.getenv('VISION_IMAGE_FORMAT', 'JPEG')
+        if grayscale is None:
+            grayscale = os.getenv('VISION_GRAYSCALE', 'true').lower() in ('1', 'true', 'yes')
+
+        output_format = output_format.upper()
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported VISION_IMAGE_FORMAT '{output_format}', expected JPEG or WEBP")
+
+        self.max_dimension = max_dimension
+        self.max_bytes = max_bytes
+        self.output_format = output_format
+        self.grayscale = grayscale
+
+    def prepare(self, image_bytes):
+        """
+        Normalize raw upload bytes
+
+        Falls back to the original bytes (with a sniffed MIME type) when
+        Pillow is missing, the image cannot be decoded, or re-encoding
+        would not make it smaller and the original needs no EXIF rotation.
+        """
+        original = PreparedImage(image_bytes, detect_mime_type(image_bytes), len(image_bytes))
+        if not PIL_AVAILABLE:
+            return original
+
+        try:
+            with Image.open(io.BytesIO(image_bytes)) as image:
+                # The vision model ignores EXIF, so rotated photos must be re-encoded upright
+                needs_rotation = image.getexif().get(EXIF_ORIENTATION, 1) != 1
+                image = ImageOps.exif_transpose(image)
+                image = image.convert('L') if self.grayscale else image.convert('RGB')
+                image.thumbnail((self.max_dimension, self.max_dimension), Image.LANCZOS)
+                data = self._encode_within_budget(image)
+                width, height = image.size
+        except Exception as e:
+            logger.warning("Image preprocessing failed, sending original", extra={"error": str(e)})
+            return original
+
+        if (len(data) >= len(image_bytes) and not needs_rotation
+                and original.mime_type in OUTPUT_FORMATS.values()):
+            return original
+        return PreparedImage(data, OUTPUT_FORMATS[self.output_format], len(image_bytes), width, height)
+
+    def _encode_within_budget(self, image):
+        """Encode at decreasing quality, then smaller size, until under max_bytes"""
+        while True:
+            for quality in (85, 75, 65, 50):
+                buffer = io.BytesIO()
+                image.save(buffer, format=self.output_format, quality=quality, optimize=True)
+                if buffer.tell() <= self.max_bytes:
+                    return buffer.getvalue()
+            if max(image.size) <= 512:
+                return buffer.getvalue()
+            image = image.resize((image.width * 3 // 4, image.height * 3 // 4), Image.LANCZOS)
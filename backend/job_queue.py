@@ -0,0 +1,279 @@
+"""
+ClaimGuard AI - Background Job Queue
+Durable, database-backed queue plus an asyncio worker pool so clients can
+submit a receipt, get a job ID immediately, and poll for the result.
+
+A worker holds a lease on its job, renewed by heartbeats while the handler
+runs. Only jobs whose lease stopped being renewed (dead or hung worker) are
+claimed again, and a worker whose lease was taken over stops and cannot
+record an outcome.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, update
+
+import models
+
+logger = logging.getLogger("claimguard.jobs")
+
+
+class JobLeaseLostError(Exception):
+    """Another worker claimed the job after our heartbeats stopped reaching the database"""
+
+
+class JobQueue:
+    """Claim-analysis queue stored in the analysis_jobs table (no external broker)"""
+
+    def __init__(self, session_factory, handler, workers=None, poll_interval=None,
+                 stale_after_seconds=None, max_attempts=None):
+        """
+        Args:
+            session_factory: Callable returning a SQLAlchemy Session
+            handler: async callable(job) -> result dict for a claimed job
+            workers: Worker coroutines per process (env JOB_WORKERS, default 4)
+            poll_interval: Idle poll delay in seconds (env JOB_POLL_INTERVAL, default 0.5)
+            stale_after_seconds: RUNNING jobs without a heartbeat for this long
+                are retried (env JOB_STALE_SECONDS, default 600); heartbeats are
+                sent every third of it
+            max_attempts: Attempts before a job is marked FAILED (env JOB_MAX_ATTEMPTS, default 3)
+        """
+        self.session_factory = session_factory
+        self.handler = handler
+        if workers is None:
+            workers = int(os.getenv("JOB_WORKERS", "4"))
+        if poll_interval is None:
+            poll_interval = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+        if stale_after_seconds is None:
+            stale_after_seconds = int(os.getenv("JOB_STALE_SECONDS", "600"))
+        if max_attempts is None:
+            max_attempts = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = timedelta(seconds=stale_after_seconds)
+        self.heartbeat_interval = max(0.01, stale_after_seconds / 3)
+        self.max_attempts = max_attempts
+
+        self._tasks = []
+        self._wakeup = None
+        self._loop = None
+
+    def submit(self, filename, content_type, content, content_hash):
+        """Persist a new job and return its ID"""
+        job_id = str(uuid.uuid4())
+        db = self.session_factory()
+        try:
+            db.add(models.AnalysisJob(
+                id=job_id,
+                status="QUEUED",
+                attempts=0,
+                filename=filename,
+                content_type=content_type,
+                content=bytes(content),
+                content_hash=content_hash
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+        # submit() usually runs in a worker thread (asyncio.to_thread); asyncio.Event is not thread-safe
+        if self._wakeup and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return job_id
+
+    def get(self, job_id):
+        """
+        Job status for polling
+
+        Returns:
+            dict: Job metadata plus the claim result once COMPLETED, or None if unknown
+        """
+        db = self.session_factory()
+        try:
+            job = db.get(models.AnalysisJob, job_id)
+            if job is None:
+                return None
+
+            status = {
+                "job_id": job.id,
+                "status": job.status,
+                "filename": job.filename,
+                "attempts": job.attempts,
+                "created_at": job.created_at.isoformat() if job.created_at else None,
+                "started_at": job.started_at.isoformat() if job.started_at else None,
+                "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+                "db_id": job.claim_db_id,
+                "error": job.error,
+                "result": job.result
+            }
+            if job.claim_db_id is not None:
+                claim = db.get(models.Claim, job.claim_db_id)
+                if claim is not None:
+                    status["result"] = claim.full_data
+            return status
+        finally:
+            db.close()
+
+    def _claim_next(self):
+        """Atomically move the oldest runnable job to RUNNING; returns it or None"""
+        db = self.session_factory()
+        try:
+            jobs = models.AnalysisJob
+            heartbeats = models.AnalysisJobHeartbeat
+            now = datetime.utcnow()
+            stale_before = now - self.stale_after
+            last_seen = func.coalesce(heartbeats.heartbeat_at, jobs.started_at)
+            candidates = (
+                db.query(jobs.id, jobs.status, jobs.attempts)
+                .outerjoin(heartbeats, heartbeats.job_id == jobs.id)
+                .filter(
+                    (jobs.status == "QUEUED")
+                    | ((jobs.status == "RUNNING") & (last_seen < stale_before))
+                )
+                .order_by(jobs.created_at.asc())
+                .limit(self.workers * 2)
+                .all()
+            )
+
+            for job_id, status, attempts in candidates:
+                # Guarded update: only one worker (in any process) wins each job
+                claimed = db.execute(
+                    update(jobs)
+                    .where(jobs.id == job_id, jobs.status == status, jobs.attempts == attempts)
+                    .values(status="RUNNING", attempts=attempts + 1, started_at=now)
+                ).rowcount
+                if not claimed:
+                    db.rollback()
+                    continue
+                # Take the lease in the same transaction; the new attempt number fences out the old holder
+                db.merge(heartbeats(job_id=job_id, attempt=attempts + 1, heartbeat_at=now))
+                db.commit()
+
+                job = db.get(jobs, job_id)
+                if job.attempts > self.max_attempts:
+                    self._finish(job_id, job.attempts, error="Exceeded maximum attempts")
+                    continue
+                db.expunge(job)
+                return job
+            return None
+        finally:
+            db.close()
+
+    def _heartbeat(self, job_id, attempt):
+        """
+        Renew the lease of a running job
+
+        Returns:
+            bool: False if another worker has claimed the job since
+        """
+        heartbeats = models.AnalysisJobHeartbeat
+        db = self.session_factory()
+        try:
+            renewed = db.execute(
+                update(heartbeats)
+                .where(heartbeats.job_id == job_id, heartbeats.attempt == attempt)
+                .values(heartbeat_at=datetime.utcnow())
+            ).rowcount
+            db.commit()
+            return bool(renewed)
+        finally:
+            db.close()
+
+    def _finish(self, job_id, attempt, result=None, error=None):
+        """
+        Record the outcome and drop the stored payload, unless the job was
+        claimed again by another worker
+
+        Returns:
+            bool: True if the outcome was recorded
+        """
+        db = self.session_factory()
+        try:
+            job = db.get(models.AnalysisJob, job_id, with_for_update=True)
+            if job.attempts != attempt or job.status != "RUNNING":
+                db.rollback()
+                return False
+            job.status = "FAILED" if error else "COMPLETED"
+            job.error = error
+            job.finished_at = datetime.utcnow()
+            job.content = None
+            if result is not None:
+                job.claim_db_id = result.get('db_id')
+                # Keep the raw result only when the claim itself was not saved
+                job.result = None if job.claim_db_id is not None else result
+            db.execute(delete(models.AnalysisJobHeartbeat).where(models.AnalysisJobHeartbeat.job_id == job_id))
+            db.commit()
+            return True
+        finally:
+            db.close()
+
+    async def _run_with_lease(self, job):
+        """Run the handler while renewing the job's lease; stop it if the lease is lost"""
+        task = asyncio.create_task(self.handler(job))
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.heartbeat_interval)
+                if done:
+                    return task.result()
+                try:
+                    renewed = await asyncio.to_thread(self._heartbeat, job.id, job.attempts)
+                except Exception as e:
+                    # Keep going: the lease only lapses after stale_after without heartbeats
+                    logger.warning("Job heartbeat failed", extra={"job_id": job.id, "error": str(e)})
+                    continue
+                if not renewed:
+                    raise JobLeaseLostError(f"Job {job.id} was claimed by another worker")
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    async def _worker(self, worker_number):
+        while True:
+            try:
+                job = await asyncio.to_thread(self._claim_next)
+            except Exception as e:
+                logger.exception("Job worker failed to claim a job", extra={"worker": worker_number})
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                result = await self._run_with_lease(job)
+                recorded = await asyncio.to_thread(self._finish, job.id, job.attempts, result)
+            except asyncio.CancelledError:
+                raise
+            except JobLeaseLostError as e:
+                logger.warning("Job lease lost, abandoning attempt", extra={"job_id": job.id, "attempt": job.attempts})
+                continue
+            except Exception as e:
+                error = getattr(e, 'detail', None) or str(e)
+                logger.error("Job failed", extra={"job_id": job.id, "error": str(error)})
+                recorded = await asyncio.to_thread(self._finish, job.id, job.attempts, None, str(error))
+            if not recorded:
+                logger.warning("Job was claimed by another worker, outcome discarded",
+                               extra={"job_id": job.id, "attempt": job.attempts})
+
+    def start(self):
+        """Start the worker pool on the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        logger.info("Started job workers", extra={"workers": self.workers})
+
+    async def stop(self):
+        """Cancel workers; RUNNING jobs are retried once they go stale"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
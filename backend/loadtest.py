@@ -0,0 +1,273 @@
+"""
+ClaimGuard AI - End-to-End Load Test
+Starts the API against the offline fake OpenAI server, drives /api/analyze
+at a target request rate with the receipts in data/receipts/, and reports
+latency percentiles, error rates and database write throughput.
+
+The same few receipts are sent over and over, so by default the API runs
+with duplicate detection and the vision/medical caches switched off, and
+every request is filed under its own insured ID; otherwise later requests
+would only measure the duplicate-rejection and exhausted-sub-limit paths.
+
+Usage:
+    python loadtest.py --rps 20 --duration 60
+    python loadtest.py --rps 50 --duration 120 --workers 4 --error-rate 0.02 \\
+        --vision-latency lognormal:2:0.4 --json-report load_report.json
+"""
+
+import argparse
+import asyncio
+import json
+import mimetypes
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from sqlalchemy import create_engine, text
+
+from fake_openai_server import add_server_arguments
+
+
+BACKEND_DIR = Path(__file__).parent
+RECEIPTS_DIR = BACKEND_DIR.parent / "data" / "receipts"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def wait_until_ready(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited early with code {process.returncode}: {url}")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def count_claims(database_url):
+    engine = create_engine(database_url)
+    try:
+        with engine.connect() as connection:
+            return connection.execute(text("SELECT COUNT(*) FROM claims")).scalar()
+    finally:
+        engine.dispose()
+
+
+def scrape_db_writes(metrics_text):
+    """(count, total seconds) of db_write observations from /metrics"""
+    values = {}
+    for suffix in ("count", "sum"):
+        match = re.search(
+            rf'^claimguard_stage_duration_seconds_{suffix}{{stage="db_write"}} (\S+)$', metrics_text, re.MULTILINE
+        )
+        values[suffix] = float(match.group(1)) if match else 0.0
+    return values["count"], values["sum"]
+
+
+async def drive_load(base_url, receipts, rps, duration, timeout):
+    """
+    Open-loop load: requests start on a fixed schedule regardless of how
+    long earlier ones take, so queueing inside the API shows up as latency
+
+    Returns:
+        list: (latency seconds, status code or error name) per request
+    """
+    samples = []
+    interval = 1.0 / rps
+    total = int(rps * duration)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def send(index):
+            name, content, content_type = receipts[index % len(receipts)]
+            start = time.perf_counter()
+            try:
+                # One insured per request: every claim reserves and settles a fresh sub-limit
+                response = await client.post(
+                    "/api/analyze", params={"insured_id": f"LOAD-{index}"},
+                    files={"file": (name, content, content_type)}
+                )
+                outcome = response.status_code
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            samples.append((time.perf_counter() - start, outcome))
+
+        started = time.perf_counter()
+        tasks = []
+        for index in range(total):
+            delay = started + index * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(index)))
+        await asyncio.gather(*tasks)
+
+    return samples
+
+
+def build_report(samples, elapsed, claims_written, db_writes, fake_stats, args):
+    latencies = sorted(latency for latency, _ in samples)
+    outcomes = {}
+    for _, outcome in samples:
+        outcomes[str(outcome)] = outcomes.get(str(outcome), 0) + 1
+    errors = sum(count for outcome, count in outcomes.items() if outcome != "200")
+    db_count, db_seconds = db_writes
+
+    return {
+        "target_rps": args.rps,
+        "duration_seconds": args.duration,
+        "api_workers": args.workers,
+        "requests": len(samples),
+        "achieved_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "outcomes": outcomes,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "latency_seconds": {
+            "p50": round(percentile(latencies, 0.50), 4),
+            "p90": round(percentile(latencies, 0.90), 4),
+            "p95": round(percentile(latencies, 0.95), 4),
+            "p99": round(percentile(latencies, 0.99), 4),
+            "max": round(latencies[-1], 4) if latencies else 0.0,
+        },
+        "database": {
+            "claims_written": claims_written,
+            "claims_per_sec": round(claims_written / elapsed, 2) if elapsed else 0.0,
+            # /metrics is per process, so this covers one worker when --workers > 1
+            "mean_write_ms": round(db_seconds / db_count * 1000, 3) if db_count else None,
+        },
+        "fake_openai": fake_stats,
+    }
+
+
+def print_report(report):
+    latency = report["latency_seconds"]
+    database = report["database"]
+    print("=" * 80)
+    print("CLAIMGUARD AI - LOAD TEST REPORT")
+    print("=" * 80)
+    print(f"Target RPS:      {report['target_rps']}  (achieved {report['achieved_rps']})")
+    print(f"Requests:        {report['requests']} over {report['duration_seconds']}s, "
+          f"{report['api_workers']} API worker(s)")
+    print(f"Outcomes:        {report['outcomes']}")
+    print(f"Error rate:      {report['error_rate']:.2%}")
+    print(f"Latency (s):     p50 {latency['p50']}  p90 {latency['p90']}  p95 {latency['p95']}  "
+          f"p99 {latency['p99']}  max {latency['max']}")
+    print(f"DB throughput:   {database['claims_written']} claims, {database['claims_per_sec']} claims/sec, "
+          f"mean write {database['mean_write_ms']} ms")
+    print(f"Fake OpenAI:     {report['fake_openai']}")
+    print("=" * 80)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /api/analyze against a fake OpenAI server")
+    parser.add_argument("--rps", type=float, default=10, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes for the API")
+    parser.add_argument("--receipts", default=str(RECEIPTS_DIR), help="Directory of receipt images")
+    parser.add_argument("--database-url", help="Database for the API (default: fresh SQLite file)")
+    parser.add_argument("--keep-caches", action="store_true",
+                        help="Leave vision/medical caches on (by default every request reaches the fake LLM)")
+    parser.add_argument("--keep-duplicate-detection", action="store_true",
+                        help="Leave duplicate detection on (repeated receipts are then rejected as duplicates)")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout (seconds)")
+    parser.add_argument("--json-report", help="Also write the report to this JSON file")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    receipts = []
+    for path in sorted(Path(args.receipts).iterdir()):
+        content_type = mimetypes.guess_type(path.name)[0] or ""
+        if content_type.startswith("image/"):
+            receipts.append((path.name, path.read_bytes(), content_type))
+    if not receipts:
+        parser.error(f"No receipt images found in {args.receipts}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_url = args.database_url or f"sqlite:///{Path(tmp_dir) / 'load_test.db'}"
+        fake_port, api_port = free_port(), free_port()
+
+        fake_command = [
+            sys.executable, "fake_openai_server.py", "--port", str(fake_port),
+            "--vision-latency", args.vision_latency, "--judge-latency", args.judge_latency,
+            "--error-rate", str(args.error_rate), "--vision-fixture", args.vision_fixture,
+        ]
+        if args.seed is not None:
+            fake_command += ["--seed", str(args.seed)]
+
+        api_env = {
+            **os.environ,
+            "OPENAI_API_KEY": "sk-load-test",
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+            "DATABASE_URL": database_url,
+            "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+            "JOB_WORKERS": os.environ.get("JOB_WORKERS", "1"),
+        }
+        if not args.keep_caches:
+            # 0 entries disables a cache outright: no lookups or writes against the database
+            api_env.update({"VISION_CACHE_MAX_ENTRIES": "0", "MEDICAL_CACHE_MAX_ENTRIES": "0"})
+        if not args.keep_duplicate_detection:
+            api_env["DUPLICATE_DETECTION_ENABLED"] = "false"
+        api_command = [
+            sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+            "--port", str(api_port), "--workers", str(args.workers), "--log-level", "warning",
+        ]
+
+        fake = subprocess.Popen(fake_command, cwd=BACKEND_DIR)
+        api = None
+        try:
+            wait_until_ready(f"http://127.0.0.1:{fake_port}/stats", fake)
+            api = subprocess.Popen(api_command, cwd=BACKEND_DIR, env=api_env, stdout=subprocess.DEVNULL)
+            wait_until_ready(f"http://127.0.0.1:{api_port}/health", api)
+
+            base_url = f"http://127.0.0.1:{api_port}"
+            claims_before = count_claims(database_url)
+            writes_before = scrape_db_writes(httpx.get(f"{base_url}/metrics").text)
+
+            print(f"[LOAD] {args.rps} req/s for {args.duration}s against {base_url} "
+                  f"({len(receipts)} receipts, fake OpenAI on :{fake_port})")
+            started = time.perf_counter()
+            samples = asyncio.run(drive_load(base_url, receipts, args.rps, args.duration, args.timeout))
+            elapsed = time.perf_counter() - started
+
+            writes_after = scrape_db_writes(httpx.get(f"{base_url}/metrics").text)
+            claims_written = count_claims(database_url) - claims_before
+            fake_stats = httpx.get(f"http://127.0.0.1:{fake_port}/stats").json()
+        finally:
+            for process in (api, fake):
+                if process is not None:
+                    process.terminate()
+                    process.wait(timeout=30)
+
+    report = build_report(
+        samples, elapsed, claims_written,
+        (writes_after[0] - writes_before[0], writes_after[1] - writes_before[1]),
+        fake_stats, args
+    )
+    print_report(report)
+    if args.json_report:
+        Path(args.json_report).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"[SAVED] Report written to {args.json_report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,19 @@ Provides REST API endpoints for receipt analysis and claim adjudication
 import os
 import sys
 import json
-import tempfile
-import shutil
+import asyncio
+import io
+import hashlib
+import mimetypes
+import zipfile
+import zlib
+import uuid
+import time
+import base64
+from datetime import datetime, date
+import logging
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 # Fix Windows encoding issue for Unicode characters (like ₹ Rupee symbol)
 if sys.platform == 'win32':
@@ -20,31 +29,67 @@ if sys.platform == 'win32':
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from structured_logging import setup_logging, log_context, bind_claim_id
+setup_logging()
+logger = logging.getLogger("claimguard.api")
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
 import uvicorn
 
 # Import our AI agents
-from vision_agent import VisionAgent
-from policy_engine import PolicyAdjudicator
+from vision_agent import VisionAgent, UploadTooLargeError
+from policy_engine import ClaimDataError, PolicyRulesError, UnknownPolicyError
+from policy_store import PolicyStore, PolicyRegistry, DEFAULT_PRODUCT
 from medical_judge import MedicalJudge
+from pipeline import StagePipeline
+from vision_cache import VisionCache
+from medical_cache import MedicalVerdictCache
+from duplicate_detector import DuplicateReceiptDetector, compute_dhash, hash_to_hex
+from job_queue import JobQueue
+from claim_writer import ClaimWriter
+from benefit_ledger import BenefitLedger, LedgerContentionError, insured_id_of
+from enrollment_store import EnrollmentStore
+from analytics import rollup_query, format_rollups, line_item_query, format_line_items, ROLLUP_DIMENSIONS, LINE_ITEM_DIMENSIONS
+from metrics import REGISTRY, STAGE_DURATION, ANALYSIS_DURATION, CLAIMS_TOTAL, OVERRIDES_TOTAL
 
 
 
 # Database imports
-from database import engine, get_db
+from database import engine, async_engine, SessionLocal, AsyncSessionLocal, get_async_db
 import models
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
 
+# Columns added to tables that predate them (create_all never alters an existing table)
+CLAIM_COLUMN_UPGRADES = {
+    "receipt_phash": "ALTER TABLE claims ADD COLUMN receipt_phash VARCHAR(16)",
+}
+
+
+def prepare_database(bind):
+    """Create missing tables, upgrade an existing claims table and create its indexes"""
+    models.Base.metadata.create_all(bind=bind)
+    existing_columns = {column["name"] for column in inspect(bind).get_columns("claims")}
+    with bind.begin() as connection:
+        for column, statement in CLAIM_COLUMN_UPGRADES.items():
+            if column not in existing_columns:
+                connection.execute(text(statement))
+                logger.info("Added missing claims column", extra={"column": column})
+    # create_all skips indexes on tables that already exist
+    for index in models.Claim.__table__.indexes:
+        index.create(bind=bind, checkfirst=True)
+
+
 # Create tables on startup
 try:
-    models.Base.metadata.create_all(bind=engine)
-    print("\n[DB] Database tables created successfully")
+    prepare_database(engine)
+    logger.info("Database tables created successfully")
 except Exception as e:
-    print(f"\n[WARN] Database connection failed: {e}")
-    print("[WARN] Running without persistence")
+    logger.warning("Database connection failed, running without persistence", extra={"error": str(e)})
 
 # ... (Previous imports)
 
@@ -68,6 +113,71 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+# Multipart overhead (boundaries, part headers) allowed on top of the file size limits
+UPLOAD_REQUEST_OVERHEAD_BYTES = 64 * 1024
+
+
+def request_body_limit(path):
+    """Largest request body accepted on an upload endpoint, or None for no limit"""
+    if path == "/api/analyze/batch":
+        return BATCH_MAX_REQUEST_BYTES + UPLOAD_REQUEST_OVERHEAD_BYTES
+    if path in ("/api/analyze", "/api/jobs"):
+        return vision_agent.max_upload_bytes + UPLOAD_REQUEST_OVERHEAD_BYTES
+    return None
+
+
+class RequestBodyLimitMiddleware:
+    """
+    Enforce the upload size limits on the raw request stream, before the
+    multipart parser buffers (and spools to disk) the whole body: a declared
+    Content-Length over the limit is refused outright, and a body that grows
+    past it is cut off with 413
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limit = request_body_limit(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+        
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse(
+                status_code=413, content={"detail": f"Request body exceeds limit of {limit:,} bytes"}
+            )
+            return await response(scope, receive, send)
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=f"Request body exceeds limit of {limit:,} bytes")
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+
+# Added before attach_request_id so it runs inside it: a 413 raised while the
+# route reads the body must not be wrapped by that middleware's task group
+app.add_middleware(RequestBodyLimitMiddleware)
+
+
+@app.middleware("http")
+async def attach_request_id(request: Request, call_next):
+    """Tag every log record of a request with its X-Request-ID (generated if absent)"""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    with log_context(request_id=request_id):
+        response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
 # Initialize AI agents
 # Get the absolute path to the data directory
 # Support both local development and Docker environments
@@ -82,8 +192,41 @@ else:
     POLICY_RULES_PATH = LOCAL_DATA_PATH
 
 vision_agent = VisionAgent()
-policy_adjudicator = PolicyAdjudicator(policy_path=str(POLICY_RULES_PATH))
-medical_judge = MedicalJudge()
+policy_store = PolicyStore(POLICY_RULES_PATH)
+# Per-product rule sets live next to the default rules, in policies/<product>.json
+POLICIES_DIR = Path(os.getenv("POLICIES_DIR", str(POLICY_RULES_PATH.parent / "policies")))
+policy_registry = PolicyRegistry(policy_store, POLICIES_DIR)
+medical_judge = MedicalJudge(verdict_cache=MedicalVerdictCache(SessionLocal))
+vision_cache = VisionCache(SessionLocal)
+duplicate_detector = DuplicateReceiptDetector(SessionLocal, policy_store.current.policy_rules)
+claim_writer = ClaimWriter(AsyncSessionLocal)
+benefit_ledger = BenefitLedger(AsyncSessionLocal)
+enrollment_store = EnrollmentStore(AsyncSessionLocal)
+
+
+async def run_medical_judge(results):
+    """Pipeline stage: clinical necessity check (LLM round trip)"""
+    vision_result = results['vision']
+    with STAGE_DURATION.time(stage="medical"):
+        return await medical_judge.evaluate_necessity_async(
+            diagnosis=vision_result.get('diagnosis_or_specialty', 'Unknown'),
+            line_items=vision_result.get('line_items', [])
+        )
+
+
+def run_policy_engine(results):
+    """Pipeline stage: policy adjudication (pure CPU, runs in a worker thread)"""
+    with STAGE_DURATION.time(stage="policy"):
+        return results['policy_snapshot'].adjudicate(results['vision'])
+
+
+# Stages after vision extraction; independent stages run concurrently and
+# are merged at the fraud/contraindication override step
+claim_pipeline = (
+    StagePipeline()
+    .add_stage('medical', run_medical_judge)
+    .add_stage('policy', run_policy_engine, blocking=True)
+)
 
 # Kestra URL - uses Docker internal hostname when running in container
 KESTRA_URL = os.getenv("KESTRA_URL", "http://localhost:8080")
@@ -98,7 +241,11 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "analyze": "/api/analyze",
-            "health": "/health"
+            "analyze_batch": "/api/analyze/batch",
+            "jobs": "/api/jobs",
+            "policy": "/api/policy",
+            "health": "/health",
+            "metrics": "/metrics"
         }
     }
 
@@ -110,25 +257,65 @@ async def health_check():
         "status": "healthy",
         "vision_agent": {
             "provider": vision_agent.provider,
+            "max_concurrency": vision_agent.max_concurrency,
+            "cache": vision_cache.stats(),
             "available": True
         },
+        "medical_judge": {
+            "mode": medical_judge.mode,
+            "cache": medical_judge.verdict_cache.stats()
+        },
         "policy_engine": {
             "rules_loaded": len(vision_agent.policy_rules) if hasattr(vision_agent, 'policy_rules') else 0,
+            "policy_version": policy_store.current.policy_version,
+            "registry": policy_registry.stats(),
             "available": True
+        },
+        "job_queue": {
+            "workers": job_queue.workers
         }
     }
 
 
+def collect_cache_metrics():
+    """Scrape-time view of the cache hit/miss counters kept by each cache"""
+    caches = {"vision": vision_cache.stats(), "medical": medical_judge.verdict_cache.stats()}
+    lookups = []
+    evictions = []
+    for name, stats in caches.items():
+        lookups.append(({"cache": name, "result": "hit"}, stats["hits"]))
+        lookups.append(({"cache": name, "result": "miss"}, stats["misses"]))
+        evictions.append(({"cache": name}, stats["evictions"]))
+    return [
+        ("claimguard_cache_lookups_total", "counter", "Cache lookups by cache and result", lookups),
+        ("claimguard_cache_evictions_total", "counter", "Cache entries evicted", evictions),
+    ]
+
+
+REGISTRY.add_collector(collect_cache_metrics)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: per-stage latency histograms, token and override counters"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/api/analyze")
 async def analyze_receipt(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    policy_product: str = None,
+    policy_version: str = None,
+    insured_id: str = None
 ) -> JSONResponse:
     """
     Analyze a receipt image and adjudicate the claim
     
     Args:
         file: Uploaded receipt image file (JPEG, PNG, etc.)
+        policy_product: Product whose rules apply (default rules if omitted)
+        policy_version: Exact policy version to adjudicate under (current if omitted)
+        insured_id: Policy holder ID of the claimant (needed for annual sub-limits)
         
     Returns:
         JSON response with:
@@ -136,187 +323,354 @@ async def analyze_receipt(
         - Policy adjudication results (approved/rejected items, amounts)
         - Final decision (APPROVED/PARTIAL_APPROVAL/REJECTED)
     """
-    temp_image_path = None
-    temp_json_path = None
-    
     try:
         # Check if file is JSON (test data) or image
-        is_json_test = file.content_type == 'application/json' or (file.filename and file.filename.endswith('.json'))
+        is_json_test = is_json_upload(file.filename, file.content_type)
         
-        if is_json_test:
-            # Handle JSON test file - load directly as vision result
-            print(f"\n{'='*80}")
-            print("CLAIMGUARD AI - PROCESSING TEST DATA (JSON)")
-            print(f"{'='*80}")
-            print(f"File: {file.filename}")
-            print(f"Type: JSON Test Data")
-            print(f"{'='*80}\n")
-            
-            # Read JSON content
-            content = await file.read()
-            vision_result = json.loads(content)
-            
-            print("STEP 1: Vision Agent Analysis (TEST MODE)")
-            print("-" * 80)
-            print(f"Using test data from JSON file")
-            print(f"   Merchant: {vision_result.get('merchant_name', 'N/A')}")
-            print(f"   Total: Rs.{vision_result.get('total_amount', 0):,.2f}")
-            print(f"   Items: {len(vision_result.get('line_items', []))}")
-            print(f"   Fraud Risk: {vision_result.get('fraud_detection', {}).get('recommendation', 'N/A')}\n")
-            
-        else:
-            # Validate file type for images
-            if not file.content_type or not file.content_type.startswith('image/'):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Invalid file type. Expected image or JSON, got {file.content_type}"
-                )
-            
-            # Create temporary file for the uploaded image
-            suffix = Path(file.filename).suffix if file.filename else '.jpg'
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-                # Save uploaded file to temporary location
-                shutil.copyfileobj(file.file, temp_file)
-                temp_image_path = temp_file.name
-            
-            print(f"\n{'='*80}")
-            print("CLAIMGUARD AI - PROCESSING REQUEST")
-            print(f"{'='*80}")
-            print(f"File: {file.filename}")
-            print(f"Size: {os.path.getsize(temp_image_path)} bytes")
-            print(f"Type: {file.content_type}")
-            print(f"{'='*80}\n")
-            
-            # STEP 1: Vision Agent - Extract structured data from receipt
-            print("STEP 1: Vision Agent Analysis")
-            print("-" * 80)
-            vision_result = vision_agent.process_receipt(temp_image_path)
-            
-            if not vision_result:
-                raise HTTPException(
-                    status_code=500,
-                    detail="Vision agent failed to process the receipt"
-                )
+        # Validate file type for images
+        if not is_json_test and (not file.content_type or not file.content_type.startswith('image/')):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid file type. Expected image or JSON, got {file.content_type}"
+            )
         
-        # STEP 2: Vision analysis complete - Init Medical Judge
-        print(f"Vision analysis complete")
-        diagnosis = vision_result.get('diagnosis_or_specialty', 'Unknown')
-        print(f"   Diagnosis: {diagnosis}")
-        print(f"   Merchant: {vision_result.get('merchant_name', 'N/A')}")
-        print(f"   Total: Rs.{vision_result.get('total_amount', 0):,.2f}")
-        print(f"   Items: {len(vision_result.get('line_items', []))}")
-        print(f"   Fraud Risk: {vision_result.get('fraud_detection', {}).get('recommendation', 'N/A')}\n")
+        # Read the upload into a single in-memory buffer, hashing as we go
+        try:
+            content, content_hash = await vision_agent.read_upload(file)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
         
-        # STEP 3: Medical Judge - Evaluate clinical necessity
-        print("STEP 2: Medical Necessity Judge")
-        print("-" * 80)
-        medical_flags = medical_judge.evaluate_necessity(
-            diagnosis=diagnosis,
-            line_items=vision_result.get('line_items', [])
+        final_result = await analyze_claim_content(
+            file.filename, file.content_type, content, content_hash,
+            policy_product=policy_product, policy_version=policy_version, insured_id=insured_id
         )
-        print("Medical Judge evaluation complete")
-        print(f"   Medical Flags: {medical_flags}")  # DEBUG: Show what Medical Judge returned
+        return JSONResponse(content=final_result)
+    
+    except HTTPException:
+        raise
+    
+    except Exception as e:
+        logger.exception("Receipt analysis failed")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+
+
+def is_json_upload(filename, content_type):
+    """JSON uploads are pre-extracted test data that skip the Vision Agent"""
+    return content_type == 'application/json' or bool(filename and filename.endswith('.json'))
+
+
+async def release_benefit_hold(hold):
+    """Give back the sub-limit held for a claim that was not saved (the reaper retries failures)"""
+    try:
+        await benefit_ledger.release(hold)
+    except Exception as e:
+        logger.exception("Failed to release benefit reservation", extra={
+            "hold_id": hold.hold_id, "claim_key": hold.claim_key
+        })
+
+
+async def save_claim(db_claim, claim_type, benefit_hold, payable):
+    """
+    Save a claim, settling its benefit hold in the same transaction; if the
+    save fails the hold is released instead
+    
+    Returns:
+        int: Database ID, or None if the claim could not be saved
+    """
+    try:
+        # Group commit: concurrent saves share one transaction (and one fsync)
+        with STAGE_DURATION.time(stage="db_write"):
+            db_id = await claim_writer.write(db_claim, claim_type, benefit_hold, payable)
+        logger.info("Claim saved", extra={"db_id": db_id})
+        return db_id
+    except Exception as e:
+        # Don't fail the request if DB fails
+        logger.exception("Failed to save claim to DB")
+        if benefit_hold is not None:
+            await release_benefit_hold(benefit_hold)
+        return None
+
+
+async def analyze_claim_content(filename, content_type, content, content_hash,
+                                policy_product=None, policy_version=None, insured_id=None):
+    """
+    Run the vision -> judge -> policy pipeline on one uploaded file and save the claim
+    
+    Args:
+        filename: Original upload name
+        content_type: Upload MIME type
+        content: Raw file bytes (image or JSON test data)
+        content_hash: SHA-256 hex digest of content
+        policy_product, policy_version: Policy to adjudicate under; default to
+            the claim's own policy_product / policy_version fields
+        insured_id: Policy holder ID supplied by the caller; an ID written on
+            the claim is only trusted if it has an enrollment
         
-        # STEP 4: Save vision result to temporary JSON file for policy engine
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.json') as temp_json:
-            json.dump(vision_result, temp_json, indent=2)
-            temp_json_path = temp_json.name
+    Returns:
+        dict: Combined analysis result (same shape as /api/analyze)
         
-        # STEP 5: Policy Engine - Adjudicate the claim
-        print("\nSTEP 3: Policy Engine Adjudication")
-        print("-" * 80)
-        policy_result = policy_adjudicator.adjudicate_claim(temp_json_path)
-
-        # Merge Medical Judge flags into Policy Result items
-        for item in policy_result.get('line_item_decisions', []):
-            item_name = item.get('item_name')
-            if item_name in medical_flags:
-                judge_decision = medical_flags[item_name]
-                item['medical_necessity'] = judge_decision.get('status', 'PASS')
-                item['medical_reason'] = judge_decision.get('reason', '')
-                item['medical_severity'] = judge_decision.get('severity', 'INFO')  # Add severity
+    Raises:
+        HTTPException: For invalid input or pipeline failures
+    """
+    receipt_phash = None
+    started = time.perf_counter()
+    source = "json" if is_json_upload(filename, content_type) else "image"
+    
+    if source == "json":
+        # Handle JSON test file - load directly as vision result
+        logger.info("Processing test data (JSON)", extra={"upload_filename": filename})
         
-        if not policy_result:
-            raise HTTPException(
-                status_code=500,
-                detail="Policy engine failed to adjudicate the claim"
-            )
+        try:
+            vision_result = json.loads(content)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON test data: {e}")
+        if not isinstance(vision_result, dict):
+            raise HTTPException(status_code=400, detail="JSON test data must be an object")
         
-        print(f"Policy adjudication complete")
-        print(f"   Status: {policy_result.get('status', 'N/A')}")
-        print(f"   Claimed: Rs.{policy_result.get('total_claimed', 0):,.2f}")
-        print(f"   Approved: Rs.{policy_result.get('total_approved', 0):,.2f}")
-        print(f"   Deducted: Rs.{policy_result.get('total_deducted', 0):,.2f}")
-        print(f"   Excluded Items: {policy_result.get('excluded_items_count', 0)}\n")
+    else:
+        image_bytes, image_hash = content, content_hash
         
-        # STEP 6: Fraud Detection Override
-        # If fraud detection recommends REJECT, override policy decision
-        fraud_detection = vision_result.get('fraud_detection', {})
-        fraud_recommendation = fraud_detection.get('recommendation', 'APPROVE')
+        logger.info("Processing receipt", extra={
+            "upload_filename": filename,
+            "size_bytes": len(image_bytes),
+            "content_type": content_type,
+            "sha256": image_hash
+        })
         
-        final_status = policy_result.get('status', 'UNKNOWN')
-        final_approved = policy_result.get('total_approved', 0)
-        final_summary = policy_result.get('summary', '')
+        # STEP 1: Vision Agent - Extract structured data from receipt
+        vision_result = None
+        use_cache = vision_agent.provider == "openai" and vision_cache.enabled  # Never cache mock data
+        if use_cache:
+            try:
+                vision_result = await asyncio.to_thread(vision_cache.get, image_hash)
+            except Exception as e:
+                logger.warning("Vision cache lookup failed", extra={"error": str(e)})
         
-        if fraud_recommendation == 'REJECT':
-            print("FRAUD OVERRIDE: Fraud detection recommends REJECT")
-            print("-" * 80)
-            final_status = 'REJECTED'
-            final_approved = 0  # Reject entire claim
-            final_summary = f"[FRAUD DETECTED] Claim rejected due to fraud indicators. {final_summary}"
-            print(f"   Final Status: REJECTED (Fraud Override)")
-            print(f"   Approved Amount: Rs.0.00 (Fraud Override)\n")
-        elif fraud_recommendation == 'MANUAL_REVIEW':
-            print("FRAUD WARNING: Manual review recommended")
-            print("-" * 80)
-            final_summary = f"[MANUAL REVIEW REQUIRED] Suspicious activity detected. {final_summary}"
-            print(f"   Status: {final_status} (Manual Review Flagged)\n")
+        if vision_result:
+            logger.info("Vision cache hit", extra={"sha256": image_hash})
+        else:
+            with STAGE_DURATION.time(stage="vision"):
+                vision_result = await vision_agent.process_receipt_bytes_async(image_bytes, label=filename)
+            if vision_result and use_cache:
+                try:
+                    await asyncio.to_thread(
+                        vision_cache.put, image_hash, vision_result, len(image_bytes)
+                    )
+                except Exception as e:
+                    logger.warning("Vision cache store failed", extra={"error": str(e)})
         
-        # STEP 6.5: Medical Contraindication Override
-        # Check if any items are contraindicated (CRITICAL severity)
-        contraindicated_items = []
-        critical_items = []
-        contraindicated_amount = 0  # Track total amount of contraindicated items
+        if not vision_result:
+            raise HTTPException(
+                status_code=500,
+                detail="Vision agent failed to process the receipt"
+            )
         
-        for item_name, evaluation in medical_flags.items():
-            status = evaluation.get('status', 'PASS')
-            severity = evaluation.get('severity', 'INFO')
-            
-            if status in ['CONTRAINDICATED', 'FLAG']:
-                if severity == 'CRITICAL':
-                    critical_items.append(item_name)
-                    # Find the item amount from line_item_decisions
-                    for item in policy_result.get('line_item_decisions', []):
-                        if item.get('item_name') == item_name:
-                            contraindicated_amount += item.get('claimed_amount', 0)
-                            break
-                contraindicated_items.append(item_name)
+        # STEP 1.5: Perceptual-hash duplicate check against earlier submissions
+        if duplicate_detector.available:
+            try:
+                receipt_phash = hash_to_hex(await asyncio.to_thread(compute_dhash, io.BytesIO(image_bytes)))
+                duplicate = await asyncio.to_thread(duplicate_detector.find_duplicate, receipt_phash)
+                if duplicate:
+                    duplicate_detector.apply_to_fraud_detection(
+                        vision_result.setdefault('fraud_detection', {}), duplicate
+                    )
+                    logger.warning("Duplicate receipt detected", extra={
+                        "duplicate_of": duplicate['claim_db_id'],
+                        "similarity": duplicate['similarity']
+                    })
+            except Exception as e:
+                logger.warning("Duplicate receipt check failed", extra={"error": str(e)})
+    
+    # STEP 2: Vision analysis complete - Init Medical Judge
+    diagnosis = vision_result.get('diagnosis_or_specialty', 'Unknown')
+    bind_claim_id(vision_result.get('claim_id'))
+    logger.info("Vision analysis complete", extra={
+        "diagnosis": diagnosis,
+        "merchant_name": vision_result.get('merchant_name'),
+        "total_amount": vision_result.get('total_amount', 0),
+        "line_items": len(vision_result.get('line_items', [])),
+        "fraud_recommendation": vision_result.get('fraud_detection', {}).get('recommendation')
+    })
+    
+    # Enrollment of the insured (inception date, declared conditions, product)
+    claimed_insured_id = insured_id or insured_id_of(vision_result)
+    enrollment = await enrollment_store.get(claimed_insured_id)
+    # Year-to-date limits are keyed on a verified identity only, never on receipt text
+    verified_insured_id = claimed_insured_id if (insured_id or enrollment is not None) else None
+    
+    # Pin the compiled policy for this claim: a reload mid-claim must not change the rules under us
+    policy_product = (
+        policy_product or vision_result.get('policy_product')
+        or (enrollment and enrollment.policy_product) or DEFAULT_PRODUCT
+    )
+    try:
+        policy_snapshot = await asyncio.to_thread(
+            policy_registry.get, policy_product, policy_version or vision_result.get('policy_version')
+        )
+    except (UnknownPolicyError, PolicyRulesError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    # STEP 2.5: Waiting periods - pure rule check, so ineligible claims are
+    # rejected before the Medical Judge (LLM) is called. Without an enrollment
+    # they cannot be checked; a claim for an insured_id with no enrollment on
+    # file goes to manual review instead.
+    waiting_period_violation = None
+    waiting_period = "unverified"
+    if enrollment is not None:
+        with STAGE_DURATION.time(stage="waiting_period"):
+            waiting_period_violation = policy_snapshot.check_waiting_period(
+                vision_result, enrollment.inception_date,
+                enrollment.pre_existing_conditions, enrollment.pre_existing_pattern
+            )
+        waiting_period = "not_completed" if waiting_period_violation else "completed"
+    
+    # STEP 3 + 4: Medical Judge and Policy Engine run concurrently
+    try:
+        if waiting_period_violation:
+            OVERRIDES_TOTAL.inc(kind="waiting_period")
+            logger.warning("Waiting period not completed: claim rejected", extra=waiting_period_violation)
+            stage_results = {
+                'medical': {},
+                'policy': policy_snapshot.reject_for_waiting_period(vision_result, waiting_period_violation)
+            }
+        else:
+            stage_results = await claim_pipeline.run({'vision': vision_result, 'policy_snapshot': policy_snapshot})
+    except ClaimDataError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid claim data: {e}")
+    medical_flags = stage_results['medical']
+    policy_result = stage_results['policy']
+    logger.debug("Medical Judge evaluation complete", extra={"medical_flags": medical_flags})
+
+    # Merge Medical Judge flags into Policy Result items
+    for item in policy_result.get('line_item_decisions', []):
+        item_name = item.get('item_name')
+        if item_name in medical_flags:
+            judge_decision = medical_flags[item_name]
+            item['medical_necessity'] = judge_decision.get('status', 'PASS')
+            item['medical_reason'] = judge_decision.get('reason', '')
+            item['medical_severity'] = judge_decision.get('severity', 'INFO')  # Add severity
+    
+    if not policy_result:
+        raise HTTPException(
+            status_code=500,
+            detail="Policy engine failed to adjudicate the claim"
+        )
+    
+    logger.info("Policy adjudication complete", extra={
+        "policy_status": policy_result.get('status'),
+        "total_claimed": policy_result.get('total_claimed', 0),
+        "total_approved": policy_result.get('total_approved', 0),
+        "total_deducted": policy_result.get('total_deducted', 0),
+        "excluded_items": policy_result.get('excluded_items_count', 0)
+    })
+    
+    # STEP 6: Fraud Detection Override
+    # If fraud detection recommends REJECT, override policy decision
+    fraud_detection = vision_result.get('fraud_detection', {})
+    fraud_recommendation = fraud_detection.get('recommendation', 'APPROVE')
+    
+    final_status = policy_result.get('status', 'UNKNOWN')
+    final_approved = policy_result.get('total_approved', 0)
+    final_summary = policy_result.get('summary', '')
+    
+    if fraud_recommendation == 'REJECT':
+        final_status = 'REJECTED'
+        final_approved = 0  # Reject entire claim
+        final_summary = f"[FRAUD DETECTED] Claim rejected due to fraud indicators. {final_summary}"
+        OVERRIDES_TOTAL.inc(kind="fraud_reject")
+        logger.warning("Fraud override: claim rejected", extra={
+            "fraud_indicators": fraud_detection.get('fraud_indicators', [])
+        })
+    elif fraud_recommendation == 'MANUAL_REVIEW':
+        final_summary = f"[MANUAL REVIEW REQUIRED] Suspicious activity detected. {final_summary}"
+        OVERRIDES_TOTAL.inc(kind="fraud_review")
+        logger.warning("Fraud warning: manual review recommended", extra={"final_status": final_status})
+    
+    if insured_id and enrollment is None and final_status != 'REJECTED':
+        final_summary = (
+            f"[MANUAL REVIEW REQUIRED] No enrollment on file for the insured: waiting periods "
+            f"could not be verified. {final_summary}"
+        )
+        OVERRIDES_TOTAL.inc(kind="unverified_enrollment")
+        logger.warning("Waiting periods not verified: no enrollment", extra={"claimed_insured_id": claimed_insured_id})
+    
+    # STEP 6.5: Medical Contraindication Override
+    # Check if any items are contraindicated (CRITICAL severity)
+    contraindicated_items = []
+    critical_items = []
+    contraindicated_amount = 0  # Track total amount of contraindicated items
+    
+    for item_name, evaluation in medical_flags.items():
+        status = evaluation.get('status', 'PASS')
+        severity = evaluation.get('severity', 'INFO')
         
-        if critical_items:
-            print("MEDICAL CONTRAINDICATION WARNING: Critical contraindications detected")
-            print("-" * 80)
-            print(f"   Contraindicated Items: {', '.join(critical_items)}")
-            print(f"   Contraindicated Amount: Rs.{contraindicated_amount:,.2f}")
-            
-            # Deduct only contraindicated items from approved amount
-            original_approved = policy_result.get('total_approved', 0)
-            final_approved = max(0, original_approved - contraindicated_amount)
-            final_status = 'PARTIAL_APPROVAL'  # Flag for manual review
-            final_summary = f"⚠️ MEDICAL REVIEW REQUIRED: Contraindicated medications detected ({', '.join(critical_items)}). These medications may be harmful for patients with {diagnosis}. Manual review required for patient safety."
-            
-            print(f"   Original Approved: Rs.{original_approved:,.2f}")
-            print(f"   Final Approved: Rs.{final_approved:,.2f} (after deducting contraindicated items)")
-            print(f"   Status: PARTIAL_APPROVAL (Manual Review Required)")
-            print(f"   Action: Contraindicated items flagged for manual review\n")
-        elif contraindicated_items:
-            print(f"MEDICAL WARNING: {len(contraindicated_items)} item(s) flagged for review")
-            print("-" * 80)
-            print(f"   Flagged Items: {', '.join(contraindicated_items)}\n")
+        if status in ['CONTRAINDICATED', 'FLAG']:
+            if severity == 'CRITICAL':
+                critical_items.append(item_name)
+                # Find the item amount from line_item_decisions
+                for item in policy_result.get('line_item_decisions', []):
+                    if item.get('item_name') == item_name:
+                        contraindicated_amount += item.get('claimed_amount', 0)
+                        break
+            contraindicated_items.append(item_name)
+    
+    if critical_items:
+        # Deduct only contraindicated items from approved amount
+        original_approved = policy_result.get('total_approved', 0)
+        final_approved = max(0, original_approved - contraindicated_amount)
+        final_status = 'PARTIAL_APPROVAL'  # Flag for manual review
+        OVERRIDES_TOTAL.inc(kind="contraindication")
+        final_summary = f"⚠️ MEDICAL REVIEW REQUIRED: Contraindicated medications detected ({', '.join(critical_items)}). These medications may be harmful for patients with {diagnosis}. Manual review required for patient safety."
         
+        logger.warning("Medical contraindication override: critical items flagged for manual review", extra={
+            "contraindicated_items": critical_items,
+            "contraindicated_amount": contraindicated_amount,
+            "original_approved": original_approved,
+            "final_approved": final_approved
+        })
+    elif contraindicated_items:
+        OVERRIDES_TOTAL.inc(kind="medical_flag")
+        logger.warning("Medical warning: items flagged for review", extra={"flagged_items": contraindicated_items})
+    
+    # STEP 6.8: Copayment and pharmacy/diagnostics sub-limits (deduction_rules),
+    # holding the payable amount against the insured's year-to-date ledger
+    benefit_limits = None
+    benefit_hold = None
+    try:
+        if final_status != 'REJECTED' and final_approved > 0:
+            try:
+                payable, benefit_limits, benefit_hold = await benefit_ledger.apply(
+                    policy_snapshot.policy_rules, vision_result, final_approved, policy_product,
+                    inception_date=enrollment and enrollment.inception_date, insured_id=verified_insured_id,
+                    claim_key=uuid.uuid4().hex
+                )
+            except LedgerContentionError as e:
+                raise HTTPException(status_code=503, detail=str(e))
+            if not benefit_limits['annual_limit_checked']:
+                final_summary = (
+                    f"[MANUAL REVIEW REQUIRED] No verified insured ID: the {benefit_limits['category']} "
+                    f"annual sub-limit could not be checked. {final_summary}"
+                )
+                OVERRIDES_TOTAL.inc(kind="unverified_insured")
+                logger.warning("Annual sub-limit not checked: insured not identified", extra={
+                    "claimed_insured_id": claimed_insured_id,
+                    "category": benefit_limits['category']
+                })
+            if payable < final_approved:
+                final_status = 'PARTIAL_APPROVAL' if payable > 0 else 'REJECTED'
+                final_summary = (
+                    f"{final_summary}\n   • Copayment / sub-limits: Rs.{final_approved - payable:,.2f} borne by the insured"
+                )
+                logger.info("Deduction rules applied", extra=benefit_limits)
+            final_approved = payable
+    
         # STEP 7: Combine results
         final_result = {
             "success": True,
-            "filename": file.filename,
+            "filename": filename,
             "vision_analysis": {
                 "fraud_detection": vision_result.get('fraud_detection', {}),
                 "merchant_name": vision_result.get('merchant_name', ''),
@@ -327,7 +681,12 @@ async def analyze_receipt(
                 "line_items_count": len(vision_result.get('line_items', []))
             },
             "policy_adjudication": policy_result,
+            "policy_product": policy_product,
+            "policy_version": policy_snapshot.policy_version,
+            "insured_id": verified_insured_id,
+            "waiting_period": waiting_period,
             "medical_necessity_check": medical_flags,  # Add full medical check results
+            "benefit_limits": benefit_limits,
             "final_decision": {
                 "status": final_status,  # Use fraud-overridden status
                 "total_claimed": policy_result.get('total_claimed', 0),
@@ -336,66 +695,484 @@ async def analyze_receipt(
                 "summary": final_summary  # Use fraud-overridden summary
             }
         }
-        
+    
         # STEP 7: Save to Database
-        try:
-            db_claim = models.Claim(
-                claim_id=final_result['policy_adjudication'].get('claim_id', 'UNKNOWN'),
-                merchant_name=final_result['vision_analysis'].get('merchant_name', 'UNKNOWN'),
-                patient_name=final_result['policy_adjudication'].get('patient_name', 'UNKNOWN'),
-                total_claimed=final_result['final_decision'].get('total_claimed', 0),
-                total_approved=final_result['final_decision'].get('total_approved', 0),
-                total_deducted=final_result['final_decision'].get('total_deducted', 0),
-                status=final_result['final_decision'].get('status', 'UNKNOWN'),
-                full_data=final_result
-            )
-            db.add(db_claim)
-            db.commit()
-            db.refresh(db_claim)
-            print(f"Claim saved to DB with ID: {db_claim.id}")
-            
-            # Add DB ID to response
-            final_result['db_id'] = db_claim.id
-            
-        except Exception as e:
-            print(f"[ERROR] Failed to save to DB: {e}")
-            # Don't fail the request if DB fails
-            
-        print(f"{'='*80}")
-        print(f"ANALYSIS COMPLETE - {final_result['final_decision']['status']}")
-        print(f"{'='*80}\n")
+        db_claim = models.Claim(
+            claim_id=final_result['policy_adjudication'].get('claim_id', 'UNKNOWN'),
+            merchant_name=final_result['vision_analysis'].get('merchant_name', 'UNKNOWN'),
+            patient_name=final_result['policy_adjudication'].get('patient_name', 'UNKNOWN'),
+            total_claimed=final_result['final_decision'].get('total_claimed', 0),
+            total_approved=final_result['final_decision'].get('total_approved', 0),
+            total_deducted=final_result['final_decision'].get('total_deducted', 0),
+            status=final_result['final_decision'].get('status', 'UNKNOWN'),
+            full_data=final_result,
+            receipt_phash=receipt_phash,
+            created_at=datetime.utcnow()
+        )
+        # The save task owns the hold from here on and runs to completion even
+        # if this request is cancelled (client gone, shutdown)
+        save = asyncio.ensure_future(
+            save_claim(db_claim, policy_result.get('claim_type'), benefit_hold, final_approved)
+        )
+        benefit_hold = None
+        db_id = await asyncio.shield(save)
+    finally:
+        if benefit_hold is not None:
+            # Failed or cancelled before the save: give the reserved sub-limit back
+            await asyncio.shield(release_benefit_hold(benefit_hold))
+    
+    if db_id is not None:
+        # Add DB ID to response
+        final_result['db_id'] = db_id
+        if receipt_phash:
+            duplicate_detector.add(receipt_phash, db_id)
         
-        return JSONResponse(content=final_result)
+    logger.info("Analysis complete", extra={"final_status": final_result['final_decision']['status']})
+    CLAIMS_TOTAL.inc(status=final_result['final_decision']['status'])
+    ANALYSIS_DURATION.observe(time.perf_counter() - started, source=source)
     
-    except HTTPException:
-        raise
+    return final_result
+
+
+# Batch analysis limits
+BATCH_MAX_CONCURRENCY = max(1, int(os.getenv("BATCH_MAX_CONCURRENCY", "8")))
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "100"))
+BATCH_MAX_ARCHIVE_BYTES = int(os.getenv("BATCH_MAX_ARCHIVE_BYTES", str(200 * 1024 * 1024)))
+# Total upload size of one batch request (checked on the request stream)
+BATCH_MAX_REQUEST_BYTES = int(os.getenv("BATCH_MAX_REQUEST_BYTES", str(BATCH_MAX_ARCHIVE_BYTES)))
+# Decompressed bytes allowed across all archives of one batch (ZIP bomb guard)
+BATCH_MAX_EXPANDED_BYTES = int(os.getenv("BATCH_MAX_EXPANDED_BYTES", str(500 * 1024 * 1024)))
+ZIP_READ_CHUNK_BYTES = 64 * 1024
+
+
+def is_zip_upload(filename, content_type):
+    """ZIP archives in a batch are expanded into their member files"""
+    return content_type in ('application/zip', 'application/x-zip-compressed') or bool(
+        filename and filename.lower().endswith('.zip')
+    )
+
+
+def read_zip_member(archive, info, limit):
+    """
+    Decompress one archive member, stopping as soon as it passes limit bytes
+    (the sizes in the ZIP headers are not trusted)
     
-    except Exception as e:
-        print(f"\nERROR: {str(e)}\n")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Internal server error: {str(e)}"
-        )
+    Returns:
+        bytes: Member content, or None if it is larger than limit
+    """
+    chunks = []
+    size = 0
+    with archive.open(info) as member:
+        while True:
+            chunk = member.read(min(ZIP_READ_CHUNK_BYTES, limit + 1 - size))
+            if not chunk:
+                return b"".join(chunks)
+            size += len(chunk)
+            if size > limit:
+                return None
+            chunks.append(chunk)
+
+
+def expand_zip_archive(archive_name, archive_bytes, max_members=None, max_expanded_bytes=None):
+    """
+    List the receipt files inside a ZIP archive
     
-    finally:
-        # Cleanup temporary files
-        if temp_image_path and os.path.exists(temp_image_path):
+    Args:
+        archive_name: Upload name of the archive
+        archive_bytes: Raw archive content
+        max_members: Receipt files allowed (default BATCH_MAX_FILES)
+        max_expanded_bytes: Decompressed bytes allowed over all members
+            (default BATCH_MAX_EXPANDED_BYTES)
+    
+    Returns:
+        list: (filename, content_type, content) for image and JSON members
+        
+    Raises:
+        HTTPException: If the archive is invalid, has too many members, or a
+            member (or the archive as a whole) expands past its limit
+    """
+    if max_members is None:
+        max_members = BATCH_MAX_FILES
+    if max_expanded_bytes is None:
+        max_expanded_bytes = BATCH_MAX_EXPANDED_BYTES
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(archive_bytes))
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail=f"Invalid ZIP archive: {archive_name}")
+    
+    members = []
+    expanded_bytes = 0
+    with archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or Path(name).name.startswith('.') or '__MACOSX' in name:
+                continue
+            content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            if not (content_type.startswith('image/') or is_json_upload(name, content_type)):
+                continue
+            if len(members) >= max_members:
+                raise HTTPException(status_code=413, detail=f"Batch exceeds limit of {BATCH_MAX_FILES} files")
+            
+            member_limit = min(vision_agent.max_upload_bytes, max_expanded_bytes - expanded_bytes)
             try:
-                os.unlink(temp_image_path)
-            except Exception as e:
-                print(f"Warning: Failed to delete temporary image: {e}")
+                content = read_zip_member(archive, info, member_limit)
+            except (zipfile.BadZipFile, zlib.error, NotImplementedError, RuntimeError) as e:
+                raise HTTPException(status_code=400, detail=f"Invalid ZIP member {archive_name}:{name}: {e}")
+            if content is None:
+                if member_limit < vision_agent.max_upload_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"{archive_name} expands beyond the batch limit of {BATCH_MAX_EXPANDED_BYTES:,} bytes"
+                    )
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"{archive_name}:{name} exceeds limit of {vision_agent.max_upload_bytes:,} bytes"
+                )
+            expanded_bytes += len(content)
+            members.append((f"{archive_name}/{name}", content_type, content))
+    return members
+
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(files: List[UploadFile] = File(...), insured_id: str = None) -> JSONResponse:
+    """
+    Analyze many receipts (or ZIP archives of receipts) in one request
+    
+    Files run through the same pipeline as /api/analyze with at most
+    BATCH_MAX_CONCURRENCY in flight. A failure on one file does not
+    fail the batch. insured_id applies to every file.
+    
+    Returns:
+        JSON response with per-file results and aggregate totals
+    """
+    # Collect (filename, content_type, content, sha256) for every receipt
+    entries = []
+    expanded_bytes = 0
+    for file in files:
+        try:
+            if is_zip_upload(file.filename, file.content_type):
+                archive_bytes, _ = await vision_agent.read_upload(file, max_bytes=BATCH_MAX_ARCHIVE_BYTES)
+                members = expand_zip_archive(
+                    file.filename, archive_bytes,
+                    max_members=max(0, BATCH_MAX_FILES - len(entries)),
+                    max_expanded_bytes=max(0, BATCH_MAX_EXPANDED_BYTES - expanded_bytes)
+                )
+                expanded_bytes += sum(len(content) for _, _, content in members)
+                for name, content_type, content in members:
+                    entries.append((name, content_type, content, hashlib.sha256(content).hexdigest()))
+            else:
+                content, content_hash = await vision_agent.read_upload(file)
+                entries.append((file.filename, file.content_type, content, content_hash))
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=f"{file.filename}: {e}")
         
-        if temp_json_path and os.path.exists(temp_json_path):
+        if len(entries) > BATCH_MAX_FILES:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds limit of {BATCH_MAX_FILES} files")
+    
+    if not entries:
+        raise HTTPException(status_code=400, detail="No image or JSON receipts found in upload")
+    
+    semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+    
+    async def analyze_entry(filename, content_type, content, content_hash):
+        async with semaphore:
+            if not (is_json_upload(filename, content_type) or (content_type or '').startswith('image/')):
+                return {"success": False, "filename": filename, "status_code": 400,
+                        "error": f"Invalid file type. Expected image or JSON, got {content_type}"}
             try:
-                os.unlink(temp_json_path)
+                return await analyze_claim_content(filename, content_type, content, content_hash,
+                                                   insured_id=insured_id)
+            except HTTPException as e:
+                return {"success": False, "filename": filename, "status_code": e.status_code, "error": e.detail}
             except Exception as e:
-                print(f"Warning: Failed to delete temporary JSON: {e}")
+                logger.exception("Batch file analysis failed", extra={"upload_filename": filename})
+                return {"success": False, "filename": filename, "status_code": 500, "error": str(e)}
+    
+    results = await asyncio.gather(*(analyze_entry(*entry) for entry in entries))
+    
+    # Aggregate totals over successful files
+    succeeded = [result for result in results if result.get('success')]
+    status_counts = {}
+    for result in succeeded:
+        status = result['final_decision']['status']
+        status_counts[status] = status_counts.get(status, 0) + 1
+    total_claimed = sum(result['final_decision']['total_claimed'] for result in succeeded)
+    total_approved = sum(result['final_decision']['total_approved'] for result in succeeded)
+    
+    return JSONResponse(content={
+        "success": len(succeeded) == len(results),
+        "files": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "totals": {
+            "total_claimed": round(total_claimed, 2),
+            "total_approved": round(total_approved, 2),
+            "total_deducted": round(total_claimed - total_approved, 2),
+            "status_counts": status_counts
+        },
+        "results": results
+    })
+
+
+async def run_analysis_job(job):
+    """Job queue handler: run the /api/analyze pipeline for a queued upload"""
+    with log_context(request_id=job.id, claim_id=None):
+        return await analyze_claim_content(job.filename, job.content_type, job.content, job.content_hash)
+
+
+job_queue = JobQueue(SessionLocal, run_analysis_job)
+
+
+@app.on_event("startup")
+async def start_job_workers():
+    policy_store.start()
+    claim_writer.start()
+    benefit_ledger.start()
+    job_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await policy_store.stop()
+    await job_queue.stop()
+    await benefit_ledger.stop()
+    await claim_writer.stop()
+    await async_engine.dispose()
+
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(file: UploadFile = File(...)):
+    """
+    Queue a receipt for background analysis
+    
+    The upload is persisted and picked up by the worker pool; poll
+    GET /api/jobs/{job_id} for the result.
+    
+    Returns:
+        JSON response with the job ID and its initial status
+    """
+    if not is_json_upload(file.filename, file.content_type) and (
+        not file.content_type or not file.content_type.startswith('image/')
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type. Expected image or JSON, got {file.content_type}"
+        )
+    
+    try:
+        content, content_hash = await vision_agent.read_upload(file)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    job_id = await asyncio.to_thread(job_queue.submit, file.filename, file.content_type, content, content_hash)
+    return {"job_id": job_id, "status": "QUEUED", "status_url": f"/api/jobs/{job_id}"}
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status, plus the full analysis result once COMPLETED"""
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+CLAIMS_PAGE_MAX = 200
+
+# Columns returned by the claim listing (everything except the full_data blob)
+CLAIM_SUMMARY_COLUMNS = (
+    models.Claim.id,
+    models.Claim.claim_id,
+    models.Claim.merchant_name,
+    models.Claim.patient_name,
+    models.Claim.total_claimed,
+    models.Claim.total_approved,
+    models.Claim.total_deducted,
+    models.Claim.status,
+    models.Claim.created_at,
+)
+
+
+def encode_cursor(created_at, claim_db_id):
+    """Opaque cursor for the (created_at, id) position of the last row on a page"""
+    payload = json.dumps([created_at.isoformat(), claim_db_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises HTTPException(400) on malformed input"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, claim_db_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(claim_db_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 
 @app.get("/api/claims")
-async def get_claims(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Fetch claim history from database"""
-    claims = db.query(models.Claim).order_by(models.Claim.created_at.desc()).offset(skip).limit(limit).all()
-    return claims
+async def get_claims(
+    limit: int = Query(50, ge=1, le=CLAIMS_PAGE_MAX),
+    cursor: str = None,
+    status: str = None,
+    merchant_name: str = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Fetch claim history, newest first, without the full_data blob
+    
+    Pages are keyset-paginated on (created_at, id): pass next_cursor from
+    the previous page as cursor. Use /api/claims/{id} for the full result.
+    """
+    query = select(*CLAIM_SUMMARY_COLUMNS)
+    if status:
+        query = query.where(models.Claim.status == status)
+    if merchant_name:
+        query = query.where(models.Claim.merchant_name == merchant_name)
+    if cursor:
+        query = query.where(tuple_(models.Claim.created_at, models.Claim.id) < decode_cursor(cursor))
+    
+    query = query.order_by(models.Claim.created_at.desc(), models.Claim.id.desc()).limit(limit + 1)
+    rows = (await db.execute(query)).all()
+    
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    
+    return {
+        "claims": [dict(row._mapping) for row in page],
+        "next_cursor": next_cursor
+    }
+
+
+@app.get("/api/claims/{claim_db_id}")
+async def get_claim(claim_db_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Fetch one claim including the full analysis result (full_data)"""
+    claim = await db.get(models.Claim, claim_db_id)
+    if claim is None:
+        raise HTTPException(status_code=404, detail=f"Claim {claim_db_id} not found")
+    return claim
+
+
+@app.get("/api/policy")
+async def get_policy():
+    """Version and load time of the default policy rules, plus the products on offer"""
+    return {**policy_store.info(), "products": policy_registry.products(), "registry": policy_registry.stats()}
+
+
+@app.post("/api/policy/reload")
+async def reload_policy():
+    """
+    Recompile the policy rules file and swap it in for new claims (claims
+    already in flight finish on the previous version)
+    """
+    try:
+        reloaded = await asyncio.to_thread(policy_store.reload)
+    except PolicyRulesError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"reloaded": reloaded, **policy_store.info()}
+
+
+class EnrollmentRequest(BaseModel):
+    inception_date: date
+    pre_existing_conditions: List[str] = []
+    policy_product: Optional[str] = None
+
+
+@app.put("/api/enrollments/{insured_id}")
+async def put_enrollment(insured_id: str, enrollment: EnrollmentRequest):
+    """Create or replace the enrollment used for waiting-period checks"""
+    record = await enrollment_store.upsert(
+        insured_id, enrollment.inception_date, enrollment.pre_existing_conditions, enrollment.policy_product
+    )
+    return record.to_dict()
+
+
+@app.get("/api/enrollments/{insured_id}")
+async def get_enrollment(insured_id: str):
+    """Enrollment of an insured"""
+    record = await enrollment_store.get(insured_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"No enrollment for insured {insured_id}")
+    return record.to_dict()
+
+
+@app.get("/api/ledger/{insured_id}")
+async def get_ledger(insured_id: str, policy_year: int = None):
+    """Year-to-date sub-limit consumption and open reservations of one insured"""
+    return {"insured_id": insured_id, "entries": await benefit_ledger.balances(insured_id, policy_year)}
+
+
+@app.get("/api/analytics")
+async def get_analytics(
+    group_by: str = "day",
+    start: date = None,
+    end: date = None,
+    status: str = None,
+    merchant_name: str = None,
+    claim_type: str = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Claim totals (count, claimed, approved, deducted) from the rollup tables
+    
+    Args:
+        group_by: Comma-separated subset of day, status, merchant_name,
+            claim_type (empty for grand totals)
+        start, end: Inclusive day range (YYYY-MM-DD)
+    """
+    dimensions = [dimension.strip() for dimension in group_by.split(",") if dimension.strip()]
+    unknown = [dimension for dimension in dimensions if dimension not in ROLLUP_DIMENSIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown group_by dimension(s) {unknown}; expected {list(ROLLUP_DIMENSIONS)}"
+        )
+    
+    query = rollup_query(
+        group_by=dimensions, start=start, end=end,
+        status=status, merchant_name=merchant_name, claim_type=claim_type
+    )
+    rows = (await db.execute(query)).all()
+    return {"group_by": dimensions, "rows": format_rollups(rows)}
+
+
+@app.get("/api/analytics/items")
+async def get_item_analytics(
+    group_by: str = "item_key",
+    item: str = None,
+    status: str = None,
+    medical_severity: str = None,
+    start: date = None,
+    end: date = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Line item totals (items, claims, claimed, approved) from claim_line_items,
+    e.g. ?item=Whey Protein&status=REJECTED&start=2025-01-01&end=2025-03-31
+    
+    Args:
+        group_by: Comma-separated subset of item_key, status, medical_severity
+            (empty for grand totals)
+        item: Item name (matched case- and whitespace-insensitively)
+        start, end: Inclusive claim date range (YYYY-MM-DD)
+    """
+    dimensions = [dimension.strip() for dimension in group_by.split(",") if dimension.strip()]
+    unknown = [dimension for dimension in dimensions if dimension not in LINE_ITEM_DIMENSIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown group_by dimension(s) {unknown}; expected {list(LINE_ITEM_DIMENSIONS)}"
+        )
+    
+    query = line_item_query(
+        group_by=dimensions, item=item, status=status,
+        medical_severity=medical_severity, start=start, end=end, limit=limit
+    )
+    rows = (await db.execute(query)).all()
+    return {"group_by": dimensions, "rows": format_line_items(rows)}
 
 @app.get("/api/test")
 # ... (Remains same)
@@ -0,0 +1,107 @@
+"""
+ClaimGuard AI - Medical Verdict Cache
+Persistent (diagnosis, item) -> verdict memo so the Medical Judge only asks
+the LLM about items it has not seen for a diagnosis recently.
+"""
+
+import os
+from datetime import datetime
+
+import models
+from persistent_cache import PersistentCache
+from policy_engine import normalize_key
+
+
+class MedicalVerdictCache(PersistentCache):
+    """Persistent verdict cache with TTL and LRU size eviction"""
+
+    entry_model = models.MedicalVerdictCacheEntry
+    key_columns = ("diagnosis_key", "item_key")
+
+    def __init__(self, session_factory, ttl_seconds=None, max_entries=None):
+        """
+        Args:
+            session_factory: Callable returning a SQLAlchemy Session
+            ttl_seconds: Entry lifetime (env MEDICAL_CACHE_TTL_SECONDS, default 7 days)
+            max_entries: Size bound (env MEDICAL_CACHE_MAX_ENTRIES, default 100000;
+                0 disables the cache without any database access)
+        """
+        if ttl_seconds is None:
+            ttl_seconds = int(os.getenv("MEDICAL_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        if max_entries is None:
+            max_entries = int(os.getenv("MEDICAL_CACHE_MAX_ENTRIES", "100000"))
+        super().__init__(session_factory, ttl_seconds, max_entries)
+
+    def get_many(self, diagnosis, item_names):
+        """
+        Look up verdicts for several items under one diagnosis
+
+        Returns:
+            dict: item_name -> {status, severity, reason} for cached items only
+        """
+        if not self.enabled:
+            self._count(misses=len(item_names))
+            return {}
+        diagnosis_key = normalize_key(diagnosis)
+        item_keys = {}
+        for item_name in item_names:
+            item_keys.setdefault(normalize_key(item_name), []).append(item_name)
+
+        db = self.session_factory()
+        try:
+            entries = models.MedicalVerdictCacheEntry
+            rows = (
+                db.query(entries)
+                .filter(entries.diagnosis_key == diagnosis_key)
+                .filter(entries.item_key.in_(list(item_keys)))
+                .all()
+            )
+
+            now = datetime.utcnow()
+            verdicts = {}
+            flush_due = False
+            for row in rows:
+                if row.created_at < now - self.ttl:
+                    continue
+                # Access times are buffered: a lookup takes no write lock
+                flush_due = self._touch((diagnosis_key, row.item_key), now) or flush_due
+                for item_name in item_keys[row.item_key]:
+                    verdicts[item_name] = {
+                        "status": row.status,
+                        "severity": row.severity,
+                        "reason": row.reason
+                    }
+            if flush_due:
+                self._flush_touches(db)
+                db.commit()
+        finally:
+            db.close()
+
+        hits = sum(1 for item_name in item_names if item_name in verdicts)
+        self._count(hits=hits, misses=len(item_names) - hits)
+        return verdicts
+
+    def put_many(self, diagnosis, verdicts):
+        """Store {item_name: verdict} for a diagnosis and evict stale entries"""
+        if not verdicts or not self.enabled:
+            return
+        diagnosis_key = normalize_key(diagnosis)
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            for item_name, verdict in verdicts.items():
+                db.merge(models.MedicalVerdictCacheEntry(
+                    diagnosis_key=diagnosis_key,
+                    item_key=normalize_key(item_name),
+                    status=verdict.get('status', 'PASS'),
+                    severity=verdict.get('severity', 'INFO'),
+                    reason=verdict.get('reason', ''),
+                    hit_count=0,
+                    created_at=now,
+                    last_accessed_at=now
+                ))
+            db.commit()
+            if self._eviction_due():
+                self._evict(db, now)
+        finally:
+            db.close()
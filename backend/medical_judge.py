@@ -6,27 +6,40 @@ Evaluates clinical necessity of claimed items based on diagnosis.
 import os
 import json
 import sys
+import asyncio
+import logging
+
+from metrics import record_llm_usage, LLM_REQUESTS_TOTAL
 
 # Try importing OpenAI
 try:
-    from openai import OpenAI
+    from openai import OpenAI, AsyncOpenAI
     OPENAI_AVAILABLE = True
 except ImportError:
     OPENAI_AVAILABLE = False
 
+logger = logging.getLogger("claimguard.medical_judge")
+
 
 class MedicalJudge:
     """Evaluates medical necessity of claims using clinical logic"""
     
-    def __init__(self):
+    def __init__(self, verdict_cache=None):
+        """
+        Args:
+            verdict_cache: Optional MedicalVerdictCache; cached (diagnosis, item)
+                verdicts are reused and only unseen items are sent to the LLM
+        """
         self.openai_api_key = os.environ.get('OPENAI_API_KEY')
+        self.verdict_cache = verdict_cache
         
         if self.openai_api_key and OPENAI_AVAILABLE:
             self.client = OpenAI(api_key=self.openai_api_key)
+            self.async_client = AsyncOpenAI(api_key=self.openai_api_key)
             self.mode = "active"
         else:
             self.mode = "mock"
-            print("[WARN] Medical Judge running in MOCK mode (No OpenAI Key)")
+            logger.warning("Medical Judge running in MOCK mode (No OpenAI Key)")
 
     def evaluate_necessity(self, diagnosis, line_items):
         """
@@ -42,11 +55,103 @@ class MedicalJudge:
         if self.mode == "mock" or diagnosis == "Unknown":
             return self._mock_evaluation(line_items)
 
+        cached, pending_items = self._lookup_cached(diagnosis, line_items)
+        if not pending_items:
+            return cached
+
         try:
-            # Prepare item list for LLM (names only to save tokens)
-            item_list = [item.get('name', 'Unknown Item') for item in line_items]
+            response = self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{"role": "system", "content": self.build_prompt(diagnosis, pending_items)}],
+                temperature=0.1,
+                max_tokens=1000,
+                response_format={"type": "json_object"}
+            )
+            record_llm_usage("medical_judge", response)
             
-            system_prompt = f"""You are a Medical Claims Reviewer evaluating post-hospitalization pharmacy reimbursement claims.
+            result = json.loads(response.choices[0].message.content)
+            LLM_REQUESTS_TOTAL.inc(agent="medical_judge", outcome="success")
+            self._store_verdicts(diagnosis, pending_items, result)
+            
+        except Exception as e:
+            LLM_REQUESTS_TOTAL.inc(agent="medical_judge", outcome="error")
+            logger.exception("Medical Judge failed")
+            result = self._mock_evaluation(pending_items)
+        
+        return {**cached, **result}
+
+    async def evaluate_necessity_async(self, diagnosis, line_items):
+        """
+        Async variant of evaluate_necessity that awaits the LLM call
+        so other pipeline stages can run during the network wait.
+        """
+        if self.mode == "mock" or diagnosis == "Unknown":
+            return self._mock_evaluation(line_items)
+
+        cached, pending_items = await asyncio.to_thread(self._lookup_cached, diagnosis, line_items)
+        if not pending_items:
+            return cached
+
+        try:
+            response = await self.async_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{"role": "system", "content": self.build_prompt(diagnosis, pending_items)}],
+                temperature=0.1,
+                max_tokens=1000,
+                response_format={"type": "json_object"}
+            )
+            record_llm_usage("medical_judge", response)
+            
+            result = json.loads(response.choices[0].message.content)
+            LLM_REQUESTS_TOTAL.inc(agent="medical_judge", outcome="success")
+            await asyncio.to_thread(self._store_verdicts, diagnosis, pending_items, result)
+            
+        except Exception as e:
+            LLM_REQUESTS_TOTAL.inc(agent="medical_judge", outcome="error")
+            logger.exception("Medical Judge failed")
+            result = self._mock_evaluation(pending_items)
+        
+        return {**cached, **result}
+
+    def _lookup_cached(self, diagnosis, line_items):
+        """Split line items into (cached verdicts, items that still need the LLM)"""
+        if not self.verdict_cache:
+            return {}, line_items
+        
+        try:
+            cached = self.verdict_cache.get_many(
+                diagnosis, [item.get('name', 'Unknown Item') for item in line_items]
+            )
+        except Exception as e:
+            logger.warning("Medical verdict cache lookup failed", extra={"error": str(e)})
+            return {}, line_items
+        
+        pending_items = [item for item in line_items if item.get('name', 'Unknown Item') not in cached]
+        return cached, pending_items
+
+    def _store_verdicts(self, diagnosis, evaluated_items, result):
+        """Cache LLM verdicts for the items that were sent (ignores unexpected keys)"""
+        if not self.verdict_cache:
+            return
+        
+        verdicts = {}
+        for item in evaluated_items:
+            item_name = item.get('name', 'Unknown Item')
+            verdict = result.get(item_name)
+            if isinstance(verdict, dict) and verdict.get('status'):
+                verdicts[item_name] = verdict
+        
+        try:
+            self.verdict_cache.put_many(diagnosis, verdicts)
+        except Exception as e:
+            logger.warning("Medical verdict cache store failed", extra={"error": str(e)})
+
+    def build_prompt(self, diagnosis, line_items):
+        """Build the clinical review prompt for a diagnosis and its line items"""
+        # Prepare item list for LLM (names only to save tokens)
+        item_list = [item.get('name', 'Unknown Item') for item in line_items]
+        
+        system_prompt = f"""You are a Medical Claims Reviewer evaluating post-hospitalization pharmacy reimbursement claims.
 
 **CONTEXT**: 
 - Patient Diagnosis: {diagnosis}
@@ -102,21 +207,7 @@ Example 3 - Diabetes:
 **NOW EVALUATE**: For diagnosis "{diagnosis}", evaluate each medication in {json.dumps(item_list)}
 
 Return ONLY valid JSON with no additional text."""
-
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "system", "content": system_prompt}],
-                temperature=0.1,
-                max_tokens=1000,
-                response_format={"type": "json_object"}
-            )
-            
-            result = json.loads(response.choices[0].message.content)
-            return result
-            
-        except Exception as e:
-            print(f"[ERROR] Medical Judge failed: {e}")
-            return self._mock_evaluation(line_items)
+        return system_prompt
 
     def _mock_evaluation(self, line_items):
         """Fallback for mock mode or errors - Passes everything"""
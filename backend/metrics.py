@@ -0,0 +1,204 @@
+"""
+ClaimGuard AI - Metrics
+Minimal thread-safe Prometheus-style counters and histograms rendered in
+the text exposition format on /metrics (no client library required).
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Latency buckets (seconds) spanning cached lookups to slow LLM round trips
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            series_items = sorted(
+                (key, list(series['counts']), series['sum'], series['count'])
+                for key, series in self._series.items()
+            )
+        lines = []
+        for key, counts, total, count in series_items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics plus callbacks for values owned elsewhere"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        """
+        Register a callable returning (name, type, help, [(labels dict, value)])
+        tuples, evaluated at scrape time (e.g. cache hit counters)
+        """
+        self._collectors.append(collector)
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.samples())
+        for collector in self._collectors:
+            for name, type_name, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {type_name}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_DURATION = REGISTRY.histogram(
+    "claimguard_stage_duration_seconds",
+    "Time spent in each claim pipeline stage (vision, waiting_period, medical, policy, db_write)",
+    labelnames=("stage",)
+)
+ANALYSIS_DURATION = REGISTRY.histogram(
+    "claimguard_analysis_duration_seconds",
+    "End-to-end time to analyze and save one claim",
+    labelnames=("source",)
+)
+CLAIMS_TOTAL = REGISTRY.counter(
+    "claimguard_claims_total",
+    "Analyzed claims by final decision status",
+    labelnames=("status",)
+)
+OVERRIDES_TOTAL = REGISTRY.counter(
+    "claimguard_overrides_total",
+    "Claims whose policy decision was overridden (fraud_reject, fraud_review, contraindication, medical_flag, waiting_period, unverified_insured, unverified_enrollment)",
+    labelnames=("kind",)
+)
+LLM_TOKENS_TOTAL = REGISTRY.counter(
+    "claimguard_llm_tokens_total",
+    "LLM tokens consumed by agent and token kind",
+    labelnames=("agent", "kind")
+)
+LLM_REQUESTS_TOTAL = REGISTRY.counter(
+    "claimguard_llm_requests_total",
+    "LLM calls by agent and outcome",
+    labelnames=("agent", "outcome")
+)
+CLAIM_WRITE_BATCH_SIZE = REGISTRY.histogram(
+    "claimguard_claim_write_batch_size",
+    "Claims committed per group-commit transaction",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+CLAIM_WRITE_FALLBACKS_TOTAL = REGISTRY.counter(
+    "claimguard_claim_write_fallbacks_total",
+    "Group commits that failed and were retried one claim at a time"
+)
+
+
+def record_llm_usage(agent, response):
+    """Count prompt/completion tokens from an OpenAI chat completion response"""
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return
+    LLM_TOKENS_TOTAL.inc(getattr(usage, 'prompt_tokens', 0) or 0, agent=agent, kind="prompt")
+    LLM_TOKENS_TOTAL.inc(getattr(usage, 'completion_tokens', 0) or 0, agent=agent, kind="completion")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, LargeBinary, ForeignKey, Index, Date
 from database import Base
 from datetime import datetime
 
@@ -22,5 +22,186 @@ class Claim(Base):
     # JSON Data (Store full result for analysis)
     full_data = Column(JSON)
     
+    # Perceptual hash (64-bit dHash, hex) of the receipt image for duplicate detection
+    receipt_phash = Column(String(16), index=True)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Keyset pagination on (created_at, id), optionally filtered by status / merchant
+    __table_args__ = (
+        Index("ix_claims_created_at_id", "created_at", "id"),
+        Index("ix_claims_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_claims_merchant_created_at_id", "merchant_name", "created_at", "id"),
+    )
+
+
+class VisionCacheEntry(Base):
+    """Cached Vision Agent extraction keyed by SHA-256 of the uploaded image bytes"""
+    __tablename__ = "vision_cache"
+
+    image_hash = Column(String(64), primary_key=True)
+    size_bytes = Column(Integer)
+    
+    # Parsed vision result
+    result = Column(JSON)
+    
+    # Eviction bookkeeping
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class MedicalVerdictCacheEntry(Base):
+    """Cached Medical Judge verdict for one (diagnosis, item) pair"""
+    __tablename__ = "medical_verdict_cache"
+
+    # Normalized (lowercase, single-spaced) keys
+    diagnosis_key = Column(String, primary_key=True)
+    item_key = Column(String, primary_key=True)
+    
+    # Verdict
+    status = Column(String)
+    severity = Column(String)
+    reason = Column(String)
+    
+    # Eviction bookkeeping
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class AnalysisJob(Base):
+    """Queued /api/jobs submission processed by the background worker pool"""
+    __tablename__ = "analysis_jobs"
+
+    id = Column(String(36), primary_key=True)
+    
+    # QUEUED -> RUNNING -> COMPLETED / FAILED
+    status = Column(String, index=True, default="QUEUED")
+    attempts = Column(Integer, default=0)
+    
+    # Uploaded payload (cleared once the job finishes)
+    filename = Column(String)
+    content_type = Column(String)
+    content = Column(LargeBinary)
+    content_hash = Column(String(64))
+    
+    # Outcome: the saved claim, or the raw result if it could not be saved
+    claim_db_id = Column(Integer, ForeignKey("claims.id"), nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class AnalysisJobHeartbeat(Base):
+    """Lease of the worker running an analysis job, renewed while the job runs"""
+    __tablename__ = "analysis_job_heartbeats"
+
+    job_id = Column(String(36), ForeignKey("analysis_jobs.id", ondelete="CASCADE"), primary_key=True)
+    # Attempt number holding the lease; a re-claim bumps it and fences the old worker out
+    attempt = Column(Integer, nullable=False)
+    heartbeat_at = Column(DateTime, nullable=False, index=True)
+
+
+class ClaimRollup(Base):
+    """Claim totals per day, status, merchant and claim type, maintained on every claim save"""
+    __tablename__ = "claim_rollups"
+
+    day = Column(Date, primary_key=True)
+    status = Column(String, primary_key=True)
+    merchant_name = Column(String, primary_key=True)
+    claim_type = Column(String, primary_key=True)
+    
+    claim_count = Column(Integer, default=0)
+    total_claimed = Column(Float, default=0.0)
+    total_approved = Column(Float, default=0.0)
+    total_deducted = Column(Float, default=0.0)
+
+
+class ClaimLineItem(Base):
+    """One line item decision of a saved claim, normalized out of full_data for item-level queries"""
+    __tablename__ = "claim_line_items"
+
+    id = Column(Integer, primary_key=True)
+    claim_db_id = Column(Integer, ForeignKey("claims.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer)
+    
+    # Item as billed, plus the normalized (lowercase, single-spaced) name used for lookups
+    item_name = Column(String)
+    item_key = Column(String)
+    
+    # Policy decision
+    status = Column(String)
+    claimed_amount = Column(Float)
+    approved_amount = Column(Float)
+    reason = Column(String)
+    
+    # Medical Judge verdict (null when the item was not evaluated)
+    medical_necessity = Column(String, nullable=True)
+    medical_severity = Column(String, nullable=True)
+    medical_reason = Column(String, nullable=True)
+    
+    # Copied from the claim so date-bounded item reports need no join
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_claim_line_items_item_status_created_at", "item_key", "status", "created_at"),
+        Index("ix_claim_line_items_status_created_at", "status", "created_at"),
+        Index("ix_claim_line_items_severity_created_at", "medical_severity", "created_at"),
+    )
+
+
+class BenefitLedgerEntry(Base):
+    """Year-to-date benefit consumption of one insured per policy year and sub-limit category"""
+    __tablename__ = "benefit_ledger"
+
+    insured_id = Column(String, primary_key=True)
+    policy_year = Column(Integer, primary_key=True)
+    category = Column(String, primary_key=True)
+    
+    # Paid out by saved claims, and held by claims still being processed
+    consumed = Column(Float, default=0.0, nullable=False)
+    reserved = Column(Float, default=0.0, nullable=False)
+    claim_count = Column(Integer, default=0, nullable=False)
+    
+    # Optimistic concurrency: every reservation bumps the version it read
+    version = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class BenefitHold(Base):
+    """Open reservation against a benefit_ledger row, released by the reaper once it expires"""
+    __tablename__ = "benefit_holds"
+
+    id = Column(String(32), primary_key=True)
+    # Analysis that owns the hold (for tracing a hold back to its claim)
+    claim_key = Column(String, index=True)
+    
+    insured_id = Column(String, nullable=False)
+    policy_year = Column(Integer, nullable=False)
+    category = Column(String, nullable=False)
+    amount = Column(Float, nullable=False)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class Enrollment(Base):
+    """Policy enrollment of an insured: start date and conditions declared at proposal"""
+    __tablename__ = "enrollments"
+
+    insured_id = Column(String, primary_key=True)
+    policy_product = Column(String, nullable=True)
+    
+    # Waiting periods run from the policy inception date
+    inception_date = Column(Date, nullable=False, index=True)
+    pre_existing_conditions = Column(JSON, default=list)
+    
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,141 @@
+"""
+ClaimGuard AI - Persistent Cache Base
+TTL and LRU bookkeeping shared by the database-backed caches: hit/miss
+counters, access times buffered in memory and written in batches, and the
+sampled eviction sweep.
+"""
+
+import threading
+from datetime import timedelta
+
+from sqlalchemy import and_, bindparam, func, tuple_, update
+
+
+class PersistentCache:
+    """
+    Base for database-backed caches with TTL and LRU size eviction
+
+    Subclasses set entry_model (a model with created_at, last_accessed_at and
+    hit_count columns) and key_columns (the names of its primary key columns).
+    """
+
+    entry_model = None
+    key_columns = ()
+
+    def __init__(self, session_factory, ttl_seconds, max_entries):
+        """
+        Args:
+            session_factory: Callable returning a SQLAlchemy Session
+            ttl_seconds: Entry lifetime
+            max_entries: Size bound (0 disables the cache without any database access)
+        """
+        self.session_factory = session_factory
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_entries = max_entries
+        # The size bound is enforced by a sweep every evict_every puts (1% of
+        # max_entries), so a put never has to count the whole table
+        self.evict_every = max(1, max_entries // 100)
+        self._puts_since_evict = 0
+        # Hits are recorded in memory (key -> [hits, last accessed]) so a
+        # lookup never writes; they are flushed in one batch by the sweep, or
+        # once evict_every distinct entries are waiting
+        self._touches = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _touch(self, key, now):
+        """
+        Record a hit on an entry
+
+        Returns:
+            bool: True once enough touches are buffered to be flushed
+        """
+        with self._lock:
+            touch = self._touches.get(key)
+            if touch is None:
+                self._touches[key] = [1, now]
+            else:
+                touch[0] += 1
+                touch[1] = max(touch[1], now)
+            return len(self._touches) >= self.evict_every
+
+    def _flush_touches(self, db):
+        """Write buffered hit counts and access times in one executemany UPDATE (caller commits)"""
+        with self._lock:
+            touches, self._touches = self._touches, {}
+        if not touches:
+            return
+        table = self.entry_model.__table__
+        statement = (
+            update(table)
+            .where(and_(*(table.c[column] == bindparam(f"key_{column}") for column in self.key_columns)))
+            .values(
+                hit_count=func.coalesce(table.c.hit_count, 0) + bindparam("hits"),
+                last_accessed_at=bindparam("accessed_at")
+            )
+        )
+        db.execute(statement, [
+            {
+                **{f"key_{column}": value for column, value in zip(self.key_columns, key)},
+                "hits": hits,
+                "accessed_at": accessed_at
+            }
+            for key, (hits, accessed_at) in touches.items()
+        ])
+
+    def _eviction_due(self):
+        with self._lock:
+            self._puts_since_evict += 1
+            if self._puts_since_evict < self.evict_every:
+                return False
+            self._puts_since_evict = 0
+            return True
+
+    def _evict(self, db, now):
+        """Drop expired entries, then the least recently used beyond max_entries"""
+        self._flush_touches(db)
+        entries = self.entry_model
+        evicted = db.query(entries).filter(entries.created_at < now - self.ttl).delete(synchronize_session=False)
+
+        overflow = db.query(entries).count() - self.max_entries
+        if overflow > 0:
+            keys = [getattr(entries, column) for column in self.key_columns]
+            stale = [
+                tuple(row)
+                for row in db.query(*keys).order_by(entries.last_accessed_at.asc()).limit(overflow)
+            ]
+            if len(keys) == 1:
+                condition = keys[0].in_([row[0] for row in stale])
+            else:
+                condition = tuple_(*keys).in_(stale)
+            evicted += db.query(entries).filter(condition).delete(synchronize_session=False)
+
+        db.commit()
+        if evicted:
+            self._count(evictions=evicted)
+
+    def _count(self, hits=0, misses=0, evictions=0):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            self.evictions += evictions
+
+    def stats(self):
+        """Hit/miss counters for the health endpoint"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "max_entries": self.max_entries,
+                "ttl_seconds": int(self.ttl.total_seconds())
+            }
@@ -0,0 +1,80 @@
+"""
+ClaimGuard AI - Stage Pipeline
+Runs claim-processing stages as a small dependency graph so independent
+stages (e.g. Medical Judge LLM call and policy adjudication) overlap.
+"""
+
+import asyncio
+import inspect
+
+
+class Stage:
+    """A single named pipeline step"""
+
+    def __init__(self, name, func, depends_on=(), blocking=False):
+        """
+        Args:
+            name: Unique stage name, also the key of its result
+            func: Callable taking the results dict of completed stages
+            depends_on: Names of stages that must finish first
+            blocking: Run a synchronous CPU-bound func in a worker thread
+        """
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.blocking = blocking
+
+
+class StagePipeline:
+    """Dependency graph of stages; each stage starts as soon as its dependencies finish"""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add_stage(self, name, func, depends_on=(), blocking=False):
+        """Register a stage. Dependencies must already be registered, which keeps the graph acyclic."""
+        if name in self.stages:
+            raise ValueError(f"Stage '{name}' is already registered")
+        for dependency in depends_on:
+            if dependency not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'")
+        self.stages[name] = Stage(name, func, depends_on, blocking)
+        return self
+
+    async def run(self, results=None):
+        """
+        Run every stage and return the results dict keyed by stage name
+
+        Args:
+            results: Optional dict of precomputed inputs visible to all stages
+
+        Raises:
+            Exception: The first stage failure; stages still running are cancelled
+        """
+        results = dict(results or {})
+        tasks = {}
+
+        async def run_stage(stage):
+            if stage.depends_on:
+                await asyncio.gather(*(tasks[dependency] for dependency in stage.depends_on))
+            if stage.blocking:
+                value = await asyncio.to_thread(stage.func, results)
+            else:
+                value = stage.func(results)
+                if inspect.isawaitable(value):
+                    value = await value
+            results[stage.name] = value
+            return value
+
+        for stage in self.stages.values():
+            tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return results
@@ -3,28 +3,283 @@ ClaimGuard AI - Policy Adjudicator Agent
 Enforces Indian Health Insurance Policy Rules for Claims Processing
 """
 
+import hashlib
 import json
+import re
 import sys
+from collections import deque
+from datetime import date, timedelta
 from pathlib import Path
 
+# Optional: NumPy powers the vectorized batch adjudication path
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+class PolicyEngineError(Exception):
+    """Base error raised by the policy engine"""
+
+
+class PolicyRulesError(PolicyEngineError):
+    """Policy rules file is missing or malformed"""
+
+
+class ClaimDataError(PolicyEngineError):
+    """Claim data is missing or malformed"""
+
+
+class UnknownPolicyError(PolicyEngineError):
+    """No policy rules exist for the requested product / policy version"""
+
+
+class ExclusionMatcher:
+    """
+    Compiled matcher for the excluded_items section of the policy rules.
+
+    Matches an item name against every excluded item and partial keyword in a
+    single pass using an Aho-Corasick automaton ("pattern contained in item
+    name"), plus a substring index for the reverse direction ("item name
+    contained in pattern"). Every pattern gets a priority equal to its position
+    in the original rule order, so the lowest-priority hit is exactly the
+    first match the naive category -> item -> keyword scan would return.
+    """
+
+    def __init__(self, excluded_rules):
+        categories = excluded_rules.get('categories', [])
+        keywords = excluded_rules.get('partial_match_keywords', [])
+
+        # results[priority] -> (category, reason)
+        self.results = []
+        patterns = []
+
+        for category in categories:
+            for excluded_item in category.get('items', []):
+                patterns.append(excluded_item.lower())
+                self.results.append((category['category'], category['reason']))
+        self.item_pattern_count = len(patterns)
+
+        for keyword in keywords:
+            patterns.append(keyword.lower())
+            self.results.append(("Partial Match", f"Contains excluded keyword: {keyword}"))
+
+        self._build_automaton(patterns)
+        self._build_reverse_index(patterns[:self.item_pattern_count])
+
+    def _build_automaton(self, patterns):
+        """Build goto/fail tables; best[state] is the lowest priority ending at that state"""
+        self.goto = [{}]
+        best = [None]
+
+        for priority, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    best.append(None)
+                state = next_state
+            if best[state] is None or priority < best[state]:
+                best[state] = priority
+
+        # Breadth-first pass: fold each state's fail-chain outputs into best[]
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            fail_best = best[self.fail[state]]
+            if fail_best is not None and (best[state] is None or fail_best < best[state]):
+                best[state] = fail_best
+            for char, next_state in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                queue.append(next_state)
+
+        self.best = best
+
+    def _build_reverse_index(self, item_patterns):
+        """Map every substring of an excluded item to the lowest priority containing it"""
+        self.reverse_index = {}
+        for priority, pattern in enumerate(item_patterns):
+            length = len(pattern)
+            for start in range(length + 1):
+                for end in range(start, length + 1):
+                    self.reverse_index.setdefault(pattern[start:end], priority)
+
+    def match(self, item_name):
+        """
+        Find the first excluded rule matching an item name
+
+        Returns:
+            tuple: (category, reason) or None if the item is not excluded
+        """
+        item_name_lower = item_name.lower()
+        goto, fail, best = self.goto, self.fail, self.best
+
+        hit = best[0]
+        state = 0
+        for char in item_name_lower:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            found = best[state]
+            if found is not None and (hit is None or found < hit):
+                hit = found
+
+        reverse_hit = self.reverse_index.get(item_name_lower)
+        if reverse_hit is not None and (hit is None or reverse_hit < hit):
+            hit = reverse_hit
+
+        return None if hit is None else self.results[hit]
+
+
+MAX_POLICY_BASE_DEPTH = 4
+# Plan whose sum insured applies when neither the claim nor the product gives one
+DEFAULT_SUM_INSURED_PLAN = "individual"
+
+
+def read_policy_rules(policy_path, depth=0, source_paths=None):
+    """
+    Parse a policy rules file, resolving its optional "base" file
+
+    A product variant can name a base rules file (relative to itself) and
+    only list the top-level sections it replaces, e.g. its own
+    excluded_items or deduction_rules.
+
+    Returns:
+        tuple: (merged rules dict, paths of every file read)
+    """
+    policy_path = Path(policy_path)
+    source_paths = source_paths if source_paths is not None else []
+    source_paths.append(policy_path)
+    try:
+        with open(policy_path, 'r', encoding='utf-8') as f:
+            policy_rules = json.load(f)
+    except FileNotFoundError:
+        raise PolicyRulesError(f"Policy rules file not found at {policy_path}")
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise PolicyRulesError(f"Invalid JSON in policy rules file {policy_path}")
+    if not isinstance(policy_rules, dict):
+        raise PolicyRulesError(f"Policy rules file {policy_path} must contain a JSON object")
+    
+    base = policy_rules.pop('base', None)
+    if base:
+        if depth >= MAX_POLICY_BASE_DEPTH:
+            raise PolicyRulesError(f"Policy rules file {policy_path} nests 'base' files too deeply")
+        base_rules, source_paths = read_policy_rules(policy_path.parent / base, depth + 1, source_paths)
+        policy_rules = {**base_rules, **policy_rules}
+    return policy_rules, source_paths
+
+
+def policy_digest(policy_rules):
+    """Digest of the effective rules (independent of file layout and formatting)"""
+    canonical = json.dumps(policy_rules, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class WaitingPeriodMatcher:
+    """
+    Compiled matcher for the waiting_periods section of the policy rules.
+
+    All specific diseases are folded into one case-insensitive, word-bounded
+    regex alternation (longest names first), so a diagnosis is classified in
+    a single scan; the longest waiting period among the matched diseases wins.
+    """
+
+    def __init__(self, waiting_rules):
+        self.initial_days = waiting_rules.get('initial_waiting_period', 0) or 0
+        self.pre_existing_days = waiting_rules.get('pre_existing_diseases', 0) or 0
+        self.disease_days = {}
+        self.disease_names = {}
+        for disease in waiting_rules.get('specific_diseases', []):
+            key = normalize_key(disease['disease'])
+            if not key:
+                continue
+            self.disease_days[key] = max(disease.get('waiting_days', 0), self.disease_days.get(key, 0))
+            self.disease_names[key] = disease['disease']
+        self.pattern = compile_word_pattern(self.disease_days)
+
+    def specific_disease(self, diagnosis):
+        """
+        Returns:
+            tuple: (disease name, waiting days) with the longest wait, or None
+        """
+        if not self.pattern or not diagnosis:
+            return None
+        matches = {normalize_key(match.group(0)) for match in self.pattern.finditer(diagnosis)}
+        if not matches:
+            return None
+        key = max(matches, key=lambda disease: self.disease_days[disease])
+        return self.disease_names[key], self.disease_days[key]
+
+
+def normalize_key(text):
+    """Lowercase and collapse whitespace so trivial spelling variants share an entry"""
+    return " ".join(str(text).lower().split())
+
+
+def compile_word_pattern(phrases):
+    """
+    Case-insensitive, word-bounded alternation of phrases (None when empty);
+    any run of whitespace matches between words, so normalize_key() of a
+    match is the normalize_key() of its phrase
+    """
+    phrases = sorted({normalize_key(phrase) for phrase in phrases if phrase} - {""}, key=len, reverse=True)
+    if not phrases:
+        return None
+    alternatives = (r"\s+".join(re.escape(word) for word in phrase.split()) for phrase in phrases)
+    return re.compile(r"\b(?:" + "|".join(alternatives) + r")\b", re.IGNORECASE)
+
+
+def is_number(value):
+    """JSON number (bool is not a price)"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def parse_claim_date(claim_data):
+    """Treatment date of a claim (admission date for hospitalization), or None"""
+    for field in ('admission_date', 'date'):
+        value = claim_data.get(field)
+        if not value:
+            continue
+        try:
+            return date.fromisoformat(str(value)[:10])
+        except ValueError:
+            continue
+    return None
+
 
 class PolicyAdjudicator:
-    def __init__(self, policy_path="data/policy_rules.json"):
-        """Initialize the Policy Adjudicator with policy rules"""
+    def __init__(self, policy_path="data/policy_rules.json", policy_product=None):
+        """
+        Initialize the Policy Adjudicator with policy rules
+
+        Args:
+            policy_product: Product the rules belong to; picks the default sum
+                insured from sum_insured_limits for claims that do not state one
+        """
         self.policy_path = Path(policy_path)
+        self.policy_product = policy_product
         self.policy_rules = self.load_policy_rules()
         
     def load_policy_rules(self):
-        """Load policy rules from JSON file"""
-        try:
-            with open(self.policy_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            print(f"Error: Policy rules file not found at {self.policy_path}")
-            sys.exit(1)
-        except json.JSONDecodeError:
-            print(f"Error: Invalid JSON in policy rules file")
-            sys.exit(1)
+        """Load policy rules from JSON file and compile the exclusion matcher"""
+        policy_rules, self.source_paths = read_policy_rules(self.policy_path)
+        self.exclusion_matcher = ExclusionMatcher(policy_rules.get('excluded_items', {}))
+        self.waiting_period_matcher = WaitingPeriodMatcher(policy_rules.get('waiting_periods', {}))
+        # Declared version plus a digest of the rules, so any rule change yields a new version
+        self.policy_version = f"{policy_rules.get('policy_version', '0')}+{policy_digest(policy_rules)[:8]}"
+        sum_insured_limits = policy_rules.get('sum_insured_limits', {})
+        self.default_sum_insured = sum_insured_limits.get(
+            self.policy_product, sum_insured_limits.get(DEFAULT_SUM_INSURED_PLAN, 500000)
+        )
+        return policy_rules
     
     def load_claim(self, claim_path):
         """Load claim data from JSON file"""
@@ -32,28 +287,15 @@ class PolicyAdjudicator:
             with open(claim_path, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except FileNotFoundError:
-            print(f"Error: Claim file not found at {claim_path}")
-            sys.exit(1)
+            raise ClaimDataError(f"Claim file not found at {claim_path}")
         except json.JSONDecodeError:
-            print(f"Error: Invalid JSON in claim file")
-            sys.exit(1)
+            raise ClaimDataError(f"Invalid JSON in claim file {claim_path}")
     
     def is_excluded_item(self, item_name):
         """Check if an item matches any excluded category"""
-        item_name_lower = item_name.lower()
-        excluded_categories = self.policy_rules.get('excluded_items', {}).get('categories', [])
-        
-        # Check exact matches in excluded items list
-        for category in excluded_categories:
-            for excluded_item in category.get('items', []):
-                if excluded_item.lower() in item_name_lower or item_name_lower in excluded_item.lower():
-                    return True, category['category'], category['reason']
-        
-        # Check partial keyword matches
-        partial_keywords = self.policy_rules.get('excluded_items', {}).get('partial_match_keywords', [])
-        for keyword in partial_keywords:
-            if keyword.lower() in item_name_lower:
-                return True, "Partial Match", f"Contains excluded keyword: {keyword}"
+        match = self.exclusion_matcher.match(item_name)
+        if match:
+            return True, match[0], match[1]
         
         return False, None, None
     
@@ -63,7 +305,7 @@ class PolicyAdjudicator:
         allowed_percentage = room_rent_rules.get('allowed_percentage', 1) / 100
         
         # Get sum insured from claim
-        sum_insured = claim_data.get('sum_insured', 500000)  # Default to 5 lakhs
+        sum_insured = claim_data.get('sum_insured', self.default_sum_insured)
         allowed_room_rent = sum_insured * allowed_percentage
         
         # Find room rent item in line items
@@ -100,8 +342,23 @@ class PolicyAdjudicator:
         }
     
     def adjudicate_claim(self, claim_path):
-        """Main function to adjudicate a claim"""
-        claim_data = self.load_claim(claim_path)
+        """Adjudicate a claim stored in a JSON file (CLI / test wrapper around adjudicate)"""
+        return self.adjudicate(self.load_claim(claim_path))
+    
+    def adjudicate(self, claim_data):
+        """
+        Main function to adjudicate an already-parsed claim
+        
+        Args:
+            claim_data: Claim dict in the vision agent output schema
+            
+        Returns:
+            dict: Adjudication result with line item decisions
+            
+        Raises:
+            ClaimDataError: If the claim, its line items or their amounts are malformed
+        """
+        self.validate_claim(claim_data)
         
         # Initialize tracking variables
         total_claimed = claim_data.get('total_amount', 0)
@@ -174,11 +431,283 @@ class PolicyAdjudicator:
             'room_rent_deduction_applied': deduction_info['deduction_applied'],
             'deduction_reason': deduction_info['deduction_reason'],
             'line_item_decisions': line_item_decisions,
-            'summary': self.generate_summary(status, total_claimed, total_approved, excluded_items_count, deduction_info)
+            'summary': self.generate_summary(status, total_claimed, total_approved, excluded_items_count, deduction_info),
+            'policy_version': self.policy_version
         }
         
         return result
     
+    def validate_claim(self, claim_data):
+        """Raise ClaimDataError if claim data cannot be adjudicated"""
+        if not isinstance(claim_data, dict):
+            raise ClaimDataError(f"Claim data must be a JSON object, got {type(claim_data).__name__}")
+        for field in ('total_amount', 'sum_insured'):
+            if field in claim_data and not is_number(claim_data[field]):
+                raise ClaimDataError(f"Claim {field} must be a number")
+        line_items = claim_data.get('line_items', [])
+        if not isinstance(line_items, list):
+            raise ClaimDataError("Claim line_items must be a list")
+        for position, item in enumerate(line_items, start=1):
+            if not isinstance(item, dict):
+                raise ClaimDataError(f"Line item {position} must be a JSON object, got {type(item).__name__}")
+            if not isinstance(item.get('name', ''), str):
+                raise ClaimDataError(f"Line item {position} name must be a string")
+            for field in ('total_price', 'unit_price'):
+                if field in item and not is_number(item[field]):
+                    raise ClaimDataError(f"Line item {position} {field} must be a number")
+    
+    def adjudicate_batch(self, claims):
+        """
+        Adjudicate many already-parsed claims at once
+        
+        Line items of all claims are flattened into NumPy columns so exclusion
+        masks, room rent ratios and approved amounts are computed with array
+        operations. Results are identical to calling adjudicate() per claim,
+        including float rounding and summation order. Falls back to the
+        per-claim loop when NumPy is not installed.
+        
+        Args:
+            claims: Iterable of claim dicts in the vision agent output schema
+            
+        Returns:
+            list: Adjudication results in the same order as the input claims
+        """
+        claims = list(claims)
+        for claim_data in claims:
+            self.validate_claim(claim_data)
+        
+        if not NUMPY_AVAILABLE:
+            return [self.adjudicate(claim_data) for claim_data in claims]
+        
+        claim_count = len(claims)
+        claim_line_items = [claim_data.get('line_items', []) for claim_data in claims]
+        counts = np.fromiter((len(line_items) for line_items in claim_line_items), dtype=np.int64, count=claim_count)
+        offsets = np.zeros(claim_count + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        
+        # Flatten line items into columns
+        items = [item for line_items in claim_line_items for item in line_items]
+        item_names = [item.get('name', '') for item in items]
+        claimed_amounts = [item.get('total_price', 0) for item in items]
+        prices = np.array(claimed_amounts, dtype=np.float64)
+        claim_index = np.repeat(np.arange(claim_count), counts)
+        
+        # Evaluate each distinct item name once
+        name_codes = {}
+        codes = np.fromiter(
+            (name_codes.setdefault(name, len(name_codes)) for name in item_names),
+            dtype=np.int64, count=len(items)
+        )
+        unique_names = list(name_codes)
+        exclusion_reasons = []
+        for name in unique_names:
+            is_excluded, exclusion_category, exclusion_reason = self.is_excluded_item(name)
+            exclusion_reasons.append(f"Excluded: {exclusion_category} - {exclusion_reason}" if is_excluded else None)
+        unique_lower = [name.lower() for name in unique_names]
+        excluded = np.array([reason is not None for reason in exclusion_reasons], dtype=bool)[codes]
+        is_room_item = np.array(
+            [('room rent' in name or 'room charge' in name) for name in unique_lower], dtype=bool
+        )[codes]
+        is_room_rent = np.array(['room rent' in name for name in unique_lower], dtype=bool)[codes]
+        
+        # Room rent proportionate ratio per claim (first room item wins)
+        room_rent_rules = self.policy_rules.get('room_rent_rules', {})
+        allowed_percentage = room_rent_rules.get('allowed_percentage', 1) / 100
+        sum_insured_values = [claim_data.get('sum_insured', self.default_sum_insured) for claim_data in claims]
+        allowed_room_rent = np.array(sum_insured_values, dtype=np.float64) * allowed_percentage
+        
+        room_positions = np.flatnonzero(is_room_item)
+        room_claims, first_room = np.unique(claim_index[room_positions], return_index=True)
+        room_item_positions = room_positions[first_room]
+        actual_room_rent_values = [0] * claim_count
+        for claim_idx, position in zip(room_claims.tolist(), room_item_positions.tolist()):
+            actual_room_rent_values[claim_idx] = items[position].get('unit_price', 0)
+        has_room_item = np.zeros(claim_count, dtype=bool)
+        has_room_item[room_claims] = True
+        actual_room_rent = np.array(actual_room_rent_values, dtype=np.float64)
+        
+        deduction_applied = has_room_item & (actual_room_rent > allowed_room_rent)
+        proportionate_ratio = np.ones(claim_count, dtype=np.float64)
+        proportionate_ratio[deduction_applied] = (
+            allowed_room_rent[deduction_applied] / actual_room_rent[deduction_applied]
+        )
+        
+        # Approved amount per item, then exact left-to-right totals per claim
+        approved = _round_cents(prices * proportionate_ratio[claim_index])
+        approved[excluded] = 0.0
+        totals_approved = _segment_sequential_sum(approved, offsets[:-1], counts)
+        excluded_counts = np.bincount(claim_index[excluded], minlength=claim_count)
+        
+        approved_list = approved.tolist()
+        excluded_list = excluded.tolist()
+        is_room_rent_list = is_room_rent.tolist()
+        codes_list = codes.tolist()
+        offsets_list = offsets.tolist()
+        ratio_list = proportionate_ratio.tolist()
+        allowed_list = allowed_room_rent.tolist()
+        deduction_list = deduction_applied.tolist()
+        totals_list = totals_approved.tolist()
+        excluded_counts_list = excluded_counts.tolist()
+        counts_list = counts.tolist()
+        
+        results = []
+        for claim_idx, claim_data in enumerate(claims):
+            ratio = ratio_list[claim_idx]
+            allowed = allowed_list[claim_idx]
+            sum_insured = sum_insured_values[claim_idx]
+            actual = actual_room_rent_values[claim_idx]
+            deduction_info = {
+                'proportionate_ratio': ratio,
+                'deduction_applied': deduction_list[claim_idx],
+                'deduction_reason': None,
+                'allowed_room_rent': allowed,
+                'actual_room_rent': actual
+            }
+            if deduction_info['deduction_applied']:
+                deduction_info['deduction_reason'] = (
+                    f"Room rent of Rs.{actual:,.2f}/day exceeds allowed limit of "
+                    f"Rs.{allowed:,.2f}/day (1% of Rs.{sum_insured:,.2f} sum insured). "
+                    f"Proportionate deduction ratio: {ratio:.4f}"
+                )
+                approved_reason = f"Approved with proportionate deduction ({ratio:.2%})"
+                room_rent_reason = f"Room rent capped at policy limit (Rs.{allowed:,.2f}/day)"
+            else:
+                approved_reason = room_rent_reason = "Approved - complies with policy"
+            
+            line_item_decisions = []
+            for position in range(offsets_list[claim_idx], offsets_list[claim_idx + 1]):
+                if excluded_list[position]:
+                    line_item_decisions.append({
+                        'item_name': item_names[position],
+                        'claimed_amount': claimed_amounts[position],
+                        'approved_amount': 0,
+                        'status': 'REJECTED',
+                        'reason': exclusion_reasons[codes_list[position]]
+                    })
+                else:
+                    line_item_decisions.append({
+                        'item_name': item_names[position],
+                        'claimed_amount': claimed_amounts[position],
+                        'approved_amount': approved_list[position],
+                        'status': 'APPROVED',
+                        'reason': room_rent_reason if is_room_rent_list[position] else approved_reason
+                    })
+            
+            excluded_items_count = excluded_counts_list[claim_idx]
+            total_claimed = claim_data.get('total_amount', 0)
+            # adjudicate() keeps the integer 0 start value when nothing is approved
+            total_approved = totals_list[claim_idx] if excluded_items_count < counts_list[claim_idx] else 0
+            
+            if total_approved == 0:
+                status = "REJECTED"
+            elif total_approved < total_claimed:
+                status = "PARTIAL_APPROVAL"
+            else:
+                status = "APPROVED"
+            
+            results.append({
+                'claim_id': claim_data.get('claim_id', 'UNKNOWN'),
+                'claim_type': claim_data.get('claim_type', 'UNKNOWN'),
+                'merchant_name': claim_data.get('merchant_name', 'UNKNOWN'),
+                'patient_name': claim_data.get('patient_name', 'UNKNOWN'),
+                'total_claimed': round(total_claimed, 2),
+                'total_approved': round(total_approved, 2),
+                'total_deducted': round(total_claimed - total_approved, 2),
+                'status': status,
+                'excluded_items_count': excluded_items_count,
+                'room_rent_deduction_applied': deduction_info['deduction_applied'],
+                'deduction_reason': deduction_info['deduction_reason'],
+                'line_item_decisions': line_item_decisions,
+                'summary': self.generate_summary(status, total_claimed, total_approved, excluded_items_count, deduction_info),
+                'policy_version': self.policy_version
+            })
+        
+        return results
+    
+    def check_waiting_period(self, claim_data, inception_date, pre_existing_conditions=(), pre_existing_pattern=None):
+        """
+        Check a claim against the policy waiting periods
+        
+        Args:
+            claim_data: Claim dict (diagnosis_or_specialty and date are used)
+            inception_date: Policy start date of the insured
+            pre_existing_conditions: Conditions declared at enrollment
+            pre_existing_pattern: Precompiled compile_word_pattern() of those
+                conditions (built on the fly when omitted)
+            
+        Returns:
+            dict: The violated waiting period (rule, waiting_days, days_covered,
+            eligible_from, reason), or None if the claim is eligible
+        """
+        claim_date = parse_claim_date(claim_data)
+        if inception_date is None or claim_date is None:
+            return None
+        days_covered = (claim_date - inception_date).days
+        matcher = self.waiting_period_matcher
+        diagnosis = claim_data.get('diagnosis_or_specialty') or claim_data.get('diagnosis') or ''
+        
+        candidates = [("initial", matcher.initial_days, "Initial waiting period")]
+        disease = matcher.specific_disease(diagnosis)
+        if disease:
+            candidates.append(("specific_disease", disease[1], f"Waiting period for {disease[0]}"))
+        if pre_existing_pattern is None:
+            pre_existing_pattern = compile_word_pattern(pre_existing_conditions)
+        if pre_existing_pattern and pre_existing_pattern.search(diagnosis):
+            candidates.append(("pre_existing_disease", matcher.pre_existing_days, "Pre-existing disease waiting period"))
+        
+        rule, waiting_days, label = max(candidates, key=lambda candidate: candidate[1])
+        if days_covered >= waiting_days:
+            return None
+        eligible_from = inception_date + timedelta(days=waiting_days)
+        return {
+            'rule': rule,
+            'waiting_days': waiting_days,
+            'days_covered': days_covered,
+            'eligible_from': eligible_from.isoformat(),
+            'reason': (
+                f"{label} of {waiting_days} days not completed "
+                f"({days_covered} days since policy inception on {inception_date.isoformat()}); "
+                f"claims eligible from {eligible_from.isoformat()}"
+            )
+        }
+    
+    def reject_for_waiting_period(self, claim_data, violation):
+        """Adjudication result rejecting every line item for a waiting period violation"""
+        self.validate_claim(claim_data)
+        total_claimed = claim_data.get('total_amount', 0)
+        reason = f"Waiting period: {violation['reason']}"
+        return {
+            'claim_id': claim_data.get('claim_id', 'UNKNOWN'),
+            'claim_type': claim_data.get('claim_type', 'UNKNOWN'),
+            'merchant_name': claim_data.get('merchant_name', 'UNKNOWN'),
+            'patient_name': claim_data.get('patient_name', 'UNKNOWN'),
+            'total_claimed': round(total_claimed, 2),
+            'total_approved': 0,
+            'total_deducted': round(total_claimed, 2),
+            'status': "REJECTED",
+            'excluded_items_count': 0,
+            'room_rent_deduction_applied': False,
+            'deduction_reason': None,
+            'waiting_period_violation': violation,
+            'line_item_decisions': [
+                {
+                    'item_name': item.get('name', ''),
+                    'claimed_amount': item.get('total_price', 0),
+                    'approved_amount': 0,
+                    'status': 'REJECTED',
+                    'reason': reason
+                }
+                for item in claim_data.get('line_items', [])
+            ],
+            'summary': (
+                "[REJECT] Claim REJECTED - Waiting period not completed\n"
+                f"   • {violation['reason']}\n"
+                f"   • Claimed: Rs.{total_claimed:,.2f}\n"
+                f"   • Approved: Rs.0.00"
+            ),
+            'policy_version': self.policy_version
+        }
+    
     def generate_summary(self, status, total_claimed, total_approved, excluded_count, deduction_info):
         """Generate a human-readable summary of the adjudication"""
         summary_lines = []
@@ -201,6 +730,46 @@ class PolicyAdjudicator:
         return "\n".join(summary_lines)
 
 
+def _round_cents(values):
+    """
+    Round an array to 2 decimals exactly like Python's round(x, 2)
+    
+    np.round scales by 100 before rounding, which can land on the other side
+    of a .5 tie than the correctly rounded decimal. Only values whose scaled
+    fraction sits within a few ulps of .5 are re-rounded in Python.
+    """
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    fraction = scaled - np.floor(scaled)
+    near_tie = np.abs(fraction - 0.5) <= 4 * np.spacing(np.abs(scaled))
+    for position in np.flatnonzero(near_tie).tolist():
+        rounded[position] = round(float(values[position]), 2)
+    return rounded
+
+
+def _segment_sequential_sum(values, starts, counts):
+    """
+    Sum contiguous segments strictly left to right
+    
+    np.add.reduceat uses pairwise summation, which can differ in the last bit
+    from a Python += loop. Instead, segments are sorted by length and the j-th
+    element of every segment still active is added in one vectorized step.
+    """
+    totals = np.zeros(len(counts), dtype=np.float64)
+    if not len(counts) or not counts.max():
+        return totals
+    order = np.argsort(-counts, kind='stable')
+    sorted_starts = starts[order]
+    sorted_counts = counts[order]
+    # active[j] = number of segments longer than j
+    active = np.searchsorted(-sorted_counts, -np.arange(sorted_counts[0]), side='left')
+    sorted_totals = np.zeros(len(counts), dtype=np.float64)
+    for j, active_count in enumerate(active.tolist()):
+        sorted_totals[:active_count] += values[sorted_starts[:active_count] + j]
+    totals[order] = sorted_totals
+    return totals
+
+
 def main():
     """Main entry point for CLI usage"""
     if len(sys.argv) < 2:
@@ -210,11 +779,15 @@ def main():
     
     claim_file_path = sys.argv[1]
     
-    # Initialize adjudicator
-    adjudicator = PolicyAdjudicator()
-    
-    # Adjudicate the claim
-    result = adjudicator.adjudicate_claim(claim_file_path)
+    try:
+        # Initialize adjudicator
+        adjudicator = PolicyAdjudicator()
+        
+        # Adjudicate the claim
+        result = adjudicator.adjudicate_claim(claim_file_path)
+    except PolicyEngineError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
     
     # Print result as formatted JSON
     print("\n" + "="*80)
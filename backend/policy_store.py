@@ -0,0 +1,315 @@
+"""
+ClaimGuard AI - Hot-Reloadable Policy Rules
+Keeps the compiled PolicyAdjudicator for the rules file as an immutable
+snapshot. Edits to the file (or POST /api/policy/reload) build a new
+snapshot in a worker thread and swap it in atomically; claims that already
+picked up the old snapshot finish on it.
+
+PolicyRegistry adds per-product rule sets (individual, family floater,
+senior citizen, ...) compiled lazily into a bounded LRU keyed by
+(product, policy_version).
+"""
+
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+from policy_engine import PolicyAdjudicator, UnknownPolicyError, read_policy_rules, policy_digest
+
+logger = logging.getLogger("claimguard.policy")
+
+
+def file_signature(paths):
+    """(mtime, size) of each path (None for missing files), cheap enough to poll"""
+    signature = []
+    for path in paths:
+        try:
+            stat = Path(path).stat()
+        except FileNotFoundError:
+            signature.append(None)
+            continue
+        signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class PolicyStore:
+    """Current policy snapshot for one rules file, reloaded when the file changes"""
+
+    def __init__(self, policy_path, watch_interval=None):
+        """
+        Args:
+            policy_path: Path to the policy rules JSON
+            watch_interval: Seconds between file checks (env POLICY_WATCH_INTERVAL,
+                default 2; 0 disables watching, leaving only explicit reloads)
+        """
+        self.policy_path = Path(policy_path)
+        if watch_interval is None:
+            watch_interval = float(os.getenv("POLICY_WATCH_INTERVAL", "2"))
+        self.watch_interval = watch_interval
+
+        self._reload_lock = threading.Lock()
+        self._current = PolicyAdjudicator(policy_path=str(self.policy_path))
+        self._file_signature = self._signature()
+        self.loaded_at = datetime.utcnow()
+        self.reload_count = 0
+        self._task = None
+
+    @property
+    def current(self):
+        """
+        The snapshot to adjudicate with. Callers should read this once per
+        claim and keep the reference, so a concurrent swap cannot change the
+        rules halfway through a claim.
+        """
+        return self._current
+
+    def _signature(self, snapshot=None):
+        """(mtime, size) of the rules file and any base files it inherits from"""
+        return file_signature((snapshot or self._current).source_paths)
+
+    def reload(self):
+        """
+        Compile the rules file and swap it in if its version changed
+
+        Returns:
+            bool: True if a new snapshot is now current
+
+        Raises:
+            PolicyRulesError: If the file is missing or malformed (the current
+                snapshot stays in place)
+        """
+        with self._reload_lock:
+            snapshot = PolicyAdjudicator(policy_path=str(self.policy_path))
+            self._file_signature = self._signature(snapshot)
+            previous = self._current
+            if snapshot.policy_version == previous.policy_version:
+                return False
+
+            # Single reference assignment: readers see either the old or the new snapshot
+            self._current = snapshot
+            self.loaded_at = datetime.utcnow()
+            self.reload_count += 1
+        logger.info("Policy rules reloaded", extra={
+            "previous_version": previous.policy_version,
+            "policy_version": snapshot.policy_version
+        })
+        return True
+
+    def info(self):
+        snapshot = self._current
+        return {
+            "policy_name": snapshot.policy_rules.get('policy_name'),
+            "policy_version": snapshot.policy_version,
+            "policy_path": str(self.policy_path),
+            "loaded_at": self.loaded_at.isoformat(),
+            "reload_count": self.reload_count,
+            "watch_interval": self.watch_interval
+        }
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            if self._signature() == self._file_signature:
+                continue
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception as e:
+                # Keep serving the last good snapshot; a later save triggers another attempt
+                self._file_signature = self._signature()
+                logger.error("Policy reload failed", extra={"policy_path": str(self.policy_path), "error": str(e)})
+
+    def start(self):
+        """Start watching the rules file on the running event loop"""
+        if self.watch_interval > 0:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+DEFAULT_PRODUCT = "default"
+PRODUCT_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def archived_version(path):
+    """policy_version an archived rules file would compile to, without compiling its matchers"""
+    policy_rules, _ = read_policy_rules(path)
+    return f"{policy_rules.get('policy_version', '0')}+{policy_digest(policy_rules)[:8]}"
+
+
+class PolicyRegistry:
+    """
+    Compiled policies keyed by (product, policy_version), loaded on first use
+    into a bounded LRU
+
+    Layout of policies_dir:
+        <product>.json              current rules of a product (may name a "base" file)
+        <product>/<any>.json        archived versions, used only for pinned lookups
+    The default product is served by a PolicyStore (the main rules file).
+    """
+
+    def __init__(self, default_store, policies_dir, max_entries=None, recheck_interval=None):
+        """
+        Args:
+            default_store: PolicyStore for claims without a product
+            policies_dir: Directory of per-product rules files
+            max_entries: Compiled policies kept in memory (env POLICY_CACHE_MAX_ENTRIES, default 64)
+            recheck_interval: Seconds before a product file is stat()ed again for
+                changes (default: the store's watch interval)
+        """
+        self.default_store = default_store
+        self.policies_dir = Path(policies_dir)
+        if max_entries is None:
+            max_entries = int(os.getenv("POLICY_CACHE_MAX_ENTRIES", "64"))
+        if recheck_interval is None:
+            recheck_interval = default_store.watch_interval
+        self.max_entries = max(1, max_entries)
+        self.recheck_interval = recheck_interval
+
+        # (product, policy_version) -> PolicyAdjudicator, least recently used first
+        self._compiled = OrderedDict()
+        # product -> [source paths, file signature, last checked (monotonic), policy_version]
+        self._latest = {}
+        # product -> (archive dir signature, {policy_version: path})
+        self._archives = {}
+        self._lock = threading.Lock()
+        self._archive_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def product_path(self, product):
+        if not PRODUCT_NAME_PATTERN.match(product):
+            raise UnknownPolicyError(f"Invalid policy product '{product}'")
+        return self.policies_dir / f"{product}.json"
+
+    def products(self):
+        """Default product plus every <product>.json in policies_dir"""
+        names = sorted(path.stem for path in self.policies_dir.glob("*.json")) if self.policies_dir.is_dir() else []
+        return [DEFAULT_PRODUCT, *(name for name in names if name != DEFAULT_PRODUCT)]
+
+    def get(self, product=None, policy_version=None):
+        """
+        Compiled policy for a claim
+
+        Args:
+            product: Product name (None for the default rules)
+            policy_version: Exact version stamped on an earlier result to
+                re-adjudicate under; None for the product's current rules
+
+        Raises:
+            UnknownPolicyError: If the product or version cannot be found
+            PolicyRulesError: If a rules file is malformed
+        """
+        product = product or DEFAULT_PRODUCT
+        snapshot = self._current_snapshot(product)
+        if not policy_version or policy_version == snapshot.policy_version:
+            return snapshot
+
+        pinned = self._cached(product, policy_version)
+        if pinned is not None:
+            return pinned
+        return self._archived_snapshot(product, policy_version)
+
+    def _cached(self, product, policy_version):
+        with self._lock:
+            snapshot = self._compiled.get((product, policy_version))
+            if snapshot is None:
+                return None
+            self._compiled.move_to_end((product, policy_version))
+            self.hits += 1
+            return snapshot
+
+    def _store(self, product, snapshot):
+        with self._lock:
+            self.misses += 1
+            self._compiled[(product, snapshot.policy_version)] = snapshot
+            self._compiled.move_to_end((product, snapshot.policy_version))
+            while len(self._compiled) > self.max_entries:
+                self._compiled.popitem(last=False)
+                self.evictions += 1
+
+    def _current_snapshot(self, product):
+        if product == DEFAULT_PRODUCT:
+            snapshot = self.default_store.current
+            if self._cached(product, snapshot.policy_version) is None:
+                self._store(product, snapshot)
+            return snapshot
+
+        now = time.monotonic()
+        latest = self._latest.get(product)
+        if latest is not None:
+            source_paths, signature, checked_at, policy_version = latest
+            unchanged = now - checked_at < self.recheck_interval
+            if not unchanged and file_signature(source_paths) == signature:
+                latest[2] = now
+                unchanged = True
+            if unchanged:
+                snapshot = self._cached(product, policy_version)
+                if snapshot is not None:
+                    return snapshot
+
+        path = self.product_path(product)
+        if not path.exists():
+            raise UnknownPolicyError(f"No policy rules for product '{product}'")
+        snapshot = PolicyAdjudicator(policy_path=str(path), policy_product=product)
+        self._latest[product] = [
+            snapshot.source_paths, file_signature(snapshot.source_paths), now, snapshot.policy_version
+        ]
+        self._store(product, snapshot)
+        logger.info("Compiled policy", extra={"product": product, "policy_version": snapshot.policy_version})
+        return snapshot
+
+    def _archive_index(self, product):
+        """
+        version -> path of a product's archived rules files, rebuilt only when
+        the archive directory changes (archives are not edited in place).
+        Unknown versions are a dictionary miss, so a client pinning a bogus
+        version never makes us re-read the archives.
+        """
+        archive_dir = self.policies_dir / product
+        signature = file_signature([archive_dir])
+        with self._archive_lock:
+            cached = self._archives.get(product)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+            versions = {}
+            for path in sorted(archive_dir.glob("*.json")) if archive_dir.is_dir() else []:
+                versions.setdefault(archived_version(path), path)
+            self._archives[product] = (signature, versions)
+            logger.info("Indexed archived policies", extra={"product": product, "versions": len(versions)})
+            return versions
+
+    def _archived_snapshot(self, product, policy_version):
+        """Compile the archived version of a product matching policy_version"""
+        path = self._archive_index(product).get(policy_version)
+        if path is None:
+            raise UnknownPolicyError(f"No policy rules for product '{product}' version '{policy_version}'")
+        snapshot = PolicyAdjudicator(policy_path=str(path), policy_product=product)
+        if snapshot.policy_version != policy_version:
+            # A base file changed since the index was built
+            with self._archive_lock:
+                self._archives.pop(product, None)
+            raise UnknownPolicyError(f"No policy rules for product '{product}' version '{policy_version}'")
+        self._store(product, snapshot)
+        return snapshot
+
+    def stats(self):
+        with self._lock:
+            return {
+                "compiled": len(self._compiled),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
@@ -0,0 +1,143 @@
+"""
+ClaimGuard AI - Structured Logging
+Leveled JSON logging with a queue-based handler: callers only enqueue the
+record, and a background listener thread formats and writes it, so a slow
+stdout pipe never blocks the event loop. Each record carries the current
+request/claim ID from context variables.
+"""
+
+import atexit
+import contextlib
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+
+
+request_id_var = contextvars.ContextVar('request_id', default=None)
+claim_id_var = contextvars.ContextVar('claim_id', default=None)
+
+CONTEXT_VARS = {
+    'request_id': request_id_var,
+    'claim_id': claim_id_var,
+}
+
+# Attributes every LogRecord has; anything else came in through extra={...}
+RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'exception'}
+
+_listener = None
+
+
+@contextlib.contextmanager
+def log_context(**fields):
+    """
+    Attach request_id / claim_id to every record logged inside the block
+
+    Context variables are copied into asyncio tasks and to_thread workers,
+    so IDs follow a request across concurrent pipeline stages.
+    """
+    tokens = [(CONTEXT_VARS[name], CONTEXT_VARS[name].set(value)) for name, value in fields.items()]
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def bind_claim_id(claim_id):
+    """Set the claim ID for the rest of the current request/task"""
+    claim_id_var.set(claim_id)
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that snapshots context IDs in the caller before enqueueing"""
+
+    def prepare(self, record):
+        for name, var in CONTEXT_VARS.items():
+            if getattr(record, name, None) is None:
+                setattr(record, name, var.get())
+
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exception = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with level, logger, message, IDs and extra fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name in CONTEXT_VARS:
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        for key, value in record.__dict__.items():
+            if key not in RESERVED_ATTRS and key not in CONTEXT_VARS:
+                entry[key] = value
+        exception = getattr(record, 'exception', None) or (
+            self.formatException(record.exc_info) if record.exc_info else None
+        )
+        if exception:
+            entry['exception'] = exception
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable single-line format for local development"""
+
+    def format(self, record):
+        line = f"{record.levelname:<7} {record.name}: {record.getMessage()}"
+        ids = [f"{name}={getattr(record, name)}" for name in CONTEXT_VARS if getattr(record, name, None) is not None]
+        extras = [f"{key}={value}" for key, value in record.__dict__.items()
+                  if key not in RESERVED_ATTRS and key not in CONTEXT_VARS]
+        if ids or extras:
+            line += " [" + " ".join(ids + extras) + "]"
+        exception = getattr(record, 'exception', None)
+        if exception:
+            line += "\n" + exception
+        return line
+
+
+def setup_logging(level=None, fmt=None, stream=None):
+    """
+    Route the root logger through a background queue listener (idempotent)
+
+    Args:
+        level: Log level name (env LOG_LEVEL, default INFO)
+        fmt: 'json' or 'text' (env LOG_FORMAT, default json)
+        stream: Output stream (default stdout)
+    """
+    global _listener
+    if level is None:
+        level = os.getenv('LOG_LEVEL', 'INFO')
+    if fmt is None:
+        fmt = os.getenv('LOG_FORMAT', 'json')
+
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(TextFormatter() if fmt.lower() == 'text' else JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    root.handlers = [ContextQueueHandler(log_queue)]
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,191 @@
+"""
+ClaimGuard AI - Analytics Tests
+Checks rollup upserts, line item indexing and the rebuild against a real (aiosqlite) database
+"""
+
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+import models
+from analytics import (
+    record_claims, record_line_items, rebuild_rollups, rollup_query, format_rollups,
+    line_item_query, format_line_items
+)
+from database import Base, set_sqlite_pragmas
+
+
+def make_engines(tmp_path):
+    db_path = tmp_path / "analytics.db"
+    sync_engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=sync_engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+    return sync_engine, async_engine
+
+
+def make_claim(status, merchant, claimed, approved, day=1, claim_type="pharmacy"):
+    return models.Claim(
+        claim_id=f"C-{status}-{merchant}-{claimed}", merchant_name=merchant, status=status,
+        total_claimed=claimed, total_approved=approved, total_deducted=claimed - approved,
+        created_at=datetime(2025, 6, day, 12, 0),
+        full_data={"policy_adjudication": {"claim_type": claim_type}}
+    )
+
+
+def make_itemized_claim(index, decisions):
+    claim = make_claim("PARTIAL", "Apollo", 0.0, 0.0)
+    claim.claim_id = f"ITEMS-{index}"
+    claim.full_data = {"policy_adjudication": {"claim_type": "pharmacy", "line_item_decisions": decisions}}
+    return claim
+
+
+def decision(name, status, claimed, approved, severity=None):
+    return {
+        "item_name": name, "status": status, "claimed_amount": claimed,
+        "approved_amount": approved, "reason": "test", "medical_severity": severity
+    }
+
+
+def rollup_rows(sync_engine):
+    with sessionmaker(bind=sync_engine)() as db:
+        return sorted(
+            (row.day, row.status, row.merchant_name, row.claim_type,
+             row.claim_count, row.total_claimed, row.total_approved, row.total_deducted)
+            for row in db.query(models.ClaimRollup)
+        )
+
+
+def save_claims(async_engine, batches):
+    """Save each batch of claims with its rollups in one transaction, like ClaimWriter"""
+    session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def run():
+        try:
+            for claims in batches:
+                async with session_factory() as db, db.begin():
+                    db.add_all(claims)
+                    await db.flush()
+                    await record_claims(db, [(claim, "pharmacy") for claim in claims])
+                    await record_line_items(db, claims)
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_record_claims_merges_batch_and_upserts_existing_rows(tmp_path):
+    """Claims sharing a rollup key fold into one row, across batches too"""
+    sync_engine, async_engine = make_engines(tmp_path)
+    save_claims(async_engine, [
+        [make_claim("APPROVED", "Apollo", 1000.0, 900.0), make_claim("APPROVED", "Apollo", 500.0, 500.0),
+         make_claim("REJECTED", "Apollo", 200.0, 0.0)],
+        [make_claim("APPROVED", "Apollo", 300.0, 250.0), make_claim("APPROVED", "MedPlus", 100.0, 100.0, day=2)],
+    ])
+
+    day1, day2 = datetime(2025, 6, 1).date(), datetime(2025, 6, 2).date()
+    assert rollup_rows(sync_engine) == [
+        (day1, "APPROVED", "Apollo", "pharmacy", 3, 1800.0, 1650.0, 150.0),
+        (day1, "REJECTED", "Apollo", "pharmacy", 1, 200.0, 0.0, 200.0),
+        (day2, "APPROVED", "MedPlus", "pharmacy", 1, 100.0, 100.0, 0.0),
+    ]
+
+    with sessionmaker(bind=sync_engine)() as db:
+        totals, = format_rollups(db.execute(rollup_query(group_by=())))
+    assert totals["claim_count"] == 5
+    assert totals["total_claimed"] == 2100.0
+
+
+def test_rebuild_matches_incremental_rollups(tmp_path):
+    """A rebuild from the claims table reproduces the rollups kept on save"""
+    sync_engine, async_engine = make_engines(tmp_path)
+    save_claims(async_engine, [
+        [make_claim("APPROVED", "Apollo", 1000.0, 900.0), make_claim("PARTIAL", "Apollo", 800.0, 400.0)],
+        [make_claim("APPROVED", "Apollo", 300.0, 250.0, day=3)],
+    ])
+    incremental = rollup_rows(sync_engine)
+
+    session_factory = sessionmaker(bind=sync_engine)
+    with session_factory() as db:
+        db.add(models.ClaimRollup(
+            day=datetime(2025, 1, 1).date(), status="STALE", merchant_name="x", claim_type="x",
+            claim_count=9, total_claimed=1.0, total_approved=1.0, total_deducted=0.0
+        ))
+        db.commit()
+
+    assert rebuild_rollups(session_factory) == 3
+    assert rollup_rows(sync_engine) == incremental
+
+
+def test_rebuild_holds_the_writer_lock_while_reading_claims(tmp_path):
+    """On SQLite a claim save during the rebuild waits instead of being missed"""
+    sync_engine, async_engine = make_engines(tmp_path)
+    save_claims(async_engine, [[make_claim("APPROVED", "Apollo", 1000.0, 900.0)]])
+    blocked = []
+
+    def on_claims_read(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "FROM CLAIMS" in statement.upper():
+            other = create_engine(f"sqlite:///{tmp_path / 'analytics.db'}", connect_args={"timeout": 0})
+            try:
+                with other.begin() as writer:
+                    writer.execute(models.Claim.__table__.insert().values(claim_id="LATE", status="APPROVED"))
+            except Exception:
+                blocked.append(True)
+            finally:
+                other.dispose()
+
+    event.listen(sync_engine, "before_cursor_execute", on_claims_read)
+    assert rebuild_rollups(sessionmaker(bind=sync_engine)) == 1
+    assert blocked == [True]
+
+
+def test_line_items_are_indexed_and_aggregated(tmp_path):
+    """Each stored decision becomes a row keyed by the normalized item name"""
+    sync_engine, async_engine = make_engines(tmp_path)
+    save_claims(async_engine, [
+        [make_itemized_claim(1, [
+            decision("Paracetamol 500mg", "APPROVED", 100.0, 100.0, "INFO"),
+            decision("Vitamin C", "REJECTED", 50.0, 0.0),
+        ])],
+        [make_itemized_claim(2, [decision("  PARACETAMOL   500MG ", "APPROVED", 60.0, 60.0, "INFO")]),
+         make_claim("APPROVED", "Apollo", 10.0, 10.0)],
+    ])
+
+    with sessionmaker(bind=sync_engine)() as db:
+        items = [
+            (row.position, row.item_key, row.status, row.claimed_amount)
+            for row in db.query(models.ClaimLineItem).order_by(models.ClaimLineItem.id)
+        ]
+        by_item = format_line_items(db.execute(line_item_query(group_by=("item_key",))))
+        paracetamol = format_line_items(db.execute(line_item_query(group_by=(), item="paracetamol 500MG")))
+        rejected = format_line_items(db.execute(line_item_query(group_by=("item_key",), status="REJECTED")))
+
+    assert items == [
+        (1, "paracetamol 500mg", "APPROVED", 100.0),
+        (2, "vitamin c", "REJECTED", 50.0),
+        (1, "paracetamol 500mg", "APPROVED", 60.0),
+    ]
+    assert by_item == [
+        {"item_key": "paracetamol 500mg", "item_count": 2, "claim_count": 2, "total_claimed": 160.0, "total_approved": 160.0},
+        {"item_key": "vitamin c", "item_count": 1, "claim_count": 1, "total_claimed": 50.0, "total_approved": 0.0},
+    ]
+    assert paracetamol == [{"item_count": 2, "claim_count": 2, "total_claimed": 160.0, "total_approved": 160.0}]
+    assert [row["item_key"] for row in rejected] == ["vitamin c"]
+
+
+def test_rebuild_reindexes_line_items(tmp_path):
+    sync_engine, async_engine = make_engines(tmp_path)
+    save_claims(async_engine, [[make_itemized_claim(1, [
+        decision("Paracetamol", "APPROVED", 100.0, 100.0), decision("Vitamin C", "REJECTED", 50.0, 0.0)
+    ])]])
+    session_factory = sessionmaker(bind=sync_engine)
+    with session_factory() as db:
+        before = sorted((row.claim_db_id, row.position, row.item_key) for row in db.query(models.ClaimLineItem))
+
+    rebuild_rollups(session_factory)
+    with session_factory() as db:
+        after = sorted((row.claim_db_id, row.position, row.item_key) for row in db.query(models.ClaimLineItem))
+    assert after == before and len(after) == 2
@@ -0,0 +1,105 @@
+"""
+ClaimGuard AI - Benefit Ledger Tests
+Checks reservations against annual sub-limits on a real (aiosqlite) database
+"""
+
+import asyncio
+import json
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from benefit_ledger import BenefitLedger
+from database import Base, set_sqlite_pragmas
+
+
+def make_ledger(tmp_path, **kwargs):
+    db_path = tmp_path / "ledger.db"
+    Base.metadata.create_all(bind=create_engine(f"sqlite:///{db_path}"))
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+    session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    return BenefitLedger(session_factory, max_retries=50, **kwargs), async_engine
+
+
+def test_concurrent_reservations_never_exceed_annual_limit(tmp_path):
+    """Ten parallel 25,000 holds against a 100,000 limit hold exactly 100,000"""
+    async def run():
+        ledger, async_engine = make_ledger(tmp_path)
+        try:
+            holds = await asyncio.gather(*(
+                ledger.reserve("INS001", 2025, "pharmacy", 25000, 100000) for _ in range(10)
+            ))
+            balance, = await ledger.balances("INS001", 2025)
+            return holds, balance
+        finally:
+            await async_engine.dispose()
+    
+    holds, balance = asyncio.run(run())
+    assert sorted(hold.amount for hold in holds) == [0.0] * 6 + [25000.0] * 4
+    assert (balance['reserved'], balance['consumed']) == (100000.0, 0.0)
+
+
+def test_settle_and_release_move_holds(tmp_path):
+    """Settling consumes the used part of a hold; releasing gives it all back"""
+    async def run():
+        ledger, async_engine = make_ledger(tmp_path)
+        try:
+            settled = await ledger.reserve("INS001", 2025, "pharmacy", 30000, 100000)
+            released = await ledger.reserve("INS001", 2025, "pharmacy", 20000, 100000)
+            await ledger.settle(settled, 25000)
+            await ledger.release(released)
+            return await ledger.balances("INS001")
+        finally:
+            await async_engine.dispose()
+    
+    balance, = asyncio.run(run())
+    assert (balance['consumed'], balance['reserved'], balance['claim_count']) == (25000.0, 0.0, 1)
+
+
+def test_reaper_releases_expired_holds_once(tmp_path):
+    """An abandoned hold is given back by the reaper; a late settle consumes without releasing it twice"""
+    async def run():
+        ledger, async_engine = make_ledger(tmp_path, hold_ttl_seconds=0)
+        try:
+            hold = await ledger.reserve("INS001", 2025, "pharmacy", 25000, 100000, claim_key="claim-1")
+            reaped = await ledger.release_expired()
+            after_reap, = await ledger.balances("INS001")
+            await ledger.settle(hold, 10000)
+            await ledger.release(hold)
+            final, = await ledger.balances("INS001")
+            return hold, reaped, after_reap, final, await ledger.release_expired()
+        finally:
+            await async_engine.dispose()
+    
+    hold, reaped, after_reap, final, reaped_again = asyncio.run(run())
+    assert (hold.claim_key, reaped, reaped_again) == ("claim-1", 1, 0)
+    assert (after_reap['reserved'], after_reap['consumed']) == (0.0, 0.0)
+    assert (final['reserved'], final['consumed'], final['claim_count']) == (0.0, 10000.0, 1)
+
+
+def test_apply_takes_copayment_then_per_claim_then_annual_limit(tmp_path):
+    """apply() splits the deductions in order and only holds against the annual limit with an insured ID"""
+    policy_rules = json.loads(Path("../data/policy_rules.json").read_text(encoding='utf-8'))
+    claim = {'claim_type': 'pharmacy_reimbursement', 'date': '2025-03-01'}
+    
+    async def run():
+        ledger, async_engine = make_ledger(tmp_path)
+        try:
+            results = []
+            for _ in range(5):
+                payable, breakdown, hold = await ledger.apply(policy_rules, claim, 40000, insured_id="INS001")
+                await ledger.settle(hold, payable)
+                results.append(breakdown)
+            unverified = await ledger.apply(policy_rules, claim, 40000)
+            return results, unverified
+        finally:
+            await async_engine.dispose()
+    
+    results, (payable, unverified, hold) = asyncio.run(run())
+    first = results[0]
+    assert (first['copayment_amount'], first['per_claim_limit_deduction'], first['payable']) == (4000.0, 11000.0, 25000.0)
+    assert [breakdown['annual_limit_deduction'] for breakdown in results] == [0.0] * 4 + [25000.0]
+    assert results[-1]['payable'] == 0.0
+    assert (payable, hold, unverified['annual_limit_checked']) == (25000.0, None, False)
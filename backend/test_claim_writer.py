@@ -0,0 +1,102 @@
+"""
+ClaimGuard AI - Claim Writer Tests
+Checks group commits and the per-claim fallback on a real (aiosqlite) database
+"""
+
+import asyncio
+
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+import models
+from claim_writer import ClaimWriter
+from database import Base, set_sqlite_pragmas
+
+
+def make_writer(tmp_path, **kwargs):
+    db_path = tmp_path / "claims.db"
+    Base.metadata.create_all(bind=create_engine(f"sqlite:///{db_path}"))
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+    session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    writer = ClaimWriter(session_factory, **kwargs)
+
+    commits = []
+    commit = writer._commit
+    async def counting_commit(entries):
+        commits.append(len(entries))
+        await commit(entries)
+    writer._commit = counting_commit
+    return writer, session_factory, async_engine, commits
+
+
+def make_claim(index, full_data=None):
+    return models.Claim(
+        claim_id=f"C-{index}", merchant_name="Apollo", status="APPROVED",
+        total_claimed=100.0, total_approved=100.0, total_deducted=0.0,
+        full_data=full_data if full_data is not None else {}
+    )
+
+
+async def claim_count(session_factory):
+    async with session_factory() as db:
+        return await db.scalar(select(func.count(models.Claim.id)))
+
+
+def test_concurrent_writes_share_one_commit(tmp_path):
+    """Claims queued together are committed in one transaction and each caller gets its own ID"""
+    async def run():
+        writer, session_factory, async_engine, commits = make_writer(tmp_path, max_batch=10, max_delay_ms=50)
+        try:
+            ids = await asyncio.gather(*(writer.write(make_claim(i)) for i in range(5)))
+            await writer.stop()
+            return ids, commits, await claim_count(session_factory)
+        finally:
+            await async_engine.dispose()
+
+    ids, commits, count = asyncio.run(run())
+    assert commits == [5]
+    assert len(set(ids)) == 5 and all(ids)
+    assert count == 5
+
+
+def test_batches_are_capped_at_max_batch(tmp_path):
+    async def run():
+        writer, session_factory, async_engine, commits = make_writer(tmp_path, max_batch=2, max_delay_ms=50)
+        try:
+            await asyncio.gather(*(writer.write(make_claim(i)) for i in range(5)))
+            await writer.stop()
+            return commits
+        finally:
+            await async_engine.dispose()
+
+    commits = asyncio.run(run())
+    assert sum(commits) == 5
+    assert max(commits) == 2
+
+
+def test_failed_batch_falls_back_to_one_claim_at_a_time(tmp_path):
+    """A claim that cannot be stored fails only its own caller"""
+    async def run():
+        writer, session_factory, async_engine, commits = make_writer(tmp_path, max_batch=10, max_delay_ms=50)
+        try:
+            results = await asyncio.gather(
+                writer.write(make_claim(1)),
+                writer.write(make_claim(2, full_data={"unserializable": object()})),
+                writer.write(make_claim(3)),
+                return_exceptions=True
+            )
+            await writer.stop()
+            async with session_factory() as db:
+                rolled_up = await db.scalar(select(func.sum(models.ClaimRollup.claim_count)))
+            return results, commits, await claim_count(session_factory), rolled_up
+        finally:
+            await async_engine.dispose()
+
+    results, commits, count, rolled_up = asyncio.run(run())
+    assert isinstance(results[0], int) and isinstance(results[2], int)
+    assert isinstance(results[1], Exception)
+    assert commits == [3, 1, 1, 1]
+    assert count == 2
+    # The failed group commit's rollup increments were rolled back with it
+    assert rolled_up == 2
@@ -0,0 +1,139 @@
+"""
+ClaimGuard AI - Duplicate Receipt Detector Tests
+Checks hashing, the Hamming index, fraud flags, and that syncing never skips late-committed claims
+"""
+
+import io
+from datetime import datetime, timedelta
+
+from PIL import Image, ImageDraw
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import Base
+from duplicate_detector import DuplicateReceiptDetector, HammingIndex, compute_dhash, hash_to_hex
+
+
+def make_session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'claims.db'}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def save_claim(session_factory, claim_db_id, receipt_phash, created_at=None):
+    db = session_factory()
+    try:
+        db.add(models.Claim(id=claim_db_id, claim_id=f"CLM-{claim_db_id}", receipt_phash=receipt_phash,
+                            created_at=created_at or datetime.utcnow()))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_hamming_index_finds_hashes_within_distance():
+    """Every hash within max_distance is found, farther ones are not"""
+    index = HammingIndex()
+    base = 0x0123456789ABCDEF
+    index.add(base, "same")
+    index.add(base ^ 0b111, "three_bits")
+    index.add(base ^ ((1 << 64) - 1), "inverted")
+    
+    assert index.search(base, 6) == [(0, "same"), (3, "three_bits")]
+    assert index.search(base, 2) == [(0, "same")]
+    assert index.search(base ^ (1 << 63), 6) == [(1, "same"), (4, "three_bits")]
+
+
+def test_sync_indexes_claims_committed_out_of_order(tmp_path):
+    """A claim with a lower ID committed after a higher one is still indexed"""
+    session_factory = make_session_factory(tmp_path)
+    detector = DuplicateReceiptDetector(session_factory, {}, sync_overlap_seconds=60, sync_interval=0)
+    early_hash = hash_to_hex(0x00FF00FF00FF00FF)
+    late_hash = hash_to_hex(0xF0F0F0F0F0F0F0F0)
+    
+    save_claim(session_factory, 2, early_hash)
+    detector.add(early_hash, 2)
+    assert detector.find_duplicate(late_hash) is None
+    
+    # Claim 1 (allocated first, committed last) by another worker, created before the last sync
+    save_claim(session_factory, 1, late_hash, created_at=datetime.utcnow() - timedelta(seconds=5))
+    assert detector.find_duplicate(late_hash) == {'claim_db_id': 1, 'similarity': 1.0}
+    assert detector.find_duplicate(early_hash)['claim_db_id'] == 2
+    assert detector.index.size == 2
+    
+    detector.sync()
+    assert detector.index.size == 2
+
+
+def receipt_image(lines, size=(360, 480)):
+    image = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(image)
+    for row, (width, shade) in enumerate(lines):
+        draw.rectangle((20, 30 + row * 40, 20 + width, 50 + row * 40), fill=shade)
+    return image
+
+
+def image_bytes(image, **save_args):
+    buffer = io.BytesIO()
+    image.save(buffer, **save_args)
+    buffer.seek(0)
+    return buffer
+
+
+def test_dhash_survives_reencoding_but_separates_different_receipts():
+    """A resized JPEG copy hashes within the duplicate threshold; another receipt does not"""
+    original = receipt_image([(300, 0), (120, 60), (250, 0), (80, 120), (200, 0), (280, 90), (150, 0)])
+    other = receipt_image([(90, 0), (310, 30), (60, 150), (240, 0), (110, 60), (30, 0), (320, 120)])
+    
+    dhash = compute_dhash(image_bytes(original, format="PNG"))
+    copy = compute_dhash(image_bytes(original.resize((270, 360)).convert("RGB"), format="JPEG", quality=70))
+    different = compute_dhash(image_bytes(other, format="PNG"))
+    
+    max_distance = DuplicateReceiptDetector(None, {}).max_distance
+    assert 0 <= dhash < 2 ** 64 and len(hash_to_hex(dhash)) == 16
+    assert bin(dhash ^ copy).count("1") <= max_distance
+    assert bin(dhash ^ different).count("1") > max_distance
+
+
+def test_apply_to_fraud_detection_follows_policy_action():
+    """AUTO_REJECT forces a rejection; other actions only escalate an approval to manual review"""
+    duplicate = {'claim_db_id': 7, 'similarity': 0.9531}
+    review_rules = {'fraud_detection_rules': {'visual_checks': [
+        {'check_type': 'duplicate_receipt', 'confidence_threshold': 0.9, 'action': 'FLAG_FOR_REVIEW'}
+    ]}}
+    
+    rejected = DuplicateReceiptDetector(None, {}).apply_to_fraud_detection({'recommendation': 'APPROVE'}, duplicate)
+    assert (rejected['suspicious'], rejected['recommendation'], rejected['duplicate_receipt']) == (True, 'REJECT', duplicate)
+    assert rejected['fraud_indicators'] == ["Near-duplicate of previously submitted receipt (claim #7, similarity 95%)"]
+    
+    reviewer = DuplicateReceiptDetector(None, review_rules)
+    assert reviewer.apply_to_fraud_detection({}, duplicate)['recommendation'] == 'MANUAL_REVIEW'
+    kept = reviewer.apply_to_fraud_detection({'recommendation': 'REJECT', 'fraud_indicators': ["GST"]}, duplicate)
+    assert (kept['recommendation'], len(kept['fraud_indicators'])) == ('REJECT', 2)
+
+
+def test_lookups_sync_at_most_once_per_interval(tmp_path):
+    """Back-to-back lookups share one database sync; local saves are found without one"""
+    session_factory = make_session_factory(tmp_path)
+    sessions = []
+    
+    def counting_session_factory():
+        sessions.append(1)
+        return session_factory()
+    
+    detector = DuplicateReceiptDetector(counting_session_factory, {}, sync_interval=60)
+    receipt_hash = hash_to_hex(0x0F0F0F0F0F0F0F0F)
+    save_claim(session_factory, 1, receipt_hash)
+    
+    assert detector.find_duplicate(receipt_hash)['claim_db_id'] == 1
+    detector.add(hash_to_hex(0x3C3C3C3C3C3C3C3C), 2)
+    for _ in range(20):
+        assert detector.find_duplicate(hash_to_hex(0x3C3C3C3C3C3C3C3C))['claim_db_id'] == 2
+    assert len(sessions) == 1
+    
+    
+    eager = DuplicateReceiptDetector(counting_session_factory, {}, sync_interval=0)
+    eager.find_duplicate(receipt_hash)
+    eager.find_duplicate(receipt_hash)
+    assert len(sessions) == 3
@@ -78,6 +78,275 @@ def test_claim(adjudicator, claim_file, test_name):
         return False
 
 
+def test_exclusion_matcher_matches_linear_scan():
+    """Compiled exclusion matcher must agree with the category-by-category scan"""
+    adjudicator = PolicyAdjudicator(policy_path="../data/policy_rules.json")
+    excluded_rules = adjudicator.policy_rules['excluded_items']
+    
+    def linear_scan(item_name):
+        item_name_lower = item_name.lower()
+        for category in excluded_rules['categories']:
+            for excluded_item in category['items']:
+                if excluded_item.lower() in item_name_lower or item_name_lower in excluded_item.lower():
+                    return True, category['category'], category['reason']
+        for keyword in excluded_rules['partial_match_keywords']:
+            if keyword.lower() in item_name_lower:
+                return True, "Partial Match", f"Contains excluded keyword: {keyword}"
+        return False, None, None
+    
+    item_names = [
+        "Paracetamol 500mg", "Whey Protein 1kg", "WHEY", "protein", "Milk", "Soap",
+        "Herbal Supplements", "Food Supplements", "Vitamin C Supplement", "Room Rent - Private",
+        "Cosmetic Cream", "Face", "Diapers (Adult)", "", "Tea Tree Oil", "Non-Medical Kit"
+    ]
+    for item_name in item_names:
+        assert adjudicator.is_excluded_item(item_name) == linear_scan(item_name), item_name
+
+
+def test_adjudicate_batch_matches_per_claim():
+    """Vectorized batch adjudication must match adjudicating claims one by one"""
+    adjudicator = PolicyAdjudicator(policy_path="../data/policy_rules.json")
+    claims = [
+        adjudicator.load_claim(claim_file)
+        for claim_file in sorted(Path("../data/claims").glob("*.json"))
+    ]
+    claims.append({'claim_id': 'EMPTY', 'line_items': []})
+    
+    expected = [adjudicator.adjudicate(claim_data) for claim_data in claims]
+    assert adjudicator.adjudicate_batch(claims) == expected
+
+
+def test_malformed_claims_raise_claim_data_error():
+    """Malformed claims and line items raise ClaimDataError (422) instead of crashing"""
+    from policy_engine import ClaimDataError
+    
+    adjudicator = PolicyAdjudicator(policy_path="../data/policy_rules.json")
+    item = {'name': 'Paracetamol 500mg', 'total_price': 100}
+    malformed = [
+        [],
+        {'line_items': {}},
+        {'line_items': ["Paracetamol"]},
+        {'line_items': [item, None]},
+        {'line_items': [{**item, 'total_price': "100"}]},
+        {'line_items': [{**item, 'total_price': None}]},
+        {'line_items': [{**item, 'unit_price': True}]},
+        {'line_items': [{**item, 'name': 42}]},
+        {'total_amount': "100", 'line_items': [item]},
+    ]
+    for claim_data in malformed:
+        for adjudicate in (adjudicator.adjudicate, lambda claim: adjudicator.adjudicate_batch([claim])):
+            try:
+                adjudicate(claim_data)
+                assert False, claim_data
+            except ClaimDataError:
+                pass
+    
+    assert adjudicator.adjudicate({'total_amount': 100, 'line_items': [item]})['status'] == "APPROVED"
+
+
+def test_synthetic_claims_follow_item_mix():
+    """Benchmark claims adjudicate cleanly and honour the requested item mix"""
+    from benchmark_engine import ClaimGenerator
+    
+    adjudicator = PolicyAdjudicator(policy_path="../data/policy_rules.json")
+    generator = ClaimGenerator(adjudicator.policy_rules, excluded_ratio=1.0, room_rent_ratio=1.0,
+                               over_limit_ratio=1.0, seed=7)
+    
+    claim = generator.generate(50)
+    result = adjudicator.adjudicate(claim)
+    
+    assert len(claim['line_items']) == 50
+    assert claim['line_items'][0]['name'].startswith("Room Rent")
+    assert result['room_rent_deduction_applied']
+    assert result['excluded_items_count'] == 49
+
+
+def test_policy_store_swaps_snapshot_on_rule_change(tmp_path):
+    """A reload swaps in a new versioned snapshot; claims holding the old one are unaffected"""
+    from policy_store import PolicyStore
+    
+    rules_path = tmp_path / "policy_rules.json"
+    rules = json.loads(Path("../data/policy_rules.json").read_text(encoding='utf-8'))
+    rules_path.write_text(json.dumps(rules), encoding='utf-8')
+    store = PolicyStore(rules_path, watch_interval=0)
+    claim = {'claim_id': 'HOT', 'total_amount': 100, 'line_items': [
+        {'name': 'Paracetamol 500mg', 'total_price': 100, 'unit_price': 100}
+    ]}
+    
+    in_flight = store.current
+    assert not store.reload()
+    
+    rules['excluded_items']['partial_match_keywords'].append('paracetamol')
+    rules_path.write_text(json.dumps(rules), encoding='utf-8')
+    assert store.reload()
+    
+    old_result = in_flight.adjudicate(claim)
+    new_result = store.current.adjudicate(claim)
+    assert old_result['status'] == "APPROVED"
+    assert new_result['status'] == "REJECTED"
+    assert old_result['policy_version'] != new_result['policy_version']
+
+
+def test_policy_registry_routes_products_through_bounded_lru(tmp_path):
+    """Product variants inherit from a base file, compile once and stay within the LRU bound"""
+    from policy_store import PolicyStore, PolicyRegistry, DEFAULT_PRODUCT
+    from policy_engine import UnknownPolicyError
+    
+    base_path = tmp_path / "policy_rules.json"
+    base_path.write_text(Path("../data/policy_rules.json").read_text(encoding='utf-8'), encoding='utf-8')
+    policies_dir = tmp_path / "policies"
+    policies_dir.mkdir()
+    for product in ("individual", "senior_citizen"):
+        (policies_dir / f"{product}.json").write_text(json.dumps({
+            "base": "../policy_rules.json",
+            "policy_version": "2.0",
+            "excluded_items": {"categories": [], "partial_match_keywords": [] if product == "individual" else ["paracetamol"]}
+        }), encoding='utf-8')
+    registry = PolicyRegistry(PolicyStore(base_path, watch_interval=0), policies_dir, max_entries=2, recheck_interval=60)
+    
+    senior = registry.get("senior_citizen")
+    assert registry.get("senior_citizen") is senior
+    assert senior.is_excluded_item("Paracetamol 500mg")[0]
+    assert not registry.get("individual").is_excluded_item("Paracetamol 500mg")[0]
+    assert senior.policy_rules['room_rent_rules'] == registry.get(DEFAULT_PRODUCT).policy_rules['room_rent_rules']
+    assert registry.stats()['compiled'] == 2
+    assert registry.stats()['evictions'] >= 1
+    
+    for product in ("missing", "../policy_rules"):
+        try:
+            registry.get(product)
+            assert False, product
+        except UnknownPolicyError:
+            pass
+
+
+def test_policy_registry_indexes_archived_versions(tmp_path, monkeypatch):
+    """Pinned versions resolve through an archive index; unknown versions never re-read the archives"""
+    import policy_store
+    from policy_store import PolicyStore, PolicyRegistry
+    from policy_engine import UnknownPolicyError
+    
+    base_path = tmp_path / "policy_rules.json"
+    base_path.write_text(Path("../data/policy_rules.json").read_text(encoding='utf-8'), encoding='utf-8')
+    archive_dir = tmp_path / "policies" / "individual"
+    archive_dir.mkdir(parents=True)
+    for version in ("1.0", "1.1"):
+        (archive_dir / f"{version}.json").write_text(json.dumps({
+            "base": "../../policy_rules.json", "policy_version": version
+        }), encoding='utf-8')
+    (tmp_path / "policies" / "individual.json").write_text(json.dumps({
+        "base": "../policy_rules.json", "policy_version": "2.0"
+    }), encoding='utf-8')
+    registry = PolicyRegistry(PolicyStore(base_path, watch_interval=0), tmp_path / "policies",
+                              max_entries=4, recheck_interval=60)
+    
+    reads = []
+    archived_version = policy_store.archived_version
+    monkeypatch.setattr(policy_store, "archived_version", lambda path: reads.append(path) or archived_version(path))
+    
+    pinned = archived_version(archive_dir / "1.0.json")
+    assert registry.get("individual", pinned).policy_version == pinned
+    for _ in range(3):
+        try:
+            registry.get("individual", "9.9+deadbeef")
+            assert False
+        except UnknownPolicyError:
+            pass
+    assert len(reads) == 2
+    assert registry.get("individual", pinned).policy_version == pinned
+    assert registry.stats()['compiled'] == 2
+
+
+def test_shipped_products_compile():
+    """Every product advertised by the registry has rules in data/policies"""
+    from policy_store import PolicyStore, PolicyRegistry
+    
+    registry = PolicyRegistry(PolicyStore("../data/policy_rules.json", watch_interval=0), "../data/policies")
+    products = registry.products()
+    assert {"individual", "family_floater", "senior_citizen"} <= set(products)
+    assert len({registry.get(product).policy_version for product in products}) == len(products)
+
+
+def test_room_rent_cap_uses_product_sum_insured():
+    """Claims without a sum_insured are capped at 1% of their product's sum insured limit"""
+    from policy_store import PolicyStore, PolicyRegistry
+    
+    registry = PolicyRegistry(PolicyStore("../data/policy_rules.json", watch_interval=0), "../data/policies")
+    claim = {'line_items': [{'name': 'Room Rent', 'unit_price': 6000, 'total_price': 12000}]}
+    
+    allowed = {
+        product: registry.get(product).calculate_proportionate_deduction(claim)['allowed_room_rent']
+        for product in ("default", "individual", "family_floater", "senior_citizen")
+    }
+    assert allowed == {"default": 5000, "individual": 5000, "family_floater": 10000, "senior_citizen": 3000}
+    assert registry.get("senior_citizen").calculate_proportionate_deduction(
+        {**claim, 'sum_insured': 800000}
+    )['allowed_room_rent'] == 8000
+    
+    batch = registry.get("senior_citizen").adjudicate_batch([claim])
+    assert "Rs.3,000.00/day (1% of Rs.300,000.00 sum insured)" in batch[0]['deduction_reason']
+
+
+def test_benefit_terms_follow_deduction_rules():
+    """Copayment and sub-limits are picked from deduction_rules by claim type and insured"""
+    from benefit_ledger import benefit_terms, insured_id_of, policy_year_of
+    
+    policy_rules = json.loads(Path("../data/policy_rules.json").read_text(encoding='utf-8'))
+    pharmacy = {'claim_type': 'pharmacy_reimbursement', 'patient_name': ' Rajesh  Kumar', 'date': '2025-03-01'}
+    
+    terms = benefit_terms(policy_rules, pharmacy)
+    assert (terms['category'], terms['copayment_percentage']) == ('pharmacy', 10)
+    assert (terms['per_claim_limit'], terms['annual_limit']) == (25000, 100000)
+    assert benefit_terms(policy_rules, pharmacy, policy_product="senior_citizen")['copayment_percentage'] == 20
+    assert benefit_terms(policy_rules, {**pharmacy, 'patient_age': 64})['copayment_percentage'] == 20
+    
+    diagnostics = benefit_terms(policy_rules, {'claim_type': 'diagnostics_reimbursement'})
+    assert (diagnostics['per_claim_limit'], diagnostics['annual_limit']) == (15000, 75000)
+    assert benefit_terms(policy_rules, {'claim_type': 'hospitalization'})['annual_limit'] is None
+    
+    assert insured_id_of(pharmacy) is None
+    assert insured_id_of({**pharmacy, 'patient_id': 'INS001'}) == "INS001"
+    assert policy_year_of(pharmacy) == 2025
+
+
+def test_waiting_periods_reject_ineligible_claims():
+    """Initial, specific-disease and pre-existing waiting periods are enforced from inception"""
+    from datetime import date
+    
+    adjudicator = PolicyAdjudicator(policy_path="../data/policy_rules.json")
+    inception = date(2025, 1, 1)
+    claim = {'diagnosis_or_specialty': 'Type 2 Diabetes Mellitus', 'date': '2025-06-01',
+             'total_amount': 500, 'line_items': [{'name': 'Metformin 500mg', 'total_price': 500}]}
+    
+    violation = adjudicator.check_waiting_period(claim, inception)
+    assert (violation['rule'], violation['waiting_days'], violation['eligible_from']) == ("specific_disease", 730, "2027-01-01")
+    assert adjudicator.check_waiting_period({**claim, 'date': '2027-01-01'}, inception) is None
+    
+    fever = {**claim, 'diagnosis_or_specialty': 'Viral Fever'}
+    assert adjudicator.check_waiting_period(fever, inception) is None
+    assert adjudicator.check_waiting_period({**fever, 'date': '2025-01-20'}, inception)['rule'] == "initial"
+    assert adjudicator.check_waiting_period(fever, inception, ["viral fever"])['rule'] == "pre_existing_disease"
+    assert adjudicator.check_waiting_period({**claim, 'diagnosis_or_specialty': 'Prediabetic'}, inception) is None
+    
+    result = adjudicator.reject_for_waiting_period(claim, violation)
+    assert (result['status'], result['total_approved']) == ("REJECTED", 0)
+    assert all(item['status'] == "REJECTED" for item in result['line_item_decisions'])
+
+
+
+def test_waiting_period_matcher_normalises_disease_names():
+    """Disease names with stray case or spacing match diagnoses written either way"""
+    from policy_engine import WaitingPeriodMatcher
+    
+    matcher = WaitingPeriodMatcher({'specific_diseases': [
+        {'disease': ' Diabetes  Mellitus ', 'waiting_days': 730},
+        {'disease': 'Hypertension', 'waiting_days': 365},
+        {'disease': '  ', 'waiting_days': 90}
+    ]})
+    assert matcher.specific_disease("type 2 diabetes mellitus") == (" Diabetes  Mellitus ", 730)
+    assert matcher.specific_disease("Diabetes\nmellitus with HYPERTENSION") == (" Diabetes  Mellitus ", 730)
+    assert matcher.specific_disease("Hypertension") == ("Hypertension", 365)
+
 def run_all_tests():
     """Run tests on all sample claim files"""
     print("\n")
@@ -0,0 +1,78 @@
+"""
+ClaimGuard AI - Image Preprocessor Tests
+Checks downscaling, the encoded-size budget and auto-orientation fallbacks
+"""
+
+import io
+import random
+
+from PIL import Image
+
+from image_preprocessor import EXIF_ORIENTATION, ImagePreprocessor
+
+
+def encode(image, format='JPEG', **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **options)
+    return buffer.getvalue()
+
+
+def noisy_image(width, height, seed=1):
+    rng = random.Random(seed)
+    image = Image.new('L', (width, height))
+    image.putdata([rng.randrange(256) for _ in range(width * height)])
+    return image
+
+
+def test_large_image_is_downscaled_within_budget():
+    """Oversized uploads come out no larger than max_dimension and max_bytes"""
+    preprocessor = ImagePreprocessor(max_dimension=400, max_bytes=60_000, output_format='JPEG', grayscale=True)
+    original = encode(noisy_image(1200, 800).convert('RGB'), quality=95)
+    
+    prepared = preprocessor.prepare(original)
+    assert prepared.mime_type == 'image/jpeg'
+    assert max(prepared.width, prepared.height) <= 400
+    assert prepared.prepared_bytes <= 60_000 < prepared.original_bytes
+    with Image.open(io.BytesIO(prepared.data)) as image:
+        assert image.mode == 'L'
+
+
+def test_encode_within_budget_lowers_quality_then_size():
+    """The encoder shrinks the image once the lowest quality is still over budget, down to 512px"""
+    preprocessor = ImagePreprocessor(max_dimension=2048, max_bytes=20_000, output_format='JPEG', grayscale=True)
+    
+    data = preprocessor._encode_within_budget(noisy_image(1024, 1024))
+    with Image.open(io.BytesIO(data)) as image:
+        assert image.width < 1024
+    
+    floor = ImagePreprocessor(max_dimension=2048, max_bytes=100, output_format='JPEG', grayscale=True)
+    with Image.open(io.BytesIO(floor._encode_within_budget(noisy_image(1024, 1024)))) as image:
+        assert max(image.size) <= 512
+
+
+def test_small_upright_image_passes_through():
+    """An already compact image without EXIF rotation is sent unchanged"""
+    original = encode(noisy_image(64, 32), quality=10)
+    preprocessor = ImagePreprocessor(max_dimension=2048, max_bytes=1_000_000, output_format='JPEG', grayscale=True)
+    
+    prepared = preprocessor.prepare(original)
+    assert prepared.data == original
+
+
+def test_rotated_image_is_reencoded_even_if_not_smaller():
+    """A phone photo with EXIF rotation reaches the vision model upright"""
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = 6  # rotate 90 degrees clockwise to display
+    original = encode(noisy_image(64, 32), quality=10, exif=exif)
+    preprocessor = ImagePreprocessor(max_dimension=2048, max_bytes=1_000_000, output_format='JPEG', grayscale=True)
+    
+    prepared = preprocessor.prepare(original)
+    assert prepared.data != original
+    assert (prepared.width, prepared.height) == (32, 64)
+
+
+def test_undecodable_upload_is_sent_as_is():
+    """Bytes Pillow cannot open fall back to the original with a sniffed MIME type"""
+    original = b'\x89PNG\r\n\x1a\n' + b'\x00' * 32
+    prepared = ImagePreprocessor(output_format='JPEG').prepare(original)
+    assert (prepared.data, prepared.mime_type) == (original, 'image/png')
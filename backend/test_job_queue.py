@@ -0,0 +1,138 @@
+"""
+ClaimGuard AI - Job Queue Tests
+Checks claiming, lease-based retries of stale jobs and the attempt limit
+"""
+
+import asyncio
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from job_queue import JobQueue
+
+
+def make_session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+async def no_op(job):
+    return {"db_id": None, "filename": job.filename}
+
+
+def submit(queue, name):
+    return queue.submit(name, "application/json", b"{}", "0" * 64)
+
+
+def test_claim_next_takes_oldest_queued_job_once(tmp_path):
+    """Each queued job is claimed by exactly one worker, oldest first"""
+    session_factory = make_session_factory(tmp_path)
+    queue = JobQueue(session_factory, no_op, workers=1, stale_after_seconds=60, max_attempts=3)
+    other_worker = JobQueue(session_factory, no_op, workers=1, stale_after_seconds=60, max_attempts=3)
+    first = submit(queue, "first.json")
+    second = submit(queue, "second.json")
+    
+    job = queue._claim_next()
+    assert (job.id, job.status, job.attempts) == (first, "RUNNING", 1)
+    assert other_worker._claim_next().id == second
+    assert queue._claim_next() is None
+    
+    assert queue._finish(first, 1, {"db_id": None, "ok": True})
+    status = queue.get(first)
+    assert (status["status"], status["result"]) == ("COMPLETED", {"db_id": None, "ok": True})
+
+
+def test_stale_job_is_retried_and_old_worker_fenced_out(tmp_path):
+    """A job whose heartbeats stopped is claimed again; the first worker can no longer renew or finish it"""
+    session_factory = make_session_factory(tmp_path)
+    queue = JobQueue(session_factory, no_op, workers=1, stale_after_seconds=0.2, max_attempts=3)
+    job_id = submit(queue, "receipt.json")
+    
+    first = queue._claim_next()
+    time.sleep(0.1)
+    assert queue._heartbeat(job_id, first.attempts)
+    time.sleep(0.15)
+    assert queue._claim_next() is None, "heartbeat should keep the lease alive"
+    
+    time.sleep(0.25)
+    retry = queue._claim_next()
+    assert (retry.id, retry.attempts) == (job_id, 2)
+    assert not queue._heartbeat(job_id, first.attempts)
+    assert not queue._finish(job_id, first.attempts, {"db_id": None})
+    assert queue._finish(job_id, retry.attempts, {"db_id": None})
+    assert queue.get(job_id)["status"] == "COMPLETED"
+
+
+def test_job_fails_after_max_attempts(tmp_path):
+    """A job that keeps going stale is marked FAILED once it runs out of attempts"""
+    session_factory = make_session_factory(tmp_path)
+    queue = JobQueue(session_factory, no_op, workers=1, stale_after_seconds=0.05, max_attempts=2)
+    job_id = submit(queue, "receipt.json")
+    
+    for attempt in (1, 2):
+        assert queue._claim_next().attempts == attempt
+        time.sleep(0.1)
+    assert queue._claim_next() is None
+    
+    status = queue.get(job_id)
+    assert (status["status"], status["error"], status["attempts"]) == ("FAILED", "Exceeded maximum attempts", 3)
+
+
+def test_long_running_job_is_not_run_twice(tmp_path):
+    """Heartbeats keep a job that outlives JOB_STALE_SECONDS from being picked up by another worker"""
+    session_factory = make_session_factory(tmp_path)
+    calls = []
+    
+    async def slow_handler(job):
+        calls.append(job.attempts)
+        await asyncio.sleep(1.0)
+        return {"db_id": None}
+    
+    async def run():
+        queues = [
+            JobQueue(session_factory, slow_handler, workers=2, poll_interval=0.02,
+                     stale_after_seconds=0.3, max_attempts=3)
+            for _ in range(2)
+        ]
+        for queue in queues:
+            queue.start()
+        job_id = submit(queues[0], "receipt.json")
+        try:
+            for _ in range(100):
+                await asyncio.sleep(0.05)
+                if queues[0].get(job_id)["status"] not in ("QUEUED", "RUNNING"):
+                    break
+        finally:
+            for queue in queues:
+                await queue.stop()
+        return queues[0].get(job_id)
+    
+    status = asyncio.run(run())
+    assert status["status"] == "COMPLETED"
+    assert calls == [1]
+
+
+def test_submit_from_a_thread_wakes_idle_workers(tmp_path):
+    """A job submitted from asyncio.to_thread is picked up without waiting for the poll interval"""
+    session_factory = make_session_factory(tmp_path)
+    
+    async def run():
+        queue = JobQueue(session_factory, no_op, workers=1, poll_interval=30,
+                         stale_after_seconds=60, max_attempts=3)
+        queue.start()
+        try:
+            await asyncio.sleep(0.1)
+            job_id = await asyncio.to_thread(submit, queue, "receipt.json")
+            started = time.perf_counter()
+            while queue.get(job_id)["status"] != "COMPLETED" and time.perf_counter() - started < 5:
+                await asyncio.sleep(0.02)
+            return queue.get(job_id)["status"], time.perf_counter() - started
+        finally:
+            await queue.stop()
+    
+    status, waited = asyncio.run(run())
+    assert status == "COMPLETED"
+    assert waited < 5
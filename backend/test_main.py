@@ -0,0 +1,307 @@
+"""
+ClaimGuard AI - API Tests
+Checks startup schema upgrades and request handling of the FastAPI app
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import struct
+import zipfile
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+import main
+import models
+
+
+# claims table as created by releases before receipt_phash was added
+BASELINE_CLAIMS_TABLE = """
+CREATE TABLE claims (
+    id INTEGER NOT NULL PRIMARY KEY,
+    claim_id VARCHAR,
+    merchant_name VARCHAR,
+    patient_name VARCHAR,
+    total_claimed FLOAT,
+    total_approved FLOAT,
+    total_deducted FLOAT,
+    status VARCHAR,
+    full_data JSON,
+    created_at DATETIME
+)
+"""
+
+
+def test_prepare_database_upgrades_baseline_claims_table(tmp_path):
+    """An existing database gains receipt_phash and its index, and keeps its claims"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(BASELINE_CLAIMS_TABLE))
+        connection.execute(text("INSERT INTO claims (claim_id, status) VALUES ('OLD-1', 'APPROVED')"))
+
+    main.prepare_database(engine)
+    main.prepare_database(engine)
+
+    inspector = inspect(engine)
+    assert "receipt_phash" in {column["name"] for column in inspector.get_columns("claims")}
+    assert {"ix_claims_receipt_phash", "ix_claims_created_at_id"} <= {
+        index["name"] for index in inspector.get_indexes("claims")
+    }
+
+    with sessionmaker(bind=engine)() as db:
+        db.add(models.Claim(claim_id="NEW-1", status="APPROVED", receipt_phash="00ff00ff00ff00ff",
+                            created_at=datetime(2025, 6, 1)))
+        db.commit()
+        assert sorted(claim.claim_id for claim in db.query(models.Claim)) == ["NEW-1", "OLD-1"]
+
+
+def load_claim(name="claim_clean_authentic.json", **fields):
+    claim = json.loads((main.BASE_DIR.parent / "data" / "claims" / name).read_text(encoding='utf-8'))
+    claim.update(fields)
+    return claim
+
+
+def analyze(claim, insured_id):
+    content = json.dumps(claim).encode()
+    return main.analyze_claim_content(
+        "claim.json", "application/json", content, hashlib.sha256(content).hexdigest(), insured_id=insured_id
+    )
+
+
+async def ledger_balance(insured_id):
+    balances = await main.benefit_ledger.balances(insured_id)
+    return [(row['reserved'], row['consumed'], row['claim_count']) for row in balances]
+
+
+def run_app(coroutine_function):
+    """Run a test coroutine against the app's writer and async engine, then shut them down"""
+    async def run():
+        try:
+            return await coroutine_function()
+        finally:
+            await main.claim_writer.stop()
+            await main.async_engine.dispose()
+    return asyncio.run(run())
+
+
+def test_cancelled_request_still_settles_hold_of_saved_claim(monkeypatch):
+    """A request cancelled during the save cannot leave its hold reserved or release it"""
+    write = main.claim_writer.write
+    writing = []
+
+    async def slow_write(*args, **kwargs):
+        writing[0].set()
+        await asyncio.sleep(0.05)
+        return await write(*args, **kwargs)
+    monkeypatch.setattr(main.claim_writer, "write", slow_write)
+
+    async def run():
+        writing.append(asyncio.Event())
+        task = asyncio.ensure_future(analyze(load_claim(date="2025-06-01"), "CANCEL-SAVED"))
+        await writing[0].wait()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0.2)
+        return task.cancelled(), await ledger_balance("CANCEL-SAVED")
+
+    cancelled, balance = run_app(run)
+    assert cancelled
+    assert balance == [(0.0, 337.5, 1)]
+
+
+def test_cancelled_request_releases_hold_before_save(monkeypatch):
+    """Cancellation between the reservation and the save gives the hold back"""
+    def cancelled_save(*args, **kwargs):
+        raise asyncio.CancelledError()
+    monkeypatch.setattr(main, "save_claim", cancelled_save)
+
+    async def run():
+        try:
+            await analyze(load_claim(date="2025-06-01"), "CANCEL-EARLY")
+        except asyncio.CancelledError:
+            pass
+        return await ledger_balance("CANCEL-EARLY")
+
+    assert run_app(run) == [(0.0, 0.0, 0)]
+
+
+def test_oversized_upload_is_refused_from_content_length(monkeypatch):
+    """A declared body over the limit gets 413 before the multipart body is parsed"""
+    monkeypatch.setattr(main.vision_agent, "max_upload_bytes", 1024)
+    client = TestClient(main.app)
+    
+    response = client.post("/api/analyze", files={"file": ("receipt.jpg", b"x" * 200_000, "image/jpeg")})
+    assert response.status_code == 413
+
+
+def test_streamed_upload_is_cut_off_at_the_limit(monkeypatch):
+    """A chunked body without Content-Length is stopped once it passes the limit"""
+    monkeypatch.setattr(main.vision_agent, "max_upload_bytes", 1024)
+    client = TestClient(main.app)
+    boundary = "claimguard"
+    
+    def body():
+        yield (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"r.jpg\"\r\n"
+               f"Content-Type: image/jpeg\r\n\r\n").encode()
+        for _ in range(50):
+            yield b"x" * 8192
+        yield f"\r\n--{boundary}--\r\n".encode()
+    
+    response = client.post(
+        "/api/analyze", content=body(),
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    )
+    assert response.status_code == 413
+
+
+def test_manual_review_banner_needs_an_unenrolled_insured_id():
+    """Only a request naming an insured without an enrollment is flagged, and only once"""
+    async def run():
+        anonymous = await analyze(load_claim(date="2025-06-01"), None)
+        unenrolled = await analyze(load_claim(date="2025-06-01"), "NOT-ENROLLED")
+        return anonymous, unenrolled
+
+    anonymous, unenrolled = run_app(run)
+    assert anonymous['waiting_period'] == unenrolled['waiting_period'] == "unverified"
+    assert "No enrollment on file" not in anonymous['final_decision']['summary']
+    summary = unenrolled['final_decision']['summary']
+    assert summary.startswith("[MANUAL REVIEW REQUIRED] No enrollment on file")
+    assert summary.count("[MANUAL REVIEW REQUIRED]") == 1
+
+
+def make_zip(members):
+    """ZIP archive (deflated) of name -> bytes"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def declare_size(archive_bytes, declared_size):
+    """Rewrite the uncompressed size of a single-member archive in both ZIP headers"""
+    data = bytearray(archive_bytes)
+    struct.pack_into("<I", data, data.index(b"PK\x03\x04") + 22, declared_size)
+    struct.pack_into("<I", data, data.index(b"PK\x01\x02") + 24, declared_size)
+    return bytes(data)
+
+
+def test_zip_member_sizes_are_measured_not_declared(monkeypatch):
+    """A huge declared size is not trusted, and a member inflating past the limit is cut off"""
+    monkeypatch.setattr(main.vision_agent, "max_upload_bytes", 4096)
+    receipt = json.dumps(load_claim()).encode()[:4000]
+    
+    declared_huge = declare_size(make_zip({"receipt.json": receipt}), 2**31)
+    assert main.expand_zip_archive("declared.zip", declared_huge) == [
+        ("declared.zip/receipt.json", "application/json", receipt)
+    ]
+    
+    bomb = make_zip({"bomb.jpg": b"\0" * 10_000_000})
+    assert len(bomb) < 20_000
+    with pytest.raises(HTTPException) as excinfo:
+        main.expand_zip_archive("bomb.zip", bomb)
+    assert excinfo.value.status_code == 413
+    assert "bomb.zip:bomb.jpg exceeds limit" in excinfo.value.detail
+    
+    with pytest.raises(HTTPException) as excinfo:
+        main.expand_zip_archive("pair.zip", make_zip({"a.jpg": b"a" * 3000, "b.jpg": b"b" * 3000}),
+                                max_expanded_bytes=5000)
+    assert excinfo.value.status_code == 413
+    assert "expands beyond the batch limit" in excinfo.value.detail
+
+
+def test_zip_expansion_skips_non_receipts_and_caps_members():
+    """Nested archives, text and metadata members are skipped; receipts beyond max_members are refused"""
+    archive = make_zip({
+        "scans/": b"",
+        "scans/receipt.jpg": b"jpeg",
+        "claim.json": b"{}",
+        "inner.zip": make_zip({"hidden.jpg": b"jpeg"}),
+        "notes.txt": b"notes",
+        ".DS_Store": b"",
+        "__MACOSX/scans/._receipt.jpg": b"",
+    })
+    assert [name for name, _, _ in main.expand_zip_archive("upload.zip", archive)] == [
+        "upload.zip/scans/receipt.jpg", "upload.zip/claim.json"
+    ]
+    
+    with pytest.raises(HTTPException) as excinfo:
+        main.expand_zip_archive("upload.zip", archive, max_members=1)
+    assert excinfo.value.status_code == 413
+    
+    with pytest.raises(HTTPException) as excinfo:
+        main.expand_zip_archive("broken.zip", b"not a zip")
+    assert excinfo.value.status_code == 400
+
+
+def test_batch_analyzes_archive_members_and_loose_files():
+    """A ZIP of claims plus a loose claim is analyzed file by file with aggregate totals"""
+    valid = json.dumps(load_claim("claim_valid.json")).encode()
+    clean = json.dumps(load_claim()).encode()
+    archive = make_zip({"claims/valid.json": valid, "claims/clean.json": clean, "readme.txt": b"skip"})
+    
+    with TestClient(main.app) as client:
+        response = client.post("/api/analyze/batch", files=[
+            ("files", ("claims.zip", archive, "application/zip")),
+            ("files", ("loose.json", clean, "application/json")),
+        ])
+    
+    assert response.status_code == 200
+    batch = response.json()
+    assert (batch["files"], batch["succeeded"], batch["failed"]) == (3, 3, 0)
+    assert [result["filename"] for result in batch["results"]] == [
+        "claims.zip/claims/valid.json", "claims.zip/claims/clean.json", "loose.json"
+    ]
+    decisions = [result["final_decision"] for result in batch["results"]]
+    assert batch["totals"]["total_claimed"] == round(sum(decision["total_claimed"] for decision in decisions), 2)
+    assert batch["totals"]["total_approved"] == round(sum(decision["total_approved"] for decision in decisions), 2)
+
+
+def test_cursor_round_trips_and_rejects_garbage():
+    """decode_cursor inverts encode_cursor; anything else is a 400"""
+    created_at = datetime(2025, 6, 1, 9, 30, 15, 123456)
+    assert main.decode_cursor(main.encode_cursor(created_at, 42)) == (created_at, 42)
+    
+    for cursor in ("!!!", "bm90IGpzb24", main.encode_cursor(created_at, 42)[:-3], "WzFd", "WyJ4IiwgMV0"):
+        with pytest.raises(HTTPException) as excinfo:
+            main.decode_cursor(cursor)
+        assert excinfo.value.status_code == 400
+
+
+def test_claims_pages_break_created_at_ties_by_id():
+    """Pages walk (created_at, id) newest first with no row repeated or skipped across ties"""
+    tied = datetime(2025, 6, 2, 12, 0)
+    with main.SessionLocal() as db:
+        rows = [
+            models.Claim(claim_id=f"PAGE-{n}", merchant_name="Paging Pharmacy", status="APPROVED", created_at=created_at)
+            for n, created_at in enumerate([datetime(2025, 6, 1), tied, tied, tied, datetime(2025, 6, 3)])
+        ]
+        db.add_all(rows)
+        db.commit()
+        expected = [row.claim_id for row in sorted(rows, key=lambda row: (row.created_at, row.id), reverse=True)]
+    
+    client = TestClient(main.app)
+    pages = []
+    cursor = None
+    while True:
+        params = {"limit": 2, "merchant_name": "Paging Pharmacy", **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/claims", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        pages.append([claim["claim_id"] for claim in page["claims"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [claim_id for page in pages for claim_id in page] == expected
+    assert expected[:4] == ["PAGE-4", "PAGE-3", "PAGE-2", "PAGE-1"]
+    
+    assert client.get("/api/claims", params={"cursor": "not-a-cursor"}).status_code == 400
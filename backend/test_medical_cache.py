@@ -0,0 +1,122 @@
+"""
+ClaimGuard AI - Medical Verdict Cache Tests
+Checks hits, misses, TTL expiry and LRU eviction of cached verdicts, and
+that the Medical Judge only asks the LLM about uncached items
+"""
+
+import json
+import time
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import Base
+from medical_cache import MedicalVerdictCache
+from medical_judge import MedicalJudge
+
+
+PASS = {"status": "PASS", "severity": "INFO", "reason": "Indicated"}
+
+
+def make_session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def cached_items(session_factory):
+    db = session_factory()
+    try:
+        return {row.item_key for row in db.query(models.MedicalVerdictCacheEntry.item_key)}
+    finally:
+        db.close()
+
+
+def test_hit_and_miss_use_normalized_keys(tmp_path):
+    """Verdicts are shared by spelling variants of the same diagnosis and item"""
+    cache = MedicalVerdictCache(make_session_factory(tmp_path), ttl_seconds=3600, max_entries=10)
+    cache.put_many("Viral Fever", {"Paracetamol 500mg": PASS})
+    
+    verdicts = cache.get_many("viral  fever", ["PARACETAMOL 500MG", "Cough Syrup"])
+    assert verdicts == {"PARACETAMOL 500MG": PASS}
+    assert cache.get_many("Ulcer", ["Paracetamol 500mg"]) == {}
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 2)
+
+
+def test_expired_verdicts_are_not_served(tmp_path):
+    """Verdicts older than the TTL count as misses"""
+    session_factory = make_session_factory(tmp_path)
+    MedicalVerdictCache(session_factory, ttl_seconds=3600, max_entries=10).put_many("Viral Fever", {"Dolo-650": PASS})
+    time.sleep(0.01)
+    
+    expired = MedicalVerdictCache(session_factory, ttl_seconds=0, max_entries=10)
+    assert expired.get_many("Viral Fever", ["Dolo-650"]) == {}
+
+
+def test_least_recently_used_verdict_is_evicted(tmp_path):
+    """Past max_entries, the verdict read longest ago goes first"""
+    session_factory = make_session_factory(tmp_path)
+    cache = MedicalVerdictCache(session_factory, ttl_seconds=3600, max_entries=2)
+    cache.put_many("Viral Fever", {"Dolo-650": PASS})
+    cache.put_many("Viral Fever", {"Cough Syrup": PASS})
+    assert cache.get_many("Viral Fever", ["Dolo-650"])
+    cache.put_many("Viral Fever", {"ORS": PASS})
+    
+    assert cached_items(session_factory) == {"dolo-650", "ors"}
+    assert cache.stats()["evictions"] == 1
+
+
+def hit_counts(session_factory):
+    db = session_factory()
+    try:
+        return {row.item_key: row.hit_count for row in db.query(models.MedicalVerdictCacheEntry)}
+    finally:
+        db.close()
+
+
+def test_lookups_buffer_hits_instead_of_writing(tmp_path):
+    """A cache hit takes no write lock; hit counts reach the table in one batch"""
+    session_factory = make_session_factory(tmp_path)
+    cache = MedicalVerdictCache(session_factory, ttl_seconds=3600, max_entries=300)
+    cache.put_many("Viral Fever", {"Dolo-650": PASS, "ORS": PASS, "Cough Syrup": PASS})
+    
+    blocker = session_factory()
+    blocker.connection().exec_driver_sql("BEGIN IMMEDIATE")
+    try:
+        assert cache.get_many("Viral Fever", ["Dolo-650"]) == {"Dolo-650": PASS}
+        assert cache.get_many("Viral Fever", ["Dolo-650", "ORS"]) == {"Dolo-650": PASS, "ORS": PASS}
+    finally:
+        blocker.rollback()
+        blocker.close()
+    assert hit_counts(session_factory) == {"dolo-650": 0, "ors": 0, "cough syrup": 0}
+    
+    cache.get_many("Viral Fever", ["Cough Syrup"])
+    assert hit_counts(session_factory) == {"dolo-650": 2, "ors": 1, "cough syrup": 1}
+
+
+def test_judge_sends_only_uncached_items_to_llm(tmp_path):
+    """Cached verdicts are merged in; the prompt lists only the items the cache lacks"""
+    cache = MedicalVerdictCache(make_session_factory(tmp_path), ttl_seconds=3600, max_entries=10)
+    cache.put_many("Viral Fever", {"Dolo-650": PASS})
+    prompts = []
+    
+    def create(messages, **kwargs):
+        prompts.append(messages[0]["content"])
+        content = json.dumps({"Cough Syrup": {"status": "FLAG", "severity": "WARNING", "reason": "Not indicated"}})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+    
+    judge = MedicalJudge(verdict_cache=cache)
+    judge.mode = "active"
+    judge.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    
+    result = judge.evaluate_necessity("Viral Fever", [{"name": "Dolo-650"}, {"name": "Cough Syrup"}])
+    assert result["Dolo-650"] == PASS
+    assert result["Cough Syrup"]["status"] == "FLAG"
+    assert len(prompts) == 1
+    assert "Cough Syrup" in prompts[0] and "Dolo-650" not in prompts[0]
+    
+    # Both verdicts are cached now: no further LLM call
+    assert judge.evaluate_necessity("Viral Fever", [{"name": "Dolo-650"}, {"name": "Cough Syrup"}]) == result
+    assert len(prompts) == 1
@@ -0,0 +1,51 @@
+"""
+ClaimGuard AI - Metrics Tests
+Checks the Prometheus text exposition of counters, histograms and /metrics
+"""
+
+from fastapi.testclient import TestClient
+
+import main
+from metrics import Registry
+
+
+def test_labeled_counter_and_histogram_render_exposition_format():
+    """Counters render one sample per label set; histograms render cumulative le buckets, _sum and _count"""
+    registry = Registry()
+    decisions = registry.counter("test_decisions_total", "Decisions by status", labelnames=("status",))
+    latency = registry.histogram("test_latency_seconds", "Stage latency", labelnames=("stage",), buckets=(0.1, 1.0))
+    registry.add_collector(lambda: [("test_cache_hits", "gauge", "Cache hits", [({"cache": "vision"}, 3)])])
+
+    decisions.inc(status="APPROVED")
+    decisions.inc(2, status='SAY "NO"\n')
+    for value in (0.05, 0.5, 0.7, 4.0):
+        latency.observe(value, stage="policy")
+
+    assert registry.render().splitlines() == [
+        "# HELP test_decisions_total Decisions by status",
+        "# TYPE test_decisions_total counter",
+        'test_decisions_total{status="APPROVED"} 1',
+        'test_decisions_total{status="SAY \\"NO\\"\\n"} 2',
+        "# HELP test_latency_seconds Stage latency",
+        "# TYPE test_latency_seconds histogram",
+        'test_latency_seconds_bucket{stage="policy",le="0.1"} 1',
+        'test_latency_seconds_bucket{stage="policy",le="1.0"} 3',
+        'test_latency_seconds_bucket{stage="policy",le="+Inf"} 4',
+        'test_latency_seconds_sum{stage="policy"} 5.25',
+        'test_latency_seconds_count{stage="policy"} 4',
+        "# HELP test_cache_hits Cache hits",
+        "# TYPE test_cache_hits gauge",
+        'test_cache_hits{cache="vision"} 3',
+    ]
+    assert decisions.value(status="APPROVED") == 1
+
+
+def test_metrics_endpoint_serves_registry():
+    """/metrics returns the shared registry as Prometheus text"""
+    main.OVERRIDES_TOTAL.inc(kind="fraud_review")
+    response = TestClient(main.app).get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE claimguard_stage_duration_seconds histogram" in response.text
+    assert 'claimguard_overrides_total{kind="fraud_review"} ' in response.text
@@ -0,0 +1,56 @@
+"""
+ClaimGuard AI - Stage Pipeline Tests
+Checks that independent stages overlap and dependent stages wait
+"""
+
+import asyncio
+import time
+
+from pipeline import StagePipeline
+
+
+def test_independent_stages_overlap():
+    """A slow async stage and a blocking CPU stage should run at the same time"""
+    async def slow_network(results):
+        await asyncio.sleep(0.2)
+        return "judge"
+
+    def blocking_work(results):
+        time.sleep(0.2)
+        return "policy"
+
+    pipeline = (
+        StagePipeline()
+        .add_stage('medical', slow_network)
+        .add_stage('policy', blocking_work, blocking=True)
+        .add_stage('merge', lambda results: (results['medical'], results['policy']),
+                   depends_on=('medical', 'policy'))
+    )
+
+    start = time.perf_counter()
+    results = asyncio.run(pipeline.run({'vision': {}}))
+    elapsed = time.perf_counter() - start
+
+    assert results['merge'] == ("judge", "policy")
+    assert elapsed < 0.35, f"Stages ran sequentially ({elapsed:.2f}s)"
+
+
+def test_stage_failure_propagates():
+    """The first failing stage aborts the run with its own exception"""
+    def failing(results):
+        raise ValueError("bad claim")
+
+    pipeline = StagePipeline().add_stage('policy', failing)
+
+    try:
+        asyncio.run(pipeline.run())
+    except ValueError as e:
+        assert str(e) == "bad claim"
+    else:
+        raise AssertionError("Expected ValueError from failing stage")
+
+
+if __name__ == "__main__":
+    test_independent_stages_overlap()
+    test_stage_failure_propagates()
+    print("[OK] Pipeline tests passed")
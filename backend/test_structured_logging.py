@@ -0,0 +1,75 @@
+"""
+ClaimGuard AI - Structured Logging Tests
+Checks that context IDs survive the logging queue and records render as one-line JSON
+"""
+
+import asyncio
+import io
+import json
+import logging
+import logging.handlers
+import queue
+
+from structured_logging import ContextQueueHandler, JsonFormatter, bind_claim_id, log_context
+
+
+def capture_json_logs(log_calls):
+    """Run log_calls(logger) through ContextQueueHandler and a listener; return the output lines"""
+    output = io.StringIO()
+    handler = logging.StreamHandler(output)
+    handler.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+
+    logger = logging.getLogger("claimguard.test_logging")
+    logger.handlers = [ContextQueueHandler(log_queue)]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    listener.start()
+    try:
+        log_calls(logger)
+    finally:
+        listener.stop()
+        logger.handlers = []
+    return output.getvalue().splitlines()
+
+
+def test_context_ids_follow_records_through_the_queue():
+    """request_id/claim_id set in the caller (task or worker thread) reach the listener's output"""
+    def log_calls(logger):
+        async def pipeline_stage(stage):
+            await asyncio.to_thread(logger.info, "stage finished", extra={"stage": stage})
+
+        async def handle_request():
+            with log_context(request_id="req-1"):
+                bind_claim_id("CLM-1")
+                await asyncio.gather(pipeline_stage("vision"), pipeline_stage("policy"))
+            logger.info("after request")
+
+        asyncio.run(handle_request())
+
+    records = [json.loads(line) for line in capture_json_logs(log_calls)]
+    stages = sorted((record["stage"], record["request_id"], record["claim_id"]) for record in records[:2])
+    assert stages == [("policy", "req-1", "CLM-1"), ("vision", "req-1", "CLM-1")]
+    assert "request_id" not in records[2] and records[2]["claim_id"] == "CLM-1"
+
+
+def test_json_formatter_writes_one_line_per_record_with_extras():
+    """Messages, extra fields and tracebacks are escaped into a single JSON line"""
+    def log_calls(logger):
+        logger.warning("first line\nsecond line %s", "arg", extra={"claim_total": 1250.5, "items": ["a", "b"]})
+        try:
+            raise ValueError("bad receipt")
+        except ValueError:
+            logger.exception("analysis failed")
+
+    lines = capture_json_logs(log_calls)
+    assert len(lines) == 2
+    warning, error = (json.loads(line) for line in lines)
+    assert (warning["level"], warning["logger"], warning["message"]) == (
+        "WARNING", "claimguard.test_logging", "first line\nsecond line arg"
+    )
+    assert (warning["claim_total"], warning["items"]) == (1250.5, ["a", "b"])
+    assert "request_id" not in warning and "args" not in warning
+    assert error["level"] == "ERROR"
+    assert "ValueError: bad receipt" in error["exception"]
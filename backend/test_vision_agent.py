@@ -0,0 +1,97 @@
+"""
+ClaimGuard AI - Vision Agent Tests
+Checks upload reading (size limit, SHA-256) and the async vision path without calling the vision API
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from vision_agent import VisionAgent, UploadTooLargeError
+
+
+class ChunkedUpload:
+    """Async upload stream serving its content in small chunks, like UploadFile"""
+
+    def __init__(self, content, size=None, chunk_size=7):
+        self.content = content
+        self.size = size
+        self.chunk_size = chunk_size
+        self.position = 0
+        self.reads = 0
+
+    async def read(self, size=-1):
+        self.reads += 1
+        chunk = self.content[self.position:self.position + min(size, self.chunk_size)]
+        self.position += len(chunk)
+        return chunk
+
+
+def test_read_upload_returns_content_and_sha256():
+    content = bytes(range(256)) * 40
+    agent = VisionAgent()
+    
+    buffer, digest = asyncio.run(agent.read_upload(ChunkedUpload(content), max_bytes=len(content)))
+    assert bytes(buffer) == content
+    assert digest == hashlib.sha256(content).hexdigest()
+
+
+def test_read_upload_stops_reading_past_the_limit():
+    upload = ChunkedUpload(b"x" * 1000)
+    
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(VisionAgent().read_upload(upload, max_bytes=100))
+    assert upload.position <= 100 + upload.chunk_size
+
+
+def test_read_upload_rejects_declared_size_without_reading():
+    upload = ChunkedUpload(b"x" * 10, size=1000)
+    
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(VisionAgent().read_upload(upload, max_bytes=100))
+    assert upload.reads == 0
+
+
+def completion(payload):
+    """Chat completion shaped like the OpenAI SDK's, answering with a fenced JSON payload"""
+    message = SimpleNamespace(content=f"```json\n{json.dumps(payload)}\n```")
+    usage = SimpleNamespace(prompt_tokens=100, completion_tokens=20)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def test_async_vision_calls_respect_concurrency_and_match_sync_result(monkeypatch):
+    """At most VISION_MAX_CONCURRENCY calls are in flight, and each returns what the sync path returns"""
+    monkeypatch.setenv("VISION_MAX_CONCURRENCY", "2")
+    agent = VisionAgent()
+    payload = {"merchant_name": "Apollo Pharmacy", "total_amount": 450.0, "line_items": []}
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), "white").save(buffer, format="PNG")
+    receipt = buffer.getvalue()
+    
+    in_flight = []
+    peak = []
+    
+    async def create(**kwargs):
+        in_flight.append(kwargs["messages"])
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.02)
+        in_flight.pop()
+        return completion(payload)
+    
+    agent.async_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    agent.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        create=lambda **kwargs: completion(payload)
+    )))
+    
+    async def run():
+        return await asyncio.gather(*(agent.analyze_bytes_with_openai_async(receipt) for _ in range(6)))
+    
+    results = asyncio.run(run())
+    assert max(peak) == 2 and len(peak) == 6
+    assert results == [agent.analyze_bytes_with_openai(receipt)] * 6
+    assert results[0]["merchant_name"] == "Apollo Pharmacy" and "image_preprocessing" in results[0]
@@ -0,0 +1,84 @@
+"""
+ClaimGuard AI - Vision Cache Tests
+Checks hits, misses, TTL expiry and LRU eviction of cached extractions
+"""
+
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import Base
+from vision_cache import VisionCache
+
+
+def make_session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def cached_hashes(session_factory):
+    db = session_factory()
+    try:
+        return {row.image_hash for row in db.query(models.VisionCacheEntry.image_hash)}
+    finally:
+        db.close()
+
+
+def test_hit_and_miss(tmp_path):
+    """A stored extraction is returned for the same hash only"""
+    cache = VisionCache(make_session_factory(tmp_path), ttl_seconds=3600, max_entries=10)
+    cache.put("a" * 64, {"merchant_name": "MediPlus"}, size_bytes=123)
+    
+    assert cache.get("a" * 64) == {"merchant_name": "MediPlus"}
+    assert cache.get("b" * 64) is None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_expired_entry_is_a_miss_and_removed(tmp_path):
+    """Entries older than the TTL are not served and are deleted on lookup"""
+    session_factory = make_session_factory(tmp_path)
+    VisionCache(session_factory, ttl_seconds=3600, max_entries=10).put("a" * 64, {"ok": True})
+    time.sleep(0.01)
+    
+    expired = VisionCache(session_factory, ttl_seconds=0, max_entries=10)
+    assert expired.get("a" * 64) is None
+    assert cached_hashes(session_factory) == set()
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    """Past max_entries, the entry read longest ago goes first"""
+    session_factory = make_session_factory(tmp_path)
+    cache = VisionCache(session_factory, ttl_seconds=3600, max_entries=2)
+    cache.put("a" * 64, {"receipt": "a"})
+    cache.put("b" * 64, {"receipt": "b"})
+    assert cache.get("a" * 64) == {"receipt": "a"}
+    cache.put("c" * 64, {"receipt": "c"})
+    
+    assert cached_hashes(session_factory) == {"a" * 64, "c" * 64}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_eviction_sweeps_are_sampled(tmp_path):
+    """The size bound is swept every 1% of max_entries puts, not on each put"""
+    session_factory = make_session_factory(tmp_path)
+    cache = VisionCache(session_factory, ttl_seconds=3600, max_entries=300)
+    sweeps = []
+    evict = cache._evict
+    cache._evict = lambda db, now: sweeps.append(now) or evict(db, now)
+    
+    for n in range(9):
+        cache.put(f"{n:064x}", {"n": n})
+    assert len(sweeps) == 3
+
+
+def test_disabled_cache_never_touches_the_database(tmp_path):
+    """max_entries=0 turns the cache off without any queries"""
+    def no_session():
+        raise AssertionError("disabled cache opened a session")
+    
+    cache = VisionCache(no_session, ttl_seconds=3600, max_entries=0)
+    cache.put("a" * 64, {"ok": True})
+    assert cache.get("a" * 64) is None
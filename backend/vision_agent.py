@@ -4,11 +4,18 @@ Extracts structured data from receipt images using AI Vision Models
 Supports: OpenAI GPT-4 Vision
 """
 
+import asyncio
 import json
+import logging
 import os
 import sys
 from pathlib import Path
 import base64
+import hashlib
+
+from image_preprocessor import ImagePreprocessor
+from structured_logging import setup_logging
+from metrics import record_llm_usage, LLM_REQUESTS_TOTAL
 
 # Fix Windows encoding issue for Unicode characters (like ₹ Rupee symbol)
 if sys.platform == 'win32':
@@ -17,11 +24,17 @@ if sys.platform == 'win32':
 
 # Try importing vision libraries
 try:
-    from openai import OpenAI
+    from openai import OpenAI, AsyncOpenAI
     OPENAI_AVAILABLE = True
 except ImportError:
     OPENAI_AVAILABLE = False
 
+logger = logging.getLogger("claimguard.vision")
+
+
+class UploadTooLargeError(ValueError):
+    """Uploaded receipt exceeds the configured size limit"""
+
 
 class VisionAgent:
     """Vision Agent for receipt analysis and fraud detection"""
@@ -30,19 +43,71 @@ class VisionAgent:
         """Initialize the Vision Agent with API configuration"""
         self.openai_api_key = os.environ.get('OPENAI_API_KEY')
         
+        # Cap on vision calls in flight per process (async path only)
+        self.max_concurrency = max(1, int(os.environ.get('VISION_MAX_CONCURRENCY', '16')))
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        # Normalizes images (orientation, grayscale, size, format) before upload
+        self.preprocessor = ImagePreprocessor()
+        
+        # Hard limit on receipt upload size (bytes)
+        self.max_upload_bytes = int(os.environ.get('MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+        
         # Configure OpenAI if available (preferred)
         if self.openai_api_key and OPENAI_AVAILABLE:
             self.client = OpenAI(api_key=self.openai_api_key)
+            self.async_client = AsyncOpenAI(api_key=self.openai_api_key)
             self.provider = "openai"
         else:
             self.provider = "mock"
-            print("[WARNING] No OpenAI API key found. Using mock data mode.")
-            print("          Set OPENAI_API_KEY environment variable to use AI vision.")
+            logger.warning("No OpenAI API key found, using mock data mode. "
+                           "Set OPENAI_API_KEY environment variable to use AI vision.")
     
-    def encode_image_base64(self, image_path):
-        """Encode image to base64 string"""
-        with open(image_path, 'rb') as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+    async def read_upload(self, upload, max_bytes=None, chunk_size=1024 * 1024):
+        """
+        Read an async upload stream into memory in one buffer
+        
+        The SHA-256 digest is computed chunk by chunk while reading, and the
+        upload is rejected as soon as it exceeds max_upload_bytes.
+        
+        Args:
+            upload: Object with an async read(size) method (e.g. FastAPI UploadFile)
+            max_bytes: Override of max_upload_bytes (e.g. for ZIP archives)
+            
+        Returns:
+            tuple: (bytearray of the image, SHA-256 hex digest)
+            
+        Raises:
+            UploadTooLargeError: If the upload exceeds max_upload_bytes
+        """
+        max_bytes = max_bytes or self.max_upload_bytes
+        declared_size = getattr(upload, 'size', None)
+        if declared_size is not None and declared_size > max_bytes:
+            raise UploadTooLargeError(
+                f"Upload of {declared_size:,} bytes exceeds limit of {max_bytes:,} bytes"
+            )
+        
+        buffer = bytearray()
+        hasher = hashlib.sha256()
+        while chunk := await upload.read(chunk_size):
+            if len(buffer) + len(chunk) > max_bytes:
+                raise UploadTooLargeError(f"Upload exceeds limit of {max_bytes:,} bytes")
+            hasher.update(chunk)
+            buffer += chunk
+        return buffer, hasher.hexdigest()
+    
+    def encode_data_url(self, image_bytes):
+        """
+        Normalize image bytes and encode them as a data: URL in a single base64 pass
+        
+        Returns:
+            tuple: (data URL string, preprocessing stats)
+        """
+        prepared = self.preprocessor.prepare(image_bytes)
+        
+        stats = prepared.stats()
+        logger.debug("Image preprocessed", extra=stats)
+        return f"data:{prepared.mime_type};base64,{base64.b64encode(prepared.data).decode('ascii')}", stats
     
     def get_system_prompt(self):
         """Generate the system prompt for receipt analysis"""
@@ -113,59 +178,98 @@ Analyze the receipt image thoroughly and provide the structured JSON response.""
 
         return prompt
     
+    def build_messages(self, image_url):
+        """Build the chat messages for a receipt image data: URL"""
+        prompt = self.get_system_prompt()
+        prompt += "\n\nAnalyze this receipt image and provide the structured JSON response:"
+        
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image_url
+                        }
+                    }
+                ]
+            }
+        ]
+    
+    def parse_response(self, response):
+        """Extract the JSON payload from a chat completion response"""
+        response_text = response.choices[0].message.content.strip()
+        
+        # Try to extract JSON if wrapped in markdown code blocks
+        if "```json" in response_text:
+            json_start = response_text.find("```json") + 7
+            json_end = response_text.find("```", json_start)
+            response_text = response_text[json_start:json_end].strip()
+        elif "```" in response_text:
+            json_start = response_text.find("```") + 3
+            json_end = response_text.find("```", json_start)
+            response_text = response_text[json_start:json_end].strip()
+        
+        return json.loads(response_text)
+    
     def analyze_with_openai(self, image_path):
         """Analyze receipt using OpenAI GPT-4 Vision API"""
+        with open(image_path, 'rb') as image_file:
+            return self.analyze_bytes_with_openai(image_file.read())
+    
+    def analyze_bytes_with_openai(self, image_bytes):
+        """Analyze in-memory receipt bytes using OpenAI GPT-4 Vision API"""
         try:
-            # Encode image to base64
-            image_base64 = self.encode_image_base64(image_path)
-            
-            # Create the prompt
-            prompt = self.get_system_prompt()
-            prompt += "\n\nAnalyze this receipt image and provide the structured JSON response:"
+            # Normalize and encode image as a data: URL
+            image_url, preprocessing = self.encode_data_url(image_bytes)
             
             # Call OpenAI API
             response = self.client.chat.completions.create(
                 model="gpt-4o-mini",  # or "gpt-4-vision-preview" for more accuracy
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_base64}"
-                                }
-                            }
-                        ]
-                    }
-                ],
+                messages=self.build_messages(image_url),
                 max_tokens=2000,
                 temperature=0.1
             )
+            record_llm_usage("vision", response)
             
-            # Extract JSON from response
-            response_text = response.choices[0].message.content.strip()
+            result = self.parse_response(response)
+            result['image_preprocessing'] = preprocessing
+            LLM_REQUESTS_TOTAL.inc(agent="vision", outcome="success")
+            return result
+            
+        except Exception as e:
+            LLM_REQUESTS_TOTAL.inc(agent="vision", outcome="error")
+            logger.exception("Error with OpenAI API")
+            return None
+    
+    async def analyze_bytes_with_openai_async(self, image_bytes):
+        """Analyze receipt bytes using the async OpenAI client without blocking the event loop"""
+        try:
+            # Image preprocessing and encoding happen off the event loop
+            image_url, preprocessing = await asyncio.to_thread(self.encode_data_url, image_bytes)
             
-            # Try to extract JSON if wrapped in markdown code blocks
-            if "```json" in response_text:
-                json_start = response_text.find("```json") + 7
-                json_end = response_text.find("```", json_start)
-                response_text = response_text[json_start:json_end].strip()
-            elif "```" in response_text:
-                json_start = response_text.find("```") + 3
-                json_end = response_text.find("```", json_start)
-                response_text = response_text[json_start:json_end].strip()
+            async with self.semaphore:
+                response = await self.async_client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=self.build_messages(image_url),
+                    max_tokens=2000,
+                    temperature=0.1
+                )
+            record_llm_usage("vision", response)
             
-            # Parse JSON
-            result = json.loads(response_text)
+            result = self.parse_response(response)
+            result['image_preprocessing'] = preprocessing
+            LLM_REQUESTS_TOTAL.inc(agent="vision", outcome="success")
             return result
             
         except Exception as e:
-            print(f"[ERROR] Error with OpenAI API: {str(e)}")
+            LLM_REQUESTS_TOTAL.inc(agent="vision", outcome="error")
+            logger.exception("Error with OpenAI API")
             return None
     
     def load_mock_data(self):
@@ -188,7 +292,7 @@ Analyze the receipt image thoroughly and provide the structured JSON response.""
         
         if not mock_path:
              # Fallback to hardcoded minimal data if file not found
-             print("[WARNING] Mock data file not found, using minimal fallback data")
+             logger.warning("Mock data file not found, using minimal fallback data")
              return {
                 "fraud_detection": {"recommendation": "APPROVE", "confidence_score": 1.0, "suspicious": False},
                 "merchant_name": "Apollo Pharmacy (Fallback)",
@@ -208,11 +312,11 @@ Analyze the receipt image thoroughly and provide the structured JSON response.""
                 'recommendation': 'APPROVE'
             }
             
-            print(f"[INFO] Using mock data from {mock_path}")
+            logger.info("Using mock data", extra={"mock_path": str(mock_path)})
             return data
             
         except Exception as e:
-            print(f"[ERROR] Error loading mock data: {str(e)}")
+            logger.exception("Error loading mock data")
             return None
     
     def process_receipt(self, image_path):
@@ -225,41 +329,95 @@ Analyze the receipt image thoroughly and provide the structured JSON response.""
         Returns:
             dict: Structured claim data with fraud detection results
         """
-        print(f"\n{'='*80}")
-        print("CLAIMGUARD AI - VISION AGENT")
-        print(f"{'='*80}")
-        print(f"Processing: {image_path}")
-        print(f"Provider: {self.provider.upper()}")
-        print(f"{'='*80}\n")
-        
-        # Check if image exists
-        if not Path(image_path).exists():
-            print(f"[ERROR] Image file not found at {image_path}")
+        if not self._start_processing(image_path):
             return None
         
         # Process based on provider
         result = None
         
         if self.provider == "openai":
-            print("[ANALYZING] Using OpenAI GPT-4 Vision API...")
+            logger.debug("Analyzing with OpenAI GPT-4 Vision API")
             result = self.analyze_with_openai(image_path)
     
         else:  # mock mode
-            print("[ANALYZING] Mock mode - returning sample data...")
+            logger.debug("Mock mode - returning sample data")
             result = self.load_mock_data()
         
-        if result:
-            print("[OK] Receipt processed successfully!")
-            print(f"\nFraud Detection: {result.get('fraud_detection', {}).get('recommendation', 'N/A')}")
-            print(f"Merchant: {result.get('merchant_name', 'N/A')}")
-            print(f"Total Amount: Rs.{result.get('total_amount', 0):,.2f}")
-            print(f"Line Items: {len(result.get('line_items', []))}")
-        else:
-            print("[ERROR] Failed to process receipt")
+        self._finish_processing(result)
+        return result
+    
+    async def process_receipt_async(self, image_path):
+        """
+        Async variant of process_receipt for use inside the FastAPI event loop
+        
+        Args:
+            image_path: Path to the receipt image file
+            
+        Returns:
+            dict: Structured claim data with fraud detection results
+        """
+        if not Path(image_path).exists():
+            logger.error("Image file not found", extra={"image_path": str(image_path)})
+            return None
+        
+        image_bytes = await asyncio.to_thread(Path(image_path).read_bytes)
+        return await self.process_receipt_bytes_async(image_bytes, label=image_path)
+    
+    async def process_receipt_bytes_async(self, image_bytes, label="<upload>"):
+        """
+        Process an in-memory receipt image without touching the filesystem
+        
+        At most VISION_MAX_CONCURRENCY vision calls run at once per process;
+        further requests wait on the semaphore without blocking other work.
+        
+        Args:
+            image_bytes: Raw image bytes (e.g. from read_upload)
+            label: Name shown in logs
+            
+        Returns:
+            dict: Structured claim data with fraud detection results
+        """
+        self._log_start(label)
+        
+        result = None
+        
+        if self.provider == "openai":
+            logger.debug("Analyzing with OpenAI GPT-4 Vision API (async)")
+            result = await self.analyze_bytes_with_openai_async(image_bytes)
+        
+        else:  # mock mode
+            logger.debug("Mock mode - returning sample data")
+            result = self.load_mock_data()
         
-        print(f"\n{'='*80}\n")
+        self._finish_processing(result)
         return result
     
+    def _log_start(self, label):
+        """Log the start of a vision extraction"""
+        logger.info("Vision agent processing receipt", extra={"label": str(label), "provider": self.provider})
+    
+    def _start_processing(self, image_path):
+        """Log the start of processing and check the image exists"""
+        self._log_start(image_path)
+        
+        # Check if image exists
+        if not Path(image_path).exists():
+            logger.error("Image file not found", extra={"image_path": str(image_path)})
+            return False
+        return True
+    
+    def _finish_processing(self, result):
+        """Log the processing outcome"""
+        if result:
+            logger.info("Receipt processed successfully", extra={
+                "fraud_recommendation": result.get('fraud_detection', {}).get('recommendation'),
+                "merchant_name": result.get('merchant_name'),
+                "total_amount": result.get('total_amount', 0),
+                "line_items": len(result.get('line_items', []))
+            })
+        else:
+            logger.error("Failed to process receipt")
+    
     def save_extracted_data(self, data, output_path):
         """Save extracted data to JSON file"""
         try:
@@ -287,6 +445,8 @@ def main():
     image_path = sys.argv[1]
     output_path = sys.argv[2] if len(sys.argv) > 2 else None
     
+    setup_logging(fmt=os.getenv('LOG_FORMAT', 'text'))
+    
     # Initialize agent
     agent = VisionAgent()
     
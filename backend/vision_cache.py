@@ -0,0 +1,78 @@
+"""
+ClaimGuard AI - Vision Result Cache
+Content-addressed store of Vision Agent extractions so re-uploaded receipts
+(Kestra retries, resubmissions, frontend re-analysis) skip the LLM call.
+"""
+
+import os
+from datetime import datetime
+
+import models
+from persistent_cache import PersistentCache
+
+
+class VisionCache(PersistentCache):
+    """Persistent SHA-256 -> vision result cache with TTL and LRU size eviction"""
+
+    entry_model = models.VisionCacheEntry
+    key_columns = ("image_hash",)
+
+    def __init__(self, session_factory, ttl_seconds=None, max_entries=None):
+        """
+        Args:
+            session_factory: Callable returning a SQLAlchemy Session
+            ttl_seconds: Entry lifetime (env VISION_CACHE_TTL_SECONDS, default 30 days)
+            max_entries: Size bound (env VISION_CACHE_MAX_ENTRIES, default 10000;
+                0 disables the cache without any database access)
+        """
+        if ttl_seconds is None:
+            ttl_seconds = int(os.getenv("VISION_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+        if max_entries is None:
+            max_entries = int(os.getenv("VISION_CACHE_MAX_ENTRIES", "10000"))
+        super().__init__(session_factory, ttl_seconds, max_entries)
+
+    def get(self, image_hash):
+        """Return the cached vision result for an image hash, or None"""
+        if not self.enabled:
+            self._count(misses=1)
+            return None
+        db = self.session_factory()
+        try:
+            entry = db.get(models.VisionCacheEntry, image_hash)
+            now = datetime.utcnow()
+            if entry is None or entry.created_at < now - self.ttl:
+                if entry is not None:
+                    db.delete(entry)
+                    db.commit()
+                self._count(misses=1)
+                return None
+
+            result = entry.result
+            if self._touch((image_hash,), now):
+                self._flush_touches(db)
+                db.commit()
+            self._count(hits=1)
+            return result
+        finally:
+            db.close()
+
+    def put(self, image_hash, result, size_bytes=None):
+        """Store a vision result and evict expired / least recently used entries"""
+        if not self.enabled:
+            return
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            db.merge(models.VisionCacheEntry(
+                image_hash=image_hash,
+                size_bytes=size_bytes,
+                result=result,
+                hit_count=0,
+                created_at=now,
+                last_accessed_at=now
+            ))
+            db.commit()
+            if self._eviction_due():
+                self._evict(db, now)
+        finally:
+            db.close()
@@ -1,17 +1,30 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
 const ClaimHistory = ({ onViewClaim }) => {
     const [claims, setClaims] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(true);
+    // Set once "Load more" was used, so polling keeps the older pages
+    const loadedMore = useRef(false);
 
+    // Refresh the first page (summary rows only, no full_data)
     const fetchClaims = async () => {
         try {
             const response = await fetch(`${API_URL}/api/claims`);
             if (response.ok) {
                 const data = await response.json();
-                setClaims(data);
+                if (loadedMore.current) {
+                    // Merge the newest page into the loaded list and keep the cursor of the last page
+                    setClaims((previous) => {
+                        const refreshed = new Set(data.claims.map((claim) => claim.id));
+                        return [...data.claims, ...previous.filter((claim) => !refreshed.has(claim.id))];
+                    });
+                } else {
+                    setClaims(data.claims);
+                    setNextCursor(data.next_cursor);
+                }
             }
         } catch (error) {
             console.error("Failed to fetch history:", error);
@@ -20,6 +33,36 @@ const ClaimHistory = ({ onViewClaim }) => {
         }
     };
 
+    const fetchMore = async () => {
+        try {
+            const response = await fetch(`${API_URL}/api/claims?cursor=${encodeURIComponent(nextCursor)}`);
+            if (response.ok) {
+                const data = await response.json();
+                loadedMore.current = true;
+                setClaims((previous) => {
+                    const loaded = new Set(previous.map((claim) => claim.id));
+                    return [...previous, ...data.claims.filter((claim) => !loaded.has(claim.id))];
+                });
+                setNextCursor(data.next_cursor);
+            }
+        } catch (error) {
+            console.error("Failed to fetch more history:", error);
+        }
+    };
+
+    // The full report is only loaded when a claim is opened
+    const viewClaim = async (claimId) => {
+        try {
+            const response = await fetch(`${API_URL}/api/claims/${claimId}`);
+            if (response.ok) {
+                const data = await response.json();
+                onViewClaim(data.full_data);
+            }
+        } catch (error) {
+            console.error("Failed to fetch claim:", error);
+        }
+    };
+
     useEffect(() => {
         fetchClaims();
         // Poll every 10s to keep updated
@@ -102,7 +145,7 @@ const ClaimHistory = ({ onViewClaim }) => {
                                 </td>
                                 <td className="py-3 px-4 text-right">
                                     <button
-                                        onClick={() => onViewClaim(claim.full_data)}
+                                        onClick={() => viewClaim(claim.id)}
                                         className="text-primary-600 hover:text-primary-800 text-sm font-semibold hover:underline"
                                     >
                                         View Report
@@ -113,6 +156,17 @@ const ClaimHistory = ({ onViewClaim }) => {
                     </tbody>
                 </table>
             </div>
+
+            {nextCursor && (
+                <div className="mt-4 text-center">
+                    <button
+                        onClick={fetchMore}
+                        className="text-primary-600 hover:text-primary-700 text-sm font-medium"
+                    >
+                        Load more
+                    </button>
+                </div>
+            )}
         </div>
     );
 };